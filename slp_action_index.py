@@ -0,0 +1,223 @@
+import json
+
+import numpy as np
+
+from slp_batch import batch_apply
+from slp_dataclasses.frame_common import FRAME_OFFSET
+from slp_index import EventIndex, decode_columns, latest_per_key
+from slp_parse import SlpBin
+
+POST_FRAME_CMD_BYTE = 0x38
+RUN_FIELDS = ("replay", "port", "start", "stop")
+
+
+# Runs of consecutive frames a player spent in one action state, from the raw post-frame
+# payloads with rollbacks resolved. Followers are left out. Returns arrays of character,
+# action state, port, start frame and stop frame (exclusive).
+def action_runs(buf, config_dir="configs", slp_bin=None):
+    index = buf if isinstance(buf, EventIndex) else EventIndex(buf)
+    slp_bin = slp_bin or SlpBin(config_dir)
+    layout = slp_bin.post_frame_update_template.layout(index.version)
+    cols = decode_columns(
+        index,
+        index.find(POST_FRAME_CMD_BYTE),
+        layout,
+        (
+            "frame_number",
+            "player_index",
+            "is_follower",
+            "internal_character_id",
+            "action_state_id",
+        ),
+    )
+    keep = latest_per_key(cols["player_index"], cols["is_follower"], cols["frame_number"])
+    keep = keep[cols["is_follower"][keep] == 0]
+    frame = cols["frame_number"][keep].astype(np.int64)
+    port = cols["player_index"][keep].astype(np.int64)
+    char = cols["internal_character_id"][keep].astype(np.int64)
+    state = cols["action_state_id"][keep].astype(np.int64)
+
+    if not len(frame):
+        empty = np.zeros(0, dtype=np.int64)
+        return {"char": empty, "state": empty, "port": empty, "start": empty, "stop": empty}
+
+    new_run = np.ones(len(frame), dtype=bool)
+    new_run[1:] = (
+        (port[1:] != port[:-1])
+        | (char[1:] != char[:-1])
+        | (state[1:] != state[:-1])
+        | (frame[1:] != frame[:-1] + 1)
+    )
+    starts = np.flatnonzero(new_run)
+    ends = np.append(starts[1:], len(frame))
+    return {
+        "char": char[starts],
+        "state": state[starts],
+        "port": port[starts],
+        "start": frame[starts],
+        "stop": frame[ends - 1] + 1,
+    }
+
+
+def _pack(a):
+    return a.astype(np.min_scalar_type(int(a.max()) if len(a) else 0))
+
+
+# A posting list sorted by (replay, port, start), stored as deltas in the smallest dtype that
+# fits: replay ids as gaps from the previous run, starts as gaps from the previous run of the
+# same player (or offset from the first frame on a player's first run) and runs as lengths
+def encode_postings(replay, port, start, stop):
+    order = np.lexsort((start, port, replay))
+    replay, port, start, stop = replay[order], port[order], start[order], stop[order]
+    same_player = np.zeros(len(replay), dtype=bool)
+    same_player[1:] = (replay[1:] == replay[:-1]) & (port[1:] == port[:-1])
+    start_delta = np.where(
+        same_player, start - np.append(0, start[:-1]), start + FRAME_OFFSET
+    )
+    return (
+        _pack(np.diff(replay, prepend=0)),
+        _pack(port),
+        _pack(start_delta),
+        _pack(stop - start),
+    )
+
+
+def decode_postings(encoded):
+    replay_delta, port, start_delta, length = (a.astype(np.int64) for a in encoded)
+    replay = np.cumsum(replay_delta)
+    same_player = np.zeros(len(replay), dtype=bool)
+    same_player[1:] = (replay[1:] == replay[:-1]) & (port[1:] == port[:-1])
+
+    # Running sum of the start deltas that restarts at every player's first run
+    vals = np.where(same_player, start_delta, start_delta - FRAME_OFFSET)
+    csum = np.cumsum(vals)
+    player_starts = np.flatnonzero(~same_player)
+    before = csum[player_starts] - vals[player_starts]
+    start = csum - np.repeat(before, np.diff(np.append(player_starts, len(replay))))
+    return {"replay": replay, "port": port, "start": start, "stop": start + length}
+
+
+def _run_key(replay, port, frame):
+    return (replay * 4 + port) * (1 << 32) + frame + FRAME_OFFSET
+
+
+# Maps (internal character id, action state id) to compressed posting lists of (replay, port,
+# frame range) over a whole corpus
+class ActionIndex:
+    def __init__(self, replays, postings):
+        self.replays = replays
+        self.postings = postings
+
+    @classmethod
+    def from_runs(cls, replays, runs):
+        if not runs:
+            return cls(list(replays), dict())
+        char = np.concatenate([r["char"] for r in runs])
+        state = np.concatenate([r["state"] for r in runs])
+        replay = np.concatenate(
+            [np.full(len(r["char"]), i, dtype=np.int64) for i, r in enumerate(runs)]
+        )
+        port = np.concatenate([r["port"] for r in runs])
+        start = np.concatenate([r["start"] for r in runs])
+        stop = np.concatenate([r["stop"] for r in runs])
+
+        # Action states are u16, so (char, state) fits in one int
+        key = char << 16 | state
+        order = np.argsort(key, kind="stable")
+        keys, bounds = np.unique(key[order], return_index=True)
+        bounds = np.append(bounds, len(key))
+        postings = dict()
+        for k, combined in enumerate(keys):
+            rows = order[bounds[k] : bounds[k + 1]]
+            postings[(int(combined) >> 16, int(combined) & 0xFFFF)] = encode_postings(
+                replay[rows], port[rows], start[rows], stop[rows]
+            )
+        return cls(list(replays), postings)
+
+    def runs(self, char, state):
+        encoded = self.postings.get((char, state))
+        if encoded is None:
+            empty = np.zeros(0, dtype=np.int64)
+            return {name: empty for name in RUN_FIELDS}
+        return decode_postings(encoded)
+
+    # Runs in any of states, sorted by (replay, port, start)
+    def find_any(self, char, states):
+        runs = [self.runs(char, s) for s in states]
+        merged = {name: np.concatenate([r[name] for r in runs]) for name in RUN_FIELDS}
+        order = np.lexsort((merged["start"], merged["port"], merged["replay"]))
+        return {name: a[order] for name, a in merged.items()}
+
+    # Replay ids where the character was in every one of states at some point
+    def replays_with_all(self, char, states):
+        sets = [np.unique(self.runs(char, s)["replay"]) for s in states]
+        out = sets[0]
+        for s in sets[1:]:
+            out = np.intersect1d(out, s)
+        return out
+
+    # Occurrences of the states one after another by the same player, each starting at most
+    # max_gap frames after the previous one ended. Every step can be a single state or a set
+    # of alternatives, e.g. [WAVELAND_STATES, UP_SMASH_STATES]. Returns (replay, port, start,
+    # stop) of every whole match.
+    def find_sequence(self, char, steps, max_gap=0):
+        steps = [s if isinstance(s, (list, tuple, set)) else (s,) for s in steps]
+        match = self.find_any(char, steps[0])
+        for step in steps[1:]:
+            nxt = self.find_any(char, step)
+            if not len(nxt["start"]):
+                return {name: a[:0] for name, a in match.items()}
+
+            # One sortable key per run, the player's slot first and the frame below it, so
+            # runs of different players are always further apart than max_gap
+            next_key = _run_key(nxt["replay"], nxt["port"], nxt["start"])
+            end_key = _run_key(match["replay"], match["port"], match["stop"])
+            j = np.minimum(np.searchsorted(next_key, end_key), len(next_key) - 1)
+            ok = (next_key[j] >= end_key) & (next_key[j] - end_key <= max_gap)
+            match = {
+                "replay": match["replay"][ok],
+                "port": match["port"][ok],
+                "start": match["start"][ok],
+                "stop": nxt["stop"][j[ok]],
+            }
+        return match
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for encoded in self.postings.values() for a in encoded)
+
+    def save(self, file_path):
+        keys = sorted(self.postings)
+        arrays = {"keys": np.array(keys, dtype=np.int64).reshape(-1, 2)}
+        for k, key in enumerate(keys):
+            for name, a in zip(("replay", "port", "start", "length"), self.postings[key]):
+                arrays[f"{k}_{name}"] = a
+        arrays["replays"] = np.frombuffer(json.dumps(self.replays).encode(), dtype=np.uint8)
+        np.savez_compressed(file_path, **arrays)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            replays = json.loads(data["replays"].tobytes().decode())
+            postings = {
+                (int(c), int(s)): tuple(
+                    data[f"{k}_{name}"] for name in ("replay", "port", "start", "length")
+                )
+                for k, (c, s) in enumerate(data["keys"])
+            }
+        return cls(replays, postings)
+
+
+# Builds an ActionIndex over every replay under paths, the runs are extracted on a process pool.
+# Replays that fail to read are left out and returned as BatchResults with the index.
+def build_action_index(paths, config_dir="configs", workers=None):
+    names = list()
+    runs = list()
+    errors = list()
+    for result in batch_apply(paths, action_runs, (config_dir,), workers=workers):
+        if result.error is not None:
+            errors.append(result)
+            continue
+        names.append(result.name)
+        runs.append(result.result)
+    return ActionIndex.from_runs(names, runs), errors
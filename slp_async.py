@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from slp_batch import BatchResult, parse_source
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+# Chunked file read where every chunk is read on the default thread pool, so a slow disk
+# never stalls the event loop
+async def read_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    loop = asyncio.get_running_loop()
+    chunks = list()
+    f = await loop.run_in_executor(None, open, path, "rb")
+    try:
+        while chunk := await loop.run_in_executor(None, f.read, chunk_size):
+            chunks.append(chunk)
+    finally:
+        f.close()
+    return b"".join(chunks)
+
+
+async def read_stream(reader, chunk_size=DEFAULT_CHUNK_SIZE):
+    chunks = list()
+    while chunk := await reader.read(chunk_size):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def read_tcp(host, port, chunk_size=DEFAULT_CHUNK_SIZE):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return await read_stream(reader, chunk_size)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+# Local stand-in for an uploader: every connection gets buf streamed in chunk_size pieces,
+# with an optional delay between them, then the connection is closed
+async def serve_slp_bytes(
+    buf, host="127.0.0.1", port=0, chunk_size=DEFAULT_CHUNK_SIZE, delay=0.0
+):
+    async def handle(reader, writer):
+        for i in range(0, len(buf), chunk_size):
+            writer.write(buf[i : i + chunk_size])
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+        writer.close()
+        await writer.wait_closed()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+# Async front end over the parser. Decoding runs on a process pool; at most max_pending
+# replays are being decoded or waiting to be consumed, past that submit() waits, which is
+# the backpressure uploaders see. Results come out of `async for` in completion order.
+#
+#   async with AsyncIngest("configs") as ingest:
+#       await ingest.submit_file("game.slp")
+#       ingest.close()
+#       async for result in ingest:
+#           ...
+class AsyncIngest:
+    def __init__(
+        self,
+        config_dir="configs",
+        workers=None,
+        max_pending=None,
+        header_only=False,
+        fn=None,
+    ):
+        self.config_dir = config_dir
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending or 2 * self.workers
+        self.header_only = header_only
+        self.fn = fn
+
+        self.executor = None
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._results = asyncio.Queue()
+        self._outstanding = 0
+        self._closed = False
+
+    async def __aenter__(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.executor.shutdown)
+
+    async def submit(self, name, buf):
+        if self._closed:
+            raise RuntimeError("Can't submit to a closed AsyncIngest")
+        await self._slots.acquire()
+        self._outstanding += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor,
+            parse_source,
+            name,
+            buf,
+            self.config_dir,
+            self.header_only,
+            self.fn,
+        )
+        future.add_done_callback(functools.partial(self._on_done, name))
+
+    def _on_done(self, name, future):
+        if future.cancelled():
+            result = BatchResult(name, error=asyncio.CancelledError())
+        elif future.exception():
+            # The pool itself failed (e.g. a worker died), parse errors come back in BatchResult
+            result = BatchResult(name, error=future.exception())
+        else:
+            result = future.result()
+        self._results.put_nowait(result)
+
+    async def submit_file(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        await self.submit(os.fspath(path), await read_file(path, chunk_size))
+
+    async def submit_stream(self, name, reader, chunk_size=DEFAULT_CHUNK_SIZE):
+        await self.submit(name, await read_stream(reader, chunk_size))
+
+    # Convenience for request/response style callers: submit one replay and wait for its result
+    async def parse(self, name, buf):
+        await self._slots.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor,
+                parse_source,
+                name,
+                buf,
+                self.config_dir,
+                self.header_only,
+                self.fn,
+            )
+        finally:
+            self._slots.release()
+
+    # No more submissions - iteration ends once everything already submitted has come out
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            # Wakes up a consumer that's waiting with nothing outstanding
+            self._results.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            if self._closed and self._outstanding == 0:
+                raise StopAsyncIteration
+            result = await self._results.get()
+            if result is not None:
+                break
+        self._outstanding -= 1
+        self._slots.release()
+        return result
@@ -0,0 +1,189 @@
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from slp_parse import SlpSchema
+from slp_validation import VALIDATION_CHEAP
+
+SLP_SUFFIX = ".slp"
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# Process pools work around the GIL at the cost of pickling every buffer and result. Thread
+# pools share everything, including the parsed schema, and scale on free-threaded builds.
+POOL_PROCESS = "process"
+POOL_THREAD = "thread"
+POOLS = {POOL_PROCESS: ProcessPoolExecutor, POOL_THREAD: ThreadPoolExecutor}
+
+
+@dataclass
+class BatchResult:
+    name: str
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+def _is_slp(name):
+    return name.lower().endswith(SLP_SUFFIX)
+
+
+# Every file under paths, directories are walked with their files in sorted order
+def walk_paths(paths):
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        path = os.fspath(path)
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def is_archive(path):
+    lower = path.lower()
+    return lower.endswith(".zip") or lower.endswith(TAR_SUFFIXES)
+
+
+# (name, bytes) for every replay under paths, bytes is None unless read. Archives only get
+# their member lists read if not read.
+def _sources(paths, read):
+    for path in walk_paths(paths):
+        lower = path.lower()
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(path) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and _is_slp(info.filename):
+                        yield os.path.join(path, info.filename), zf.read(info) if read else None
+        elif lower.endswith(TAR_SUFFIXES):
+            # Streaming mode, so compressed tars are decompressed once front to back
+            with tarfile.open(path, mode="r|*") as tf:
+                for member in tf:
+                    if member.isfile() and _is_slp(member.name):
+                        name = os.path.join(path, member.name)
+                        yield name, tf.extractfile(member).read() if read else None
+        elif lower.endswith(SLP_SUFFIX + ".gz"):
+            if not read:
+                yield path, None
+                continue
+            with gzip.open(path, "rb") as f:
+                yield path, f.read()
+        elif _is_slp(path):
+            if not read:
+                yield path, None
+                continue
+            with open(path, "rb") as f:
+                yield path, f.read()
+
+
+# Yields (name, bytes) for every replay under paths. Directories are walked, zip/tar/gzip
+# archives are read member by member straight into memory - nothing is extracted to disk.
+# Archive members are named "<archive path>/<member name>".
+def iter_replay_sources(paths):
+    return _sources(paths, read=True)
+
+
+def parse_replay_bytes(
+    buf, config_dir="configs", header_only=False, fn=None, validation=VALIDATION_CHEAP
+):
+    slp_bin = SlpSchema.shared(config_dir).session(validation=validation)
+    slp_bin.read(io.BytesIO(buf), header_only=header_only)
+    return fn(slp_bin) if fn else slp_bin
+
+
+def apply_source(name, buf, fn, args=()):
+    try:
+        return BatchResult(name, fn(buf, *args))
+    except Exception as e:
+        return BatchResult(name, error=e)
+
+
+def parse_source(name, buf, config_dir, header_only, fn, validation=VALIDATION_CHEAP):
+    return apply_source(
+        name, buf, parse_replay_bytes, (config_dir, header_only, fn, validation)
+    )
+
+
+# Names iter_replay_sources would give, without reading any replay. Archives only get their
+# member lists read.
+def list_replay_sources(paths):
+    for name, _ in _sources(paths, read=False):
+        yield name
+
+
+# Reads back a single replay by the name iter_replay_sources gave it, including members of
+# zip/tar archives ("<archive path>/<member name>")
+def read_replay_source(name):
+    name = os.fspath(name)
+    if os.path.isfile(name):
+        return next(iter_replay_sources([name]))[1]
+
+    archive = os.path.dirname(name)
+    while archive and not os.path.isfile(archive):
+        archive = os.path.dirname(archive)
+    if not archive:
+        raise FileNotFoundError(name)
+    member = os.path.relpath(name, archive).replace(os.sep, "/")
+    if archive.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive) as zf:
+            return zf.read(member)
+    with tarfile.open(archive, mode="r:*") as tf:
+        return tf.extractfile(member).read()
+
+
+# Runs fn(buf, *args) for every replay under paths on a process pool and yields a BatchResult
+# per replay in the order the sources were found. fn has to be a picklable, module-level
+# callable unless pool is POOL_THREAD. At most max_in_flight replay buffers are held in memory
+# at once. workers=0 runs everything in-process.
+def batch_apply(paths, fn, args=(), workers=None, max_in_flight=None, pool=POOL_PROCESS):
+    return apply_all(iter_replay_sources(paths), fn, args, workers, max_in_flight, pool)
+
+
+# batch_apply over any iterable of (name, item) pairs, fn gets called as fn(item, *args)
+def apply_all(sources, fn, args=(), workers=None, max_in_flight=None, pool=POOL_PROCESS):
+    if pool not in POOLS:
+        raise ValueError(f"Unknown pool {pool}, expected one of {list(POOLS)}")
+    if workers == 0:
+        for name, buf in sources:
+            yield apply_source(name, buf, fn, args)
+        return
+
+    workers = workers or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * workers
+    with POOLS[pool](max_workers=workers) as executor:
+        in_flight = deque()
+        for name, buf in sources:
+            in_flight.append(executor.submit(apply_source, name, buf, fn, args))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+# batch_apply with a full (or header_only) SlpBin parse. fn runs on the parsed SlpBin inside
+# the worker so only its result crosses the process boundary. Every worker parses into its own
+# session of one shared SlpSchema.
+def batch_read(
+    paths,
+    config_dir="configs",
+    header_only=False,
+    fn=None,
+    workers=None,
+    max_in_flight=None,
+    validation=VALIDATION_CHEAP,
+    pool=POOL_PROCESS,
+):
+    return batch_apply(
+        paths,
+        parse_replay_bytes,
+        (config_dir, header_only, fn, validation),
+        workers=workers,
+        max_in_flight=max_in_flight,
+        pool=pool,
+    )
@@ -0,0 +1,264 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+import struct
+import threading
+from dataclasses import fields
+
+from slp_dataclasses.common import (
+    ArrayData,
+    BinData,
+    BinPrimitive,
+    PadData,
+    StringData,
+    U8BitFlagData,
+)
+
+# Bump when the generated source changes, so stale cache entries are never loaded
+CODEGEN_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "slp_codegen")
+
+
+# Helpers the generated code calls into
+def _bits(x, n):
+    return [bool(x >> s & 1) for s in range(n - 1, -1, -1)]
+
+
+def _bits_to_int(flags):
+    x = 0
+    for flag in flags:
+        x = x << 1 | bool(flag)
+    return x
+
+
+def _fit(val, n):
+    # Zero-pad or crop to n elements, like ArrayData._write
+    val = list(val[:n])
+    return val + [0] * (n - len(val))
+
+
+def _as_bytes(val):
+    return val if isinstance(val, bytes) else bytes(val)
+
+
+def _str_bytes(val, n, write_null):
+    b = bytes(ord(c) for c in val)
+    return b[: n - 1] if write_null else b
+
+
+def _cp(o):
+    # Shallow copy without going through __reduce_ex__
+    c = object.__new__(type(o))
+    c.__dict__.update(o.__dict__)
+    return c
+
+
+HELPERS = {
+    "_bits": _bits,
+    "_bits_to_int": _bits_to_int,
+    "_fit": _fit,
+    "_as_bytes": _as_bytes,
+    "_str_bytes": _str_bytes,
+    "_cp": _cp,
+}
+
+
+# (attribute path, primitive) of every primitive read for given_version, in stream order.
+# Paths are python expressions relative to the object, e.g. "o.player_data[0].stage".
+def _flatten(o, given_version, path, out):
+    if isinstance(o, BinData):
+        for f in fields(o):
+            _flatten(getattr(o, f.name), given_version, f"{path}.{f.name}", out)
+    elif isinstance(o, BinPrimitive):
+        if not given_version or o.compare_version(given_version):
+            out.append((path, o))
+    elif isinstance(o, list):
+        for i, e in enumerate(o):
+            _flatten(e, given_version, f"{path}[{i}]", out)
+    else:
+        raise NotImplementedError(f"No codegen implementation for {type(o)}")
+    return out
+
+
+def flatten(template, given_version, ignore_fields=()):
+    out = list()
+    for f in fields(template):
+        if f.name not in ignore_fields:
+            _flatten(getattr(template, f.name), given_version, f"o.{f.name}", out)
+    return out
+
+
+# Struct format, read statement and write expression of one primitive. {} in the read
+# statement is the slice of unpacked values, which is n values wide.
+def _primitive_code(path, prim):
+    fc = prim.format_char.lstrip("<>!=@")
+    if isinstance(prim, PadData):
+        return f"{prim.len}s", 1, f"{path}.val = {{}}", f"_as_bytes({path}.val)"
+    if isinstance(prim, StringData):
+        return (
+            f"{prim.len}s",
+            1,
+            f"{path}.val = {{}}.decode('latin-1')",
+            f"_str_bytes({path}.val, {prim.len}, {prim.write_null})",
+        )
+    if isinstance(prim, ArrayData):
+        return (
+            f"{prim.len}{fc}",
+            prim.len,
+            f"{path}.val = list({{}})",
+            f"*_fit({path}.val, {prim.len})",
+        )
+    if isinstance(prim, U8BitFlagData):
+        return (
+            fc,
+            1,
+            f"{path}.val = _bits({{}}, {prim.bitflag_len})",
+            f"_bits_to_int({path}.val)",
+        )
+    if type(prim).read is BinPrimitive.read:
+        return fc, 1, f"{path}.val = {{}}", f"{path}.val"
+    raise NotImplementedError(f"No codegen implementation for {type(prim)}")
+
+
+# Statements that copy every node of o into c, a straight-line stand-in for copy.deepcopy of a
+# template. Covers all fields regardless of version, list vals get copied too.
+def _clone_lines(o, path, out):
+    if isinstance(o, BinData):
+        out.append(f"    c{path} = _cp(c{path})")
+        for f in fields(o):
+            _clone_lines(getattr(o, f.name), f"{path}.{f.name}", out)
+    elif isinstance(o, BinPrimitive):
+        out.append(f"    c{path} = _cp(c{path})")
+        if isinstance(o.val, list):
+            out.append(f"    c{path}.val = list(c{path}.val)")
+    elif isinstance(o, list):
+        out.append(f"    c{path} = list(c{path})")
+        for i, e in enumerate(o):
+            _clone_lines(e, f"{path}[{i}]", out)
+    else:
+        raise NotImplementedError(f"No codegen implementation for {type(o)}")
+    return out
+
+
+def generate_source(template, given_version, ignore_fields=()):
+    fmt = ">"
+    reads = list()
+    writes = list()
+    n_values = 0
+    for path, prim in flatten(template, given_version, ignore_fields):
+        fc, n, read, write = _primitive_code(path, prim)
+        fmt += fc
+        value = f"v[{n_values}]" if n == 1 else f"v[{n_values}:{n_values + n}]"
+        reads.append("    " + read.format(value))
+        writes.append(f"        {write},")
+        n_values += n
+
+    size = struct.calcsize(fmt)
+    lines = [
+        f"# {type(template).__name__}, version {given_version}, ignoring {list(ignore_fields)}",
+        f"SIZE = {size}",
+        f"_S = _struct.Struct({fmt!r})",
+        "",
+        "def read(o, stream):",
+        "    v = _S.unpack(stream.read(SIZE))",
+        *reads,
+        "",
+        "def unpack_from(o, buf, offset=0):",
+        "    v = _S.unpack_from(buf, offset)",
+        *reads,
+        "",
+        "def pack(o):",
+        "    return _S.pack(",
+        *writes,
+        "    )",
+        "",
+        "def write(o, stream):",
+        "    stream.write(pack(o))",
+        "",
+        "def clone(o):",
+        "    c = _cp(o)",
+        *_clone_lines(template, "", list())[1:],
+        "    return c",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+# Everything the generated code depends on: field order, types, formats, lengths and version
+# gates as resolved for given_version, plus the interpreter's bytecode format
+def schema_hash(template, given_version, ignore_fields=()):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(importlib.util.MAGIC_NUMBER)
+    h.update(f"{CODEGEN_VERSION}|{type(template).__qualname__}|{given_version}|{ignore_fields}".encode())
+    # Gated out fields still matter to clone
+    for path, prim in flatten(template, None) + flatten(template, given_version, ignore_fields):
+        h.update(
+            f"{path}|{type(prim).__qualname__}|{prim.format_char}|{getattr(prim, 'len', '')}"
+            f"|{getattr(prim, 'bitflag_len', '')}|{getattr(prim, 'write_null', '')}\n".encode()
+        )
+    return h.hexdigest()
+
+
+class Codec:
+    def __init__(self, namespace, key):
+        self.key = key
+        self.size = namespace["SIZE"]
+        self.read = namespace["read"]
+        self.unpack_from = namespace["unpack_from"]
+        self.pack = namespace["pack"]
+        self.write = namespace["write"]
+        self.clone = namespace["clone"]
+
+
+def _load_code(code, key):
+    namespace = {"_struct": struct, **HELPERS}
+    exec(code, namespace)
+    return Codec(namespace, key)
+
+
+_codecs = dict()
+_codecs_lock = threading.Lock()
+
+
+# Codec with straight-line read/write functions for template's type at given_version. Codecs
+# are memoized per process and their compiled code is cached on disk (cache_dir=None uses
+# SLP_CODEGEN_CACHE or ~/.cache/slp_codegen, cache_dir=False disables the disk cache), so cold
+# workers unmarshal the code instead of generating and compiling it again. Safe to call from
+# several threads, each codec is only built once.
+def get_codec(template, given_version, ignore_fields=(), cache_dir=None):
+    ignore_fields = tuple(ignore_fields)
+    key = schema_hash(template, given_version, ignore_fields)
+    codec = _codecs.get(key)
+    if codec is not None:
+        return codec
+    with _codecs_lock:
+        if key not in _codecs:
+            _codecs[key] = _build_codec(template, given_version, ignore_fields, key, cache_dir)
+        return _codecs[key]
+
+
+def _build_codec(template, given_version, ignore_fields, key, cache_dir):
+    if cache_dir is None:
+        cache_dir = os.environ.get("SLP_CODEGEN_CACHE", DEFAULT_CACHE_DIR)
+    cache_path = os.path.join(cache_dir, key + ".marshal") if cache_dir else None
+
+    code = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                code = marshal.load(f)
+        except (EOFError, ValueError, TypeError):
+            # Truncated or from another interpreter - regenerate
+            code = None
+    if code is None:
+        source = generate_source(template, given_version, ignore_fields)
+        code = compile(source, f"<slp_codegen {type(template).__name__} {given_version}>", "exec")
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                marshal.dump(code, f)
+            os.replace(tmp_path, cache_path)
+
+    return _load_code(code, key)
@@ -1,6 +1,7 @@
+import io
 import struct
 from dataclasses import dataclass, field, fields
-from typing import List, Union
+from typing import ClassVar, List, Union
 
 from packaging import version
 
@@ -25,7 +26,10 @@ class BinData:
 
     @staticmethod
     def recursive_write(o, stream, given_version):
-        if isinstance(o, BinData):
+        if isinstance(o, LazyBinData):
+            # Writes its untouched fields straight from the raw bytes
+            o.write(stream, given_version)
+        elif isinstance(o, BinData):
             for f in fields(o):
                 attr = getattr(o, f.name)
                 BinData.recursive_write(attr, stream, given_version)
@@ -37,6 +41,36 @@ class BinData:
         else:
             raise NotImplementedError(f"No read implementation for {type(o)}")
 
+    # Byte layout of o for a given version, as a list of (name, offset, primitive) in read order.
+    # Nested fields get dotted names and list elements their index, e.g. "player_data.0.stage".
+    @staticmethod
+    def recursive_layout(o, given_version, prefix="", offset=0, layout=None):
+        if layout is None:
+            layout = list()
+        if isinstance(o, BinData):
+            for f in fields(o):
+                attr = getattr(o, f.name)
+                offset = BinData.recursive_layout(
+                    attr, given_version, prefix + f.name + ".", offset, layout
+                )
+        elif isinstance(o, BinPrimitive):
+            if not given_version or o.compare_version(given_version):
+                layout.append((prefix[:-1], offset, o))
+                offset += o.size()
+        elif isinstance(o, list):
+            for i, e in enumerate(o):
+                offset = BinData.recursive_layout(
+                    e, given_version, prefix + str(i) + ".", offset, layout
+                )
+        else:
+            raise NotImplementedError(f"No layout implementation for {type(o)}")
+        return offset
+
+    def layout(self, given_version):
+        layout = list()
+        BinData.recursive_layout(self, given_version, layout=layout)
+        return layout
+
     def read(self, stream, given_version, ignore_fields=[]):
         BinData.recursive_read(self, stream, given_version, ignore_fields)
 
@@ -44,6 +78,123 @@ class BinData:
         BinData.recursive_write(self, stream, given_version)
 
 
+# Field values of o, without decoding anything a LazyBinData still holds as raw bytes
+def _field_values(o):
+    if isinstance(o, LazyBinData):
+        return [o._template(f.name) for f in fields(o)]
+    return [getattr(o, f.name) for f in fields(o)]
+
+
+# Bytes o takes up in a payload of given_version
+def _byte_size(o, given_version):
+    if isinstance(o, BinData):
+        return sum(_byte_size(v, given_version) for v in _field_values(o))
+    elif isinstance(o, BinPrimitive):
+        return o.size() if not given_version or o.compare_version(given_version) else 0
+    elif isinstance(o, list):
+        return sum(_byte_size(e, given_version) for e in o)
+    raise NotImplementedError(f"No size implementation for {type(o)}")
+
+
+# The lengths of every array in o, which together with the class and version fix its layout
+def _shape(o):
+    if isinstance(o, BinData):
+        return tuple(_shape(v) for v in _field_values(o))
+    elif isinstance(o, list):
+        return (len(o),) + tuple(_shape(e) for e in o)
+    return ()
+
+
+# BinData that only reads its raw bytes. Each field is decoded into its template the first
+# time it's accessed (see __getattr__) and cached as a regular attribute from then on. Fields
+# that are LazyBinData themselves, or lists of them, are only pointed at their bytes when
+# accessed, so touching one nested field decodes only that field.
+@dataclass
+class LazyBinData(BinData):
+    # (class, version, ignore_fields, array lengths) -> [(field name, start, end, element
+    # spans)] of each field's bytes in the payload. Element spans are only there for lists of
+    # LazyBinData. Shared by every read of the same layout.
+    _span_cache: ClassVar[dict] = {}
+
+    # A field's template, whether it's been decoded or not
+    def _template(self, name):
+        lazy = self.__dict__.get("_lazy")
+        if lazy and name in lazy:
+            return lazy[name][0]
+        return self.__dict__[name]
+
+    def _spans(self, given_version, ignore_fields):
+        key = (type(self), given_version, tuple(ignore_fields), _shape(self))
+        spans = LazyBinData._span_cache.get(key)
+        if spans is None:
+            spans = list()
+            offset = 0
+            for f in fields(self):
+                if f.name in ignore_fields:
+                    continue
+                template = self._template(f.name)
+                elements = None
+                if isinstance(template, list) and any(
+                    isinstance(e, LazyBinData) for e in template
+                ):
+                    elements = list()
+                    element_start = offset
+                    for e in template:
+                        element_end = element_start + _byte_size(e, given_version)
+                        elements.append((element_start, element_end))
+                        element_start = element_end
+                end = offset + _byte_size(template, given_version)
+                spans.append((f.name, offset, end, elements))
+                offset = end
+            LazyBinData._span_cache[key] = spans
+        return spans
+
+    # Points every field at its bytes in raw, which start at base. Nothing is decoded.
+    def attach(self, raw, base, given_version, ignore_fields=()):
+        lazy = self.__dict__.setdefault("_lazy", dict())
+        for name, start, end, elements in self._spans(given_version, ignore_fields):
+            template = self.__dict__.pop(name) if name in self.__dict__ else lazy[name][0]
+            lazy[name] = (template, base + start, base + end, elements)
+        self._raw = raw
+        self._base = base
+        self._raw_version = given_version
+
+    # Only the raw bytes are read here
+    def read(self, stream, given_version, ignore_fields=[]):
+        spans = self._spans(given_version, ignore_fields)
+        raw = stream.read(spans[-1][2] if spans else 0)
+        self.attach(raw, 0, given_version, ignore_fields)
+
+    def __getattr__(self, name):
+        # Only called when normal lookup fails, i.e. for fields that haven't been decoded yet
+        lazy = self.__dict__.get("_lazy")
+        if not lazy or name not in lazy:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        template, start, end, elements = lazy.pop(name)
+        if isinstance(template, LazyBinData):
+            template.attach(self._raw, start, self._raw_version)
+        elif elements is not None:
+            for e, (element_start, _) in zip(template, elements):
+                e.attach(self._raw, self._base + element_start, self._raw_version)
+        else:
+            BinData.recursive_read(template, io.BytesIO(self._raw[start:end]), self._raw_version)
+        setattr(self, name, template)
+        return template
+
+    def is_decoded(self, name):
+        return name not in self.__dict__.get("_lazy", ())
+
+    # Fields that were never accessed are written back as the bytes they were read from
+    def write(self, stream, given_version):
+        lazy = self.__dict__.get("_lazy", dict())
+        for f in fields(self):
+            if f.name in lazy and given_version == self._raw_version:
+                _, start, end, _ = lazy[f.name]
+                stream.write(self._raw[start:end])
+            else:
+                BinData.recursive_write(getattr(self, f.name), stream, given_version)
+
+
 @dataclass(kw_only=True)
 class BinPrimitive:
     val: Union[float, int, str]
@@ -54,6 +205,9 @@ class BinPrimitive:
     def compare_version(self, given_ver):
         return version.parse(self.version) <= version.parse(given_ver)
 
+    def size(self):
+        return struct.calcsize(self.format_char)
+
     def _read(self, stream):
         size = struct.calcsize(self.format_char)
         buf = stream.read(size)
@@ -148,11 +302,14 @@ class U8BitFlagData(BinPrimitive):
             )
         self.val = [False if c == "0" else True for c in binary]
 
+    # The bitfield packed back into an int, first flag is the most significant bit
+    def to_int(self):
+        return int("".join([str(int(v)) for v in self.val]), 2)
+
     def write(self, stream, given_version):
         if given_version and not self.compare_version(given_version):
             return
-        b = int("".join([str(int(v)) for v in self.val]), 2)
-        stream.write(struct.pack(self.format_char, b))
+        stream.write(struct.pack(self.format_char, self.to_int()))
 
 
 @dataclass(kw_only=True)
@@ -175,6 +332,9 @@ class ArrayData(BinPrimitive):
     len: int
     format_char: str = ">B"
 
+    def size(self):
+        return struct.calcsize(self.format_char) * self.len
+
     def _read(self, stream):
         size = struct.calcsize(self.format_char) * self.len
         buf = stream.read(size)
@@ -198,6 +358,15 @@ class ArrayData(BinPrimitive):
         stream.write(b_array)
 
 
+# Padding and unknown bytes - kept as the raw bytes they were read as, never unpacked
+@dataclass(kw_only=True)
+class PadData(ArrayData):
+    val: Union[bytes, List[int]]
+
+    def _read(self, stream):
+        return stream.read(self.size())
+
+
 @dataclass(kw_only=True)
 class StringData(ArrayData):
     write_null: bool = False
@@ -1,6 +1,6 @@
-from itertools import zip_longest
 from typing import Union
 
+from slp_dataclasses.common import U8BitFlagData
 from slp_dataclasses.framebookend import FrameBookend
 from slp_dataclasses.framestart import FrameStart
 from slp_dataclasses.postframeupdate import PostFrameUpdate
@@ -11,34 +11,69 @@ from slp_dataclasses.preframeupdate import PreFrameUpdate
 FRAME_OFFSET = 123
 
 
+# Frames of every player, keyed by (port, is_follower). A player only gets a list once its
+# first frame arrives, so a 1v1 holds two lists and Ice Climbers' followers get their own.
 class PrePostFrameList:
     def __init__(self):
-        self.flist: list[list[Union[PreFrameUpdate, PostFrameUpdate]]] = [
-            [],
-            [],
-            [],
-            [],
-        ]
+        self.players: dict[tuple[int, int], list[Union[PreFrameUpdate, PostFrameUpdate]]] = dict()
+        # Sorted keys, the order players' events come in within a frame
+        self.keys: list[tuple[int, int]] = list()
 
     def add_frame(self, f: Union[PreFrameUpdate, PostFrameUpdate]):
-        p_index = f.player_index.val
+        key = (f.player_index.val, f.is_follower.val)
         frame_num = f.frame_number.val + FRAME_OFFSET
-        sub_list = self.flist[p_index]
+        sub_list = self.players.get(key)
+        if sub_list is None:
+            sub_list = self.players[key] = list()
+            self.keys = sorted(self.players)
 
         # TODO: I think this is how rollback works? If frame_number decreases, there's been a rollback
         if frame_num == len(sub_list):
             sub_list.append(f)
+        elif frame_num > len(sub_list):
+            # A player showing up after the first frame
+            sub_list.extend([None] * (frame_num - len(sub_list)))
+            sub_list.append(f)
         else:
             sub_list[frame_num] = f
 
     def __len__(self):
-        return max([len(x) for x in self.flist])
+        return max((len(x) for x in self.players.values()), default=0)
 
-    # Iterate over frame numbers
+    def ports(self):
+        return sorted({port for port, _ in self.keys})
+
+    # Iterate over frame numbers, every frame is a tuple of the players that have an event on
+    # it in (port, is_follower) order
     def __iter__(self):
-        # for (f0, f1, f2, f3) in zip_longest(self.flist):
-        for f in zip_longest(*self.flist):
-            yield f
+        sub_lists = [self.players[k] for k in self.keys]
+        for i in range(len(self)):
+            yield tuple(
+                sub_list[i]
+                for sub_list in sub_lists
+                if i < len(sub_list) and sub_list[i] is not None
+            )
+
+    # Per-port dict of field name -> 1D array over that port's frames, frame order.
+    # Bitfields come out packed into ints, ports without frames are left out. Only leaders
+    # unless include_followers, then keys are (port, is_follower) instead of port.
+    def to_columns(self, field_names, include_followers=False):
+        import numpy as np
+
+        columns = dict()
+        for key in self.keys:
+            if key[1] and not include_followers:
+                continue
+            frames = [f for f in self.players[key] if f is not None]
+            columns[key if include_followers else key[0]] = {
+                name: np.array([_column_value(getattr(f, name)) for f in frames])
+                for name in field_names
+            }
+        return columns
+
+
+def _column_value(data):
+    return data.to_int() if isinstance(data, U8BitFlagData) else data.val
 
 
 class StartBookendFrameList:
@@ -2,9 +2,10 @@ from dataclasses import dataclass
 from typing import List
 
 from .common import (
-    ArrayData,
     BinData,
     F32Data,
+    LazyBinData,
+    PadData,
     S8Data,
     ShiftJISStringData,
     StringData,
@@ -23,55 +24,57 @@ class Version(BinData):
     unused: U8Data
 
 
+# GameStart, its GameInfoBlock and every PlayerData in it are decoded a field at a time, the
+# first time each field is accessed (see LazyBinData)
 @dataclass
-class PlayerData(BinData):
+class PlayerData(LazyBinData):
     external_character_id: U8Data
     player_type: U8Data
     stock_start_count: U8Data
     costume_index: U8Data
-    gib_pad_x64: ArrayData
+    gib_pad_x64: PadData
     team_shade: U8Data
     handicap: U8Data
     team_id: U8Data
-    gib_pad_x6A: ArrayData
+    gib_pad_x6A: PadData
     player_bitfield: U8BitFlagData
-    gib_pad_x6D: ArrayData
+    gib_pad_x6D: PadData
     cpu_level: U8Data
     damage_start: U16Data
     damage_spawn: U16Data
-    gib_pad_x74: ArrayData
+    gib_pad_x74: PadData
     offense_ratio: F32Data
     defense_ratio: F32Data
     model_scale: F32Data
 
 
 @dataclass
-class GameInfoBlock(BinData):
+class GameInfoBlock(LazyBinData):
     game_bitfield_1: U8BitFlagData
     game_bitfield_2: U8BitFlagData
     game_bitfield_3: U8BitFlagData
     game_bitfield_4: U8BitFlagData
-    gib_pad_x04: ArrayData
+    gib_pad_x04: PadData
     bomb_rain: U8Data
     gib_pad_x07: U8Data
     is_teams: U8Data
-    gib_pad_x09: ArrayData
+    gib_pad_x09: PadData
     item_spawn_behavior: S8Data
     self_destruct_score_value: S8Data
     gib_pad_x0D: U8Data
     stage: U16Data
     game_timer: U32Data
-    gib_pad_x11: ArrayData
+    gib_pad_x11: PadData
     item_spawn_bitfield_1: U8BitFlagData
     item_spawn_bitfield_2: U8BitFlagData
     item_spawn_bitfield_3: U8BitFlagData
     item_spawn_bitfield_4: U8BitFlagData
     item_spawn_bitfield_5: U8BitFlagData
-    gib_pad_x28: ArrayData
+    gib_pad_x28: PadData
     unk_float_x3C: F32Data
     damage_ratio: F32Data
     unk_float_x44: F32Data
-    gib_pad_x34: ArrayData
+    gib_pad_x34: PadData
     player_data: List[PlayerData]
 
 
@@ -96,7 +99,7 @@ class ConnectCode(BinData):
 
 
 @dataclass
-class GameStart(BinData):
+class GameStart(LazyBinData):
     command_byte: U8Data
     version: Version
     game_info_block: GameInfoBlock
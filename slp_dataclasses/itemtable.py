@@ -0,0 +1,91 @@
+import numpy as np
+
+ITEM_TABLE_DTYPES = {
+    "frame_number": np.int32,
+    "spawn_id": np.uint32,
+    "type_id": np.int16,
+    "state": np.uint8,
+    "owner": np.int8,
+    "x_position": np.float32,
+    "y_position": np.float32,
+    "x_velocity": np.float32,
+    "y_velocity": np.float32,
+    "damage_taken": np.uint16,
+    "expiration_timer": np.float32,
+}
+
+
+# Columnar item updates sorted by (spawn_id, frame_number). Every item's rows are contiguous,
+# starts[i]:ends[i] is the row range of spawn_ids[i], so per-item queries are slices and
+# per-item aggregates are single vectorized ops over those ranges.
+class ItemTable:
+    def __init__(self, columns: dict):
+        order = np.lexsort((columns["frame_number"], columns["spawn_id"]))
+        self.columns = {name: col[order] for name, col in columns.items()}
+
+        self.spawn_ids, self.starts, counts = np.unique(
+            self.columns["spawn_id"], return_index=True, return_counts=True
+        )
+        self.ends = self.starts + counts
+
+    @classmethod
+    def from_rows(cls, rows, column_names):
+        values = list(zip(*rows)) if rows else [()] * len(column_names)
+        return cls(
+            {
+                name: np.array(v, dtype=ITEM_TABLE_DTYPES.get(name))
+                for name, v in zip(column_names, values)
+            }
+        )
+
+    def __len__(self):
+        return len(self.columns["spawn_id"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def item_rows(self, spawn_id):
+        i = np.searchsorted(self.spawn_ids, spawn_id)
+        if i == len(self.spawn_ids) or self.spawn_ids[i] != spawn_id:
+            raise KeyError(f"No item with spawn_id {spawn_id}")
+        return slice(int(self.starts[i]), int(self.ends[i]))
+
+    # Frame numbers and positions of one item, in frame order
+    def trajectory(self, spawn_id):
+        rows = self.item_rows(spawn_id)
+        return (
+            self.columns["frame_number"][rows],
+            self.columns["x_position"][rows],
+            self.columns["y_position"][rows],
+        )
+
+    # One entry per item: its type, owner (taken from its first update), first and last frame
+    def lifetimes(self):
+        frames = self.columns["frame_number"]
+        return {
+            "spawn_id": self.spawn_ids,
+            "type_id": self.columns["type_id"][self.starts],
+            "owner": self.columns["owner"][self.starts],
+            "first_frame": frames[self.starts],
+            "last_frame": frames[self.ends - 1],
+            "n_frames": self.ends - self.starts,
+        }
+
+    def owners(self):
+        return self.columns["owner"][self.starts]
+
+    def spawn_ids_of_type(self, type_id):
+        return self.spawn_ids[self.columns["type_id"][self.starts] == type_id]
+
+    def spawn_ids_of_owner(self, owner):
+        return self.spawn_ids[self.owners() == owner]
+
+    # Total distance travelled by every item, summed over consecutive updates of that item
+    def path_lengths(self):
+        x = self.columns["x_position"].astype(np.float64)
+        y = self.columns["y_position"].astype(np.float64)
+        step = np.hypot(np.diff(x), np.diff(y))
+        # Steps that cross from one item to the next don't count
+        step[self.starts[1:] - 1] = 0.0
+        item_of_step = np.repeat(np.arange(len(self.spawn_ids)), self.ends - self.starts)[:-1]
+        return np.bincount(item_of_step, weights=step, minlength=len(self.spawn_ids))
@@ -30,24 +30,59 @@ class ItemUpdate(BinData):
 FRAME_OFFSET = 123
 
 
+# Fields copied into the item-centric table while parsing, see ItemList.table
+ITEM_TABLE_COLUMNS = (
+    "frame_number",
+    "spawn_id",
+    "type_id",
+    "state",
+    "owner",
+    "x_position",
+    "y_position",
+    "x_velocity",
+    "y_velocity",
+    "damage_taken",
+    "expiration_timer",
+)
+
+
 class ItemList:
     def __init__(self):
         self.ilist: list[list[ItemUpdate]] = [[]]
         self.counter = 0
 
+        # Row-wise copy of ITEM_TABLE_COLUMNS for every item, plus the first row of every frame
+        # so a rollback can drop the rows it replaces
+        self.rows: list[tuple] = []
+        self.frame_row_starts: list[int] = [0]
+        self._table = None
+
     def add_item(self, i: ItemUpdate):
         frame_num = i.frame_number.val + FRAME_OFFSET
         if frame_num > self.counter:
             for _ in range(frame_num - self.counter):
                 self.ilist.append([])
+                self.frame_row_starts.append(len(self.rows))
             self.counter = frame_num
         # TODO: I think this is how rollback works? If frame_number decreases, there's been a rollback
         elif frame_num < self.counter:
             self.ilist = self.ilist[:frame_num]
             self.ilist.append([])
+            del self.rows[self.frame_row_starts[frame_num] :]
+            del self.frame_row_starts[frame_num + 1 :]
             self.counter = frame_num
 
         self.ilist[self.counter].append(i)
+        self.rows.append(tuple(getattr(i, c).val for c in ITEM_TABLE_COLUMNS))
+        self._table = None
+
+    # Item-centric columnar view sorted by (spawn_id, frame_number), built on first use
+    def table(self):
+        from .itemtable import ItemTable
+
+        if self._table is None:
+            self._table = ItemTable.from_rows(self.rows, ITEM_TABLE_COLUMNS)
+        return self._table
 
     def __len__(self):
         return self.counter
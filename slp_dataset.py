@@ -0,0 +1,178 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from slp_batch import batch_read
+from slp_quantize import EXPORT_FLOAT32, check_mode, dequantize, encoding_metadata
+
+MANIFEST_NAME = "manifest.json"
+SHARD_NAME = "shard_{:05d}.npy"
+
+
+# Per-replay record computed inside batch workers, so only arrays cross the process boundary.
+# Frames are already encoded in the export mode there, so they cross it in their smaller dtypes.
+def replay_record(slp_bin, mode=EXPORT_FLOAT32):
+    players = [
+        p_index
+        for p_index, player in enumerate(slp_bin.game_start.game_info_block.player_data[:4])
+        if player.player_type.val != 3
+    ]
+    return {
+        "frames": slp_bin.to_player_numpy(mode),
+        "players": players,
+        "characters": [
+            slp_bin.game_start.game_info_block.player_data[p].external_character_id.val
+            for p in players
+        ],
+        "stage": slp_bin.game_start.game_info_block.stage.val,
+    }
+
+
+# Write to a temporary name and rename, so a shard or manifest is either complete or absent
+def atomic_save(file_path, arr):
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp_path, file_path)
+
+
+def atomic_write_json(file_path, obj):
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, file_path)
+
+
+# Writes every replay under paths into .npy shards of (rows, 4, features) float32 plus a
+# manifest of which rows belong to which replay. A replay never straddles two shards, shards
+# are closed once the next replay wouldn't fit in rows_per_shard (a replay longer than that
+# gets a shard of its own). With EXPORT_NATIVE or EXPORT_QUANTIZED the shards hold (rows, 4)
+# structured arrays instead and the manifest's "encoding" has the dtypes, scales and offsets.
+def export_dataset(
+    paths,
+    out_dir,
+    config_dir="configs",
+    rows_per_shard=1 << 18,
+    workers=None,
+    mode=EXPORT_FLOAT32,
+):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        "shards": [],
+        "replays": [],
+        "errors": [],
+        "encoding": encoding_metadata(check_mode(mode)),
+    }
+    pending = list()
+    pending_rows = 0
+
+    def flush():
+        nonlocal pending, pending_rows
+        if not pending:
+            return
+        shard_name = SHARD_NAME.format(len(manifest["shards"]))
+        atomic_save(os.path.join(out_dir, shard_name), np.concatenate(pending))
+        manifest["shards"].append({"file": shard_name, "rows": pending_rows})
+        pending = list()
+        pending_rows = 0
+
+    fn = replay_record if mode == EXPORT_FLOAT32 else partial(replay_record, mode=mode)
+    for result in batch_read(paths, config_dir, fn=fn, workers=workers):
+        if result.error is not None:
+            manifest["errors"].append({"replay": result.name, "error": repr(result.error)})
+            continue
+
+        frames = result.result["frames"]
+        if pending_rows and pending_rows + len(frames) > rows_per_shard:
+            flush()
+        # Always the decoded (4, features) shape
+        manifest["feature_shape"] = [frames.shape[1], len(manifest["encoding"]["features"])]
+        manifest["replays"].append(
+            {
+                "replay": result.name,
+                "shard": len(manifest["shards"]),
+                "start": pending_rows,
+                "stop": pending_rows + len(frames),
+                "players": result.result["players"],
+                "characters": result.result["characters"],
+                "stage": result.result["stage"],
+            }
+        )
+        pending.append(frames)
+        pending_rows += len(frames)
+    flush()
+
+    atomic_write_json(os.path.join(out_dir, MANIFEST_NAME), manifest)
+    return manifest
+
+
+# Samples fixed-length frame windows uniformly over every valid window position of every
+# replay in an exported dataset. Shards are memory-mapped, so only the sampled windows are
+# ever read, and batches are assembled ahead of time on a thread pool. Batches are always
+# float32, windows of native or quantized shards are decoded as they're gathered.
+class WindowLoader:
+    def __init__(
+        self, dataset_dir, window, batch_size, prefetch=4, workers=2, seed=None
+    ):
+        with open(os.path.join(dataset_dir, MANIFEST_NAME), "r") as f:
+            self.manifest = json.load(f)
+        self.shards = [
+            np.load(os.path.join(dataset_dir, s["file"]), mmap_mode="r")
+            for s in self.manifest["shards"]
+        ]
+        # Datasets from before encodings were recorded are float32
+        self.encoding = self.manifest.get("encoding", encoding_metadata(EXPORT_FLOAT32))
+        self.window = window
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.rng = np.random.default_rng(seed)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.replays = [
+            r for r in self.manifest["replays"] if r["stop"] - r["start"] >= window
+        ]
+        if not self.replays:
+            raise ValueError(f"No replay has at least {window} frames")
+        n_windows = np.array([r["stop"] - r["start"] - window + 1 for r in self.replays])
+        self.window_offsets = np.concatenate([[0], np.cumsum(n_windows)])
+
+    def __len__(self):
+        # Number of distinct windows
+        return int(self.window_offsets[-1])
+
+    def _positions(self, n):
+        # Draw on the calling thread so the sequence only depends on the seed
+        picks = self.rng.integers(0, len(self), size=n)
+        replay_i = np.searchsorted(self.window_offsets, picks, side="right") - 1
+        return replay_i, picks - self.window_offsets[replay_i]
+
+    def _gather(self, replay_i, starts):
+        feature_shape = self.manifest["feature_shape"]
+        batch = np.empty((len(replay_i), self.window, *feature_shape), dtype=np.float32)
+        for b, (r, start) in enumerate(zip(replay_i, starts)):
+            replay = self.replays[r]
+            row = replay["start"] + start
+            batch[b] = dequantize(
+                self.shards[replay["shard"]][row : row + self.window], self.encoding
+            )
+        return batch, replay_i, starts
+
+    def sample_batch(self):
+        return self._gather(*self._positions(self.batch_size))
+
+    # Endless stream of (batch, replay indices, window starts) with prefetch batches in flight
+    def __iter__(self):
+        queued = deque()
+        while True:
+            while len(queued) < self.prefetch:
+                queued.append(
+                    self.executor.submit(self._gather, *self._positions(self.batch_size))
+                )
+            yield queued.popleft().result()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,163 @@
+import argparse
+import io
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+import numpy as np
+
+from slp_index import NO_FRAME_NUMBER, EventIndex
+from slp_parse import SlpBin
+
+
+@dataclass
+class FieldDiff:
+    name: str
+    a: Any
+    b: Any
+
+
+@dataclass
+class EventDiff:
+    # Position in both event indexes - events are compared in lockstep, so they're the same
+    index: int
+    cmd_byte_a: Optional[int]
+    cmd_byte_b: Optional[int]
+    frame_number: Optional[int] = None
+    fields: List[FieldDiff] = field(default_factory=list)
+
+
+@dataclass
+class ReplayDiff:
+    n_events_a: int
+    n_events_b: int
+    events: List[EventDiff] = field(default_factory=list)
+    metadata_equal: bool = True
+    truncated: bool = False
+
+    def __bool__(self):
+        return bool(self.events) or not self.metadata_equal
+
+
+def _resolve(obj, dotted_name):
+    for part in dotted_name.split("."):
+        obj = obj[int(part)] if part.isdigit() else getattr(obj, part)
+    return obj.val
+
+
+def field_diffs(obj_a, obj_b, version):
+    diffs = list()
+    for name, _, _ in obj_a.layout(version):
+        a, b = _resolve(obj_a, name), _resolve(obj_b, name)
+        # NaN floats compare unequal to themselves but the bytes were the same
+        if a != b and not (a != a and b != b):
+            diffs.append(FieldDiff(name, a, b))
+    return diffs
+
+
+# Indexes of the events whose spans differ, among the first n events that sit at the same
+# offsets with the same command bytes in both buffers. Compared as two big byte arrays.
+def _aligned_differences(index_a, index_b, n):
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    end = int(index_a.offsets[n - 1] + index_a.sizes[n - 1])
+    start = int(index_a.offsets[0])
+    a = np.frombuffer(index_a.buf, dtype=np.uint8, count=end - start, offset=start)
+    b = np.frombuffer(index_b.buf, dtype=np.uint8, count=end - start, offset=start)
+    differing_bytes = np.flatnonzero(a != b) + start
+    return np.unique(np.searchsorted(index_a.offsets[:n], differing_bytes, side="right") - 1)
+
+
+def _differing_events(index_a, index_b):
+    n = min(len(index_a), len(index_b))
+    misaligned = np.flatnonzero(
+        (index_a.offsets[:n] != index_b.offsets[:n])
+        | (index_a.cmd_bytes[:n] != index_b.cmd_bytes[:n])
+    )
+    n_aligned = int(misaligned[0]) if len(misaligned) else n
+    yield from _aligned_differences(index_a, index_b, n_aligned)
+
+    # Past the first misaligned event nothing lines up anymore, so each remaining position is
+    # compared on its own
+    for i in range(n_aligned, max(len(index_a), len(index_b))):
+        if i >= n or index_a.span(i) != index_b.span(i):
+            yield i
+
+
+# Walks two replays' event indexes in lockstep. Identical spans are skipped with byte-array
+# compares and only differing events get decoded into a field-level report. Stops after
+# max_diffs differing events (stop_early is max_diffs=1).
+def diff_replays(
+    a, b, config_dir="configs", max_diffs=None, stop_early=False, slp_bin=None
+):
+    index_a = a if isinstance(a, EventIndex) else EventIndex(a)
+    index_b = b if isinstance(b, EventIndex) else EventIndex(b)
+    if stop_early:
+        max_diffs = 1
+    result = ReplayDiff(len(index_a), len(index_b))
+    result.metadata_equal = index_a.metadata == index_b.metadata
+
+    raw_a = index_a.buf[index_a.raw_start : index_a.raw_end]
+    raw_b = index_b.buf[index_b.raw_start : index_b.raw_end]
+    if raw_a == raw_b:
+        return result
+
+    slp_bin = slp_bin or SlpBin(config_dir)
+    slp_bin.version = index_a.version
+    frames_a = index_a.frame_numbers()
+    frames_b = index_b.frame_numbers()
+    for i in _differing_events(index_a, index_b):
+        if max_diffs is not None and len(result.events) >= max_diffs:
+            result.truncated = True
+            break
+        i = int(i)
+        cmd_a = int(index_a.cmd_bytes[i]) if i < len(index_a) else None
+        cmd_b = int(index_b.cmd_bytes[i]) if i < len(index_b) else None
+        frame = int(frames_a[i] if i < len(index_a) else frames_b[i])
+        event = EventDiff(i, cmd_a, cmd_b, None if frame == NO_FRAME_NUMBER else frame)
+
+        if cmd_a == cmd_b and (cmd_a == 0x36 or cmd_a in slp_bin.CMD_BYTE_TEMPLATE_MAP):
+            event.fields = field_diffs(
+                slp_bin.decode_payload(cmd_a, index_a.payload(i)),
+                slp_bin.decode_payload(cmd_b, index_b.payload(i)),
+                slp_bin.version,
+            )
+        result.events.append(event)
+
+    return result
+
+
+# Reads buf, writes it back out with SlpBin.write and diffs the two
+def diff_round_trip(buf, config_dir="configs", max_diffs=None):
+    slp_bin = SlpBin(config_dir)
+    slp_bin.read(io.BytesIO(buf))
+    out = io.BytesIO()
+    slp_bin.write(out)
+    return diff_replays(buf, out.getvalue(), config_dir, max_diffs=max_diffs)
+
+
+def format_diff(diff):
+    lines = [f"{diff.n_events_a} events vs {diff.n_events_b} events"]
+    for e in diff.events:
+        lines.append(
+            f"event {e.index}: cmd {e.cmd_byte_a} vs {e.cmd_byte_b}, frame {e.frame_number}"
+        )
+        for f in e.fields:
+            lines.append(f"    {f.name}: {f.a} != {f.b}")
+    if not diff.metadata_equal:
+        lines.append("metadata differs")
+    if diff.truncated:
+        lines.append("(output capped)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event-aligned diff of two .slp files")
+    parser.add_argument("a")
+    parser.add_argument("b")
+    parser.add_argument("--config-dir", default="configs")
+    parser.add_argument("--max-diffs", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.a, "rb") as fa, open(args.b, "rb") as fb:
+        d = diff_replays(fa.read(), fb.read(), args.config_dir, max_diffs=args.max_diffs)
+    print(format_diff(d))
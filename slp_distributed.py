@@ -0,0 +1,226 @@
+import io
+import json
+import os
+import socket
+import sqlite3
+import time
+
+import numpy as np
+
+from slp_batch import list_replay_sources, read_replay_source
+from slp_dataset import atomic_save, atomic_write_json
+from slp_jobs import player_frames
+from slp_parse import SlpSchema
+
+UNIT_PENDING = "pending"
+UNIT_LEASED = "leased"
+UNIT_DONE = "done"
+# Claimed max_attempts times without ever being completed, e.g. a replay in it keeps crashing
+# whichever node picks it up
+UNIT_FAILED = "failed"
+DEFAULT_MAX_ATTEMPTS = 3
+MERGED_NAME = "merged.npy"
+MERGED_MANIFEST_NAME = "merged.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    replays TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output TEXT
+)
+"""
+
+
+# One connection per process. Every write is its own short BEGIN IMMEDIATE transaction, so
+# nodes only ever hold the database lock for a single row update. SQLite relies on the
+# filesystem's locks, so the shared volume needs working fcntl locking (NFSv4, or lockd).
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute(SCHEMA)
+    return conn
+
+
+# Splits every replay under paths into work units of unit_size replays. Only needs to run on
+# one node, a database that already has units is left as it is. Returns the number of units.
+def init_work(db_path, paths, unit_size=64):
+    conn = connect(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        (n_units,) = conn.execute("SELECT COUNT(*) FROM units").fetchone()
+        if n_units:
+            conn.execute("COMMIT")
+            return n_units
+        names = list(list_replay_sources(paths))
+        for start in range(0, len(names), unit_size):
+            conn.execute(
+                "INSERT INTO units (replays) VALUES (?)",
+                (json.dumps(names[start : start + unit_size]),),
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return -(-len(names) // unit_size)
+
+
+# Leases the next unit to node_id for lease_seconds. Pending units go first, after that units
+# whose lease ran out are stolen from whichever node held them - that node died or stalled.
+# An expired unit that has already been claimed max_attempts times is marked failed instead.
+# Returns (unit id, replay names) or None once every unit is done, failed or leased.
+def claim(conn, node_id, lease_seconds=300, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE units SET state = ? WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+            (UNIT_FAILED, UNIT_LEASED, now, max_attempts),
+        )
+        row = conn.execute(
+            "SELECT id, replays FROM units WHERE state = ? "
+            "OR (state = ? AND lease_expires < ?) ORDER BY state = ? DESC, id LIMIT 1",
+            (UNIT_PENDING, UNIT_LEASED, now, UNIT_PENDING),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE units SET state = ?, owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (UNIT_LEASED, node_id, now + lease_seconds, row[0]),
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return (row[0], json.loads(row[1])) if row else None
+
+
+# Extends the lease, False if the unit has been stolen in the meantime
+def renew(conn, unit_id, node_id, lease_seconds=300):
+    cur = conn.execute(
+        "UPDATE units SET lease_expires = ? WHERE id = ? AND state = ? AND owner = ?",
+        (time.time() + lease_seconds, unit_id, UNIT_LEASED, node_id),
+    )
+    return cur.rowcount == 1
+
+
+# Marks the unit done with node_id's output. False if another node stole it and finished
+# first, then the caller's output is simply never referenced.
+def complete(conn, unit_id, node_id, output):
+    cur = conn.execute(
+        "UPDATE units SET state = ?, output = ? WHERE id = ? AND owner = ? AND state = ?",
+        (UNIT_DONE, json.dumps(output), unit_id, node_id, UNIT_LEASED),
+    )
+    return cur.rowcount == 1
+
+
+def progress(conn):
+    return dict(conn.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall())
+
+
+def default_node_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# Claims and processes units until there are none left. Every unit's rows go into a shard of
+# this node's own, named after the node and unit, so nodes never write the same file.
+def run_node(
+    db_path,
+    out_dir,
+    node_id=None,
+    config_dir="configs",
+    fn=player_frames,
+    lease_seconds=300,
+    max_attempts=DEFAULT_MAX_ATTEMPTS,
+):
+    node_id = node_id or default_node_id()
+    os.makedirs(out_dir, exist_ok=True)
+    conn = connect(db_path)
+    n_units = 0
+    try:
+        while True:
+            unit = claim(conn, node_id, lease_seconds, max_attempts)
+            if unit is None:
+                break
+            unit_id, names = unit
+
+            rows = list()
+            output = {"replays": [], "errors": []}
+            n_rows = 0
+            stolen = False
+            for name in names:
+                # The lease ran out and another node took the unit over, whatever this node
+                # still did for it would never be used
+                if not renew(conn, unit_id, node_id, lease_seconds):
+                    stolen = True
+                    break
+                try:
+                    slp_bin = SlpSchema.shared(config_dir).session()
+                    slp_bin.read(io.BytesIO(read_replay_source(name)))
+                    r = fn(slp_bin)
+                except Exception as e:
+                    output["errors"].append({"replay": name, "error": repr(e)})
+                    continue
+                output["replays"].append(
+                    {"replay": name, "start": n_rows, "stop": n_rows + len(r)}
+                )
+                rows.append(r)
+                n_rows += len(r)
+
+            if stolen:
+                continue
+            if rows:
+                output["shard"] = f"node_{node_id}_unit_{unit_id:06d}.npy"
+                atomic_save(os.path.join(out_dir, output["shard"]), np.concatenate(rows))
+            if complete(conn, unit_id, node_id, output):
+                n_units += 1
+    finally:
+        conn.close()
+    return n_units
+
+
+# Once every unit is done or failed, concatenates the units' shards in unit order into one
+# array plus a manifest of every replay's rows in it. Every replay of a failed unit is listed
+# as an error.
+def merge(db_path, out_dir):
+    conn = connect(db_path)
+    try:
+        states = progress(conn)
+        if set(states) - {UNIT_DONE, UNIT_FAILED}:
+            raise ValueError(f"Units still outstanding: {states}")
+        outputs = list()
+        for replays, state, attempts, output in conn.execute(
+            "SELECT replays, state, attempts, output FROM units ORDER BY id"
+        ).fetchall():
+            if state == UNIT_FAILED:
+                error = f"Unit failed after {attempts} attempts"
+                errors = [{"replay": r, "error": error} for r in json.loads(replays)]
+                outputs.append({"replays": [], "errors": errors})
+            else:
+                outputs.append(json.loads(output))
+    finally:
+        conn.close()
+
+    manifest = {"replays": [], "errors": []}
+    arrays = list()
+    n_rows = 0
+    for output in outputs:
+        manifest["errors"].extend(output["errors"])
+        if "shard" not in output:
+            continue
+        arr = np.load(os.path.join(out_dir, output["shard"]))
+        for r in output["replays"]:
+            manifest["replays"].append(
+                {"replay": r["replay"], "start": n_rows + r["start"], "stop": n_rows + r["stop"]}
+            )
+        arrays.append(arr)
+        n_rows += len(arr)
+
+    if arrays:
+        atomic_save(os.path.join(out_dir, MERGED_NAME), np.concatenate(arrays))
+    atomic_write_json(os.path.join(out_dir, MERGED_MANIFEST_NAME), manifest)
+    return manifest
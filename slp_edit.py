@@ -0,0 +1,210 @@
+import io
+import struct
+
+import numpy as np
+
+from slp_index import FRAME_CMD_BYTES, GAME_START_CMD_BYTE, EventIndex
+from slp_parse import SlpBin
+
+UBJSON_INTS = {b"i": ">b", b"U": ">B", b"I": ">h", b"l": ">i", b"L": ">q"}
+# Payload sizes of the UBJSON value types that aren't strings or containers
+UBJSON_FIXED = {b"Z": 0, b"N": 0, b"T": 0, b"F": 0, b"C": 1, b"d": 4, b"D": 8}
+UBJSON_FIXED.update({marker: struct.calcsize(fmt) for marker, fmt in UBJSON_INTS.items()})
+
+
+def _ubjson_length(buf, pos):
+    fmt = UBJSON_INTS.get(bytes(buf[pos : pos + 1]))
+    if fmt is None:
+        raise ValueError(f"Expected a UBJSON integer at metadata offset {pos}")
+    return struct.unpack_from(fmt, buf, pos + 1)[0], pos + 1 + struct.calcsize(fmt)
+
+
+# metadata.players.<port>.names holds the netplay name and connect code
+def _is_player_name(path):
+    return len(path) == 5 and path[:2] == ("metadata", "players") and path[3] == "names"
+
+
+# Copies the UBJSON value at pos into out with player names blanked, returns the position
+# after it. marker is passed for the items of a typed ($) container, which omit their own.
+def _scrub_value(buf, pos, out, path, marker=None):
+    typed = marker is not None
+    start = pos
+    if not typed:
+        marker = bytes(buf[pos : pos + 1])
+        pos += 1
+
+    if marker in (b"[", b"{"):
+        if not typed:
+            out += marker
+        return _scrub_container(buf, pos, out, path, marker)
+    if marker in UBJSON_FIXED:
+        end = pos + UBJSON_FIXED[marker]
+    elif marker in (b"S", b"H"):
+        length, end = _ubjson_length(buf, pos)
+        end += length
+        if marker == b"S" and _is_player_name(path):
+            out += b"U\x00" if typed else b"SU\x00"
+            return end
+    else:
+        raise ValueError(f"Unknown UBJSON marker {marker!r} at metadata offset {start}")
+    out += buf[start:end]
+    return end
+
+
+def _scrub_container(buf, pos, out, path, marker):
+    item_type = count = None
+    header = pos
+    if buf[pos : pos + 1] == b"$":
+        item_type = bytes(buf[pos + 1 : pos + 2])
+        pos += 2
+    if buf[pos : pos + 1] == b"#":
+        count, pos = _ubjson_length(buf, pos + 1)
+    out += buf[header:pos]
+
+    close = b"}" if marker == b"{" else b"]"
+    i = 0
+    while i < count if count is not None else buf[pos : pos + 1] != close:
+        key = i
+        if marker == b"{":
+            length, start = _ubjson_length(buf, pos)
+            key = bytes(buf[start : start + length]).decode()
+            out += buf[pos : start + length]
+            pos = start + length
+        pos = _scrub_value(buf, pos, out, path + (key,), item_type)
+        i += 1
+    # Counted containers have no closing marker
+    if count is None:
+        out += close
+        pos += 1
+    return pos
+
+
+# The metadata is the tail of the file's root object, after the raw array: its remaining
+# key/value pairs and the closing brace. Everything but the players' names is copied verbatim.
+def anonymize_metadata(metadata):
+    out = bytearray()
+    end = _scrub_container(metadata, 0, out, (), b"{")
+    out += metadata[end:]
+    return bytes(out)
+
+
+# Copy-on-write editing of a .slp buffer. The original file is kept as raw byte spans and
+# only the events that get replaced are re-encoded - everything else is written straight
+# out of the source buffer with memoryview slices, in the original event order.
+class SlpEditor:
+    def __init__(self, buf, config_dir="configs"):
+        self.index = EventIndex(buf)
+        self.slp_bin = SlpBin(config_dir)
+        self.keep = np.ones(len(self.index), dtype=bool)
+        self.replacements: dict[int, bytes] = dict()
+        self.metadata = self.index.metadata
+
+        self.version = self.index.version
+        self.game_start_index = int(self.index.find(GAME_START_CMD_BYTE)[0])
+        self.slp_bin.version = self.version
+        self._game_start = None
+
+    @classmethod
+    def from_file(cls, file_path, config_dir="configs"):
+        with open(file_path, "rb") as f:
+            return cls(f.read(), config_dir)
+
+    @property
+    def game_start(self):
+        if self._game_start is None:
+            self._game_start = self.decode(self.game_start_index)
+        return self._game_start
+
+    def decode(self, i):
+        span = self.replacements.get(i, self.index.span(i))
+        return self.slp_bin.decode_payload(span[0], span[1:])
+
+    def replace(self, i, obj):
+        stream = io.BytesIO()
+        obj.write(stream, self.version)
+        self.replace_bytes(i, stream.getvalue())
+
+    def replace_bytes(self, i, data):
+        if len(data) != self.index.sizes[i]:
+            raise ValueError(
+                f"Replacement for event {i} is {len(data)} bytes, EventPayloads defines {self.index.sizes[i]}"
+            )
+        if data[0] != self.index.cmd_bytes[i]:
+            raise ValueError(
+                f"Replacement for event {i} has command byte {data[0]}, expected {self.index.cmd_bytes[i]}"
+            )
+        self.replacements[i] = bytes(data)
+
+    def drop(self, indices):
+        self.keep[indices] = False
+
+    # Keeps frame-based events with start <= frame_number < end, everything else is left alone
+    def trim_frames(self, start=None, end=None):
+        frames = self.index.frame_numbers()
+        is_frame_event = np.isin(self.index.cmd_bytes, FRAME_CMD_BYTES)
+        outside = np.zeros(len(self.index), dtype=bool)
+        if start is not None:
+            outside |= frames < start
+        if end is not None:
+            outside |= frames >= end
+        self.drop(is_frame_event & outside)
+
+    # Blanks every player-identifying string in GameStart and the netplay names and codes in the
+    # trailing UBJSON metadata. drop_metadata replaces the whole metadata with the root object's
+    # closing brace instead, losing startAt, lastFrame and playedOn along with the names.
+    def anonymize(self, drop_metadata=False):
+        gs = self.game_start
+        for nametag in gs.nametags:
+            nametag.val = []
+        for dn in gs.display_name:
+            dn.display_name.val = []
+        for cc in gs.connect_code:
+            cc.connect_code_str.val = ""
+            cc.connect_code_hash.val = 0
+            cc.connect_code_num.val = ""
+        for uid in gs.slippi_uid:
+            uid.val = ""
+        self.replace(self.game_start_index, gs)
+
+        if drop_metadata:
+            self.metadata = b"}"
+        else:
+            self.metadata = anonymize_metadata(self.metadata)
+
+    def raw_len(self):
+        return int(self.index.sizes[self.keep].sum())
+
+    # Contiguous runs of untouched events come out as single memoryview slices
+    def iter_chunks(self):
+        idx = self.index
+        kept = np.flatnonzero(self.keep)
+        if not len(kept):
+            return
+
+        breaks = np.flatnonzero(np.diff(kept) != 1) + 1
+        run_starts = np.concatenate([[0], breaks])
+        run_ends = np.concatenate([breaks, [len(kept)]])
+        replaced = np.array(sorted(self.replacements), dtype=np.int64)
+
+        for s, e in zip(run_starts, run_ends):
+            first, last = kept[s], kept[e - 1]
+            pos = first
+            for r in replaced[(replaced >= first) & (replaced <= last)]:
+                if r > pos:
+                    yield idx.buf[idx.offsets[pos] : idx.offsets[r]]
+                yield self.replacements[int(r)]
+                pos = r + 1
+            if pos <= last:
+                yield idx.buf[idx.offsets[pos] : idx.offsets[last] + idx.sizes[last]]
+
+    def write(self, stream):
+        # Every span keeps its size, so the raw length is known before anything is written
+        self.slp_bin.write_ubjson_header(stream, self.raw_len())
+        for chunk in self.iter_chunks():
+            stream.write(chunk)
+        stream.write(self.metadata)
+
+    def to_bytes(self):
+        stream = io.BytesIO()
+        self.write(stream)
+        return stream.getvalue()
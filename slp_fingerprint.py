@@ -0,0 +1,95 @@
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+
+from slp_batch import batch_apply
+from slp_index import EventIndex, decode_columns, gather_bytes, latest_per_key
+from slp_parse import SlpBin
+
+POST_FRAME_CMD_BYTE = 0x38
+DIGEST_SIZE = 8
+
+# The simulation is deterministic, so these match between both players' recordings of the same
+# netplay game while anything player-specific (names, codes, metadata) is left out
+FRAME_FINGERPRINT_FIELDS = (
+    "action_state_id",
+    "x_position",
+    "y_position",
+    "percent",
+    "stocks_remaining",
+)
+
+
+def _digest(b):
+    return int.from_bytes(hashlib.blake2b(b, digest_size=DIGEST_SIZE).digest(), "little")
+
+
+# One uint64 per event, straight over its raw bytes (command byte included)
+def event_fingerprints(index):
+    out = np.empty(len(index), dtype=np.uint64)
+    for i in range(len(index)):
+        out[i] = _digest(index.span(i))
+    return out
+
+
+# (frame_numbers, fingerprints) with one uint64 per frame, hashed over the raw bytes of
+# FRAME_FINGERPRINT_FIELDS of every player's final (post-rollback) post-frame update
+def frame_fingerprints(
+    index, config_dir="configs", slp_bin=None, fields=FRAME_FINGERPRINT_FIELDS
+):
+    slp_bin = slp_bin or SlpBin(config_dir)
+    layout = slp_bin.post_frame_update_template.layout(index.version)
+    by_name = {name: (offset, prim) for name, offset, prim in layout}
+
+    events = index.find(POST_FRAME_CMD_BYTE)
+    keys = decode_columns(
+        index, events, layout, ("frame_number", "player_index", "is_follower")
+    )
+    keep = latest_per_key(keys["frame_number"], keys["player_index"], keys["is_follower"])
+    frames = keys["frame_number"][keep]
+    offsets = index.offsets[events[keep]]
+
+    rows = np.concatenate(
+        [
+            gather_bytes(index.buf, offsets + by_name[name][0], by_name[name][1].size())
+            for name in fields
+        ],
+        axis=1,
+    )
+
+    # keep is sorted by frame, so every frame's rows are contiguous
+    frame_numbers, starts = np.unique(frames, return_index=True)
+    ends = np.append(starts[1:], len(frames))
+    digests = np.empty(len(frame_numbers), dtype=np.uint64)
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        digests[i] = _digest(rows[start:end].tobytes())
+    return frame_numbers, digests
+
+
+def game_fingerprint(frame_digests):
+    b = np.ascontiguousarray(frame_digests).tobytes()
+    return hashlib.blake2b(b, digest_size=16).hexdigest()
+
+
+# First frame number where two recordings disagree, None if they agree on every frame they share
+def first_desync(frames_a, digests_a, frames_b, digests_b):
+    shared, ia, ib = np.intersect1d(frames_a, frames_b, return_indices=True)
+    differ = np.flatnonzero(digests_a[ia] != digests_b[ib])
+    return int(shared[differ[0]]) if len(differ) else None
+
+
+def _fingerprint_bytes(buf, config_dir):
+    index = EventIndex(buf)
+    _, digests = frame_fingerprints(index, config_dir)
+    return game_fingerprint(digests)
+
+
+# Groups every replay under paths by game fingerprint in one pass, e.g. the same netplay game
+# uploaded by both players. Only groups with more than one replay are returned.
+def find_duplicates(paths, config_dir="configs", workers=None):
+    groups = defaultdict(list)
+    for result in batch_apply(paths, _fingerprint_bytes, (config_dir,), workers=workers):
+        if result.error is None:
+            groups[result.result].append(result.name)
+    return {fp: names for fp, names in groups.items() if len(names) > 1}
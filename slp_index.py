@@ -0,0 +1,205 @@
+import struct
+
+import numpy as np
+
+# 15 characters:
+# { U 3 r a w [ $ U # l X X X X
+UBJSON_HEADER_LEN = 15
+EVENT_PAYLOADS_CMD_BYTE = 0x35
+GAME_START_CMD_BYTE = 0x36
+
+# Every frame-based event starts with its command byte followed by a big-endian s32 frame number
+FRAME_CMD_BYTES = (0x37, 0x38, 0x3A, 0x3B, 0x3C)
+# What frame_numbers gives events without a frame number, one before the first frame
+NO_FRAME_NUMBER = -124
+# What identifies a player's frame event, rollbacks resend events with the same key
+KEY_FIELDS = ("frame_number", "player_index", "is_follower")
+
+# struct sizes aren't numpy sizes (np.dtype("L") is 8 bytes on most platforms), so map explicitly
+STRUCT_TO_NUMPY = {
+    "B": "u1",
+    "b": "i1",
+    "H": "u2",
+    "h": "i2",
+    "L": "u4",
+    "I": "u4",
+    "l": "i4",
+    "i": "i4",
+    "f": "f4",
+}
+
+
+def numpy_dtype(format_char):
+    return np.dtype(">" + STRUCT_TO_NUMPY[format_char.lstrip("<>!=@")])
+
+
+def gather_bytes(buf, offsets, width):
+    # (len(offsets), width) uint8 matrix holding buf[o : o + width] for every offset
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return arr[offsets[:, None] + np.arange(width, dtype=np.int64)]
+
+
+def gather_field(buf, offsets, field_offset, format_char):
+    # Vectorized struct.unpack of a single scalar field from many payloads at once
+    dtype = numpy_dtype(format_char)
+    b = gather_bytes(buf, np.asarray(offsets, dtype=np.int64) + field_offset, dtype.itemsize)
+    return np.ascontiguousarray(b).view(dtype).reshape(-1)
+
+
+# Walks the events in buf[start:end] one by one. Returns their command bytes, their offsets and
+# where the walk stopped - end, or the start of an event that's cut off at end (a live file can
+# end in the middle of one, it's left out until it's complete).
+def scan_events(buf, start, end, size_lut):
+    cmd_bytes = list()
+    offsets = list()
+    size_lut = size_lut.tolist()
+    pos = start
+    while pos < end:
+        cmd_byte = buf[pos]
+        size = size_lut[cmd_byte]
+        if not size:
+            raise NotImplementedError(
+                f"Command byte {cmd_byte} at offset {pos} not defined in EventPayloads"
+            )
+        if pos + size > end:
+            break
+        cmd_bytes.append(cmd_byte)
+        offsets.append(pos)
+        pos += size
+    return np.array(cmd_bytes, dtype=np.uint8), np.array(offsets, dtype=np.int64), pos
+
+
+# Byte spans of every event in the raw section of a .slp buffer. Nothing gets decoded
+# besides the EventPayloads block, so building one of these is a single cheap pass.
+# Each span starts at the command byte, the EventPayloads block itself is event 0.
+class EventIndex:
+    def __init__(self, buf, events=None):
+        self.buf = memoryview(buf).cast("B")
+        self.raw_len = struct.unpack_from(">L", self.buf, UBJSON_HEADER_LEN - 4)[0]
+        self.raw_start = UBJSON_HEADER_LEN
+
+        # In-progress replays have a raw length of 0 - read till the end of whatever is there
+        self.raw_end = self.raw_start + self.raw_len if self.raw_len else len(self.buf)
+
+        if self.buf[self.raw_start] != EVENT_PAYLOADS_CMD_BYTE:
+            raise ValueError(
+                f"Expected EventPayloads command byte {EVENT_PAYLOADS_CMD_BYTE} at offset {self.raw_start}"
+            )
+        self.payload_size_dict = {EVENT_PAYLOADS_CMD_BYTE: self.buf[self.raw_start + 1]}
+        for i in range(self.raw_start + 2, self.raw_start + 1 + self.buf[self.raw_start + 1], 3):
+            cmd_byte, size = struct.unpack_from(">BH", self.buf, i)
+            self.payload_size_dict[cmd_byte] = size
+
+        # events is (cmd_bytes, offsets) found by an earlier scan, e.g. slp_parallel's chunked one
+        if events is None:
+            cmd_bytes, offsets, _ = scan_events(
+                self.buf, self.raw_start, self.raw_end, self.size_lut()
+            )
+        else:
+            cmd_bytes, offsets = events
+        self.cmd_bytes = np.asarray(cmd_bytes, dtype=np.uint8)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.sizes = self.size_lut()[self.cmd_bytes]
+
+    # Event size, command byte included, by command byte. 0 for undefined command bytes.
+    def size_lut(self):
+        size_lut = np.zeros(256, dtype=np.int64)
+        for cmd_byte, size in self.payload_size_dict.items():
+            size_lut[cmd_byte] = size + 1
+        return size_lut
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def span(self, i):
+        o = int(self.offsets[i])
+        return self.buf[o : o + int(self.sizes[i])]
+
+    def payload(self, i):
+        # Same as span, minus the command byte
+        return self.span(i)[1:]
+
+    def find(self, cmd_byte):
+        return np.flatnonzero(self.cmd_bytes == cmd_byte)
+
+    # Replay version from the first bytes of the GameStart payload, e.g. "3.14.0"
+    @property
+    def version(self):
+        gs_indices = self.find(GAME_START_CMD_BYTE)
+        if not len(gs_indices):
+            raise ValueError("Replay has no GameStart event")
+        major, minor, build = bytes(self.payload(gs_indices[0])[:3])
+        return f"{major}.{minor}.{build}"
+
+    def frame_numbers(self):
+        frames = np.full(len(self), NO_FRAME_NUMBER, dtype=np.int32)
+        is_frame_event = np.isin(self.cmd_bytes, FRAME_CMD_BYTES)
+        frames[is_frame_event] = gather_field(
+            self.buf, self.offsets[is_frame_event], 1, ">l"
+        )
+        return frames
+
+    @property
+    def metadata(self):
+        return self.buf[self.raw_end :]
+
+
+# Decodes scalar fields of many events at once straight from their raw bytes. layout comes
+# from BinData.layout, bitfields come out as packed ints.
+def decode_columns(index, event_indices, layout, names):
+    by_name = {name: (offset, prim) for name, offset, prim in layout}
+    offsets = index.offsets[event_indices]
+    columns = dict()
+    for name in names:
+        offset, prim = by_name[name]
+        columns[name] = gather_field(index.buf, offsets, offset, prim.format_char)
+    return columns
+
+
+# Rollbacks resend events for frames that were already sent, the last copy is the real one.
+# Returns the positions (into the key arrays) of the last event of every distinct key, sorted
+# by key. keys are given most significant first, e.g. (frame_number, player_index).
+def latest_per_key(*keys):
+    n = len(keys[0])
+    order = np.lexsort((np.arange(n),) + tuple(reversed(keys)))
+    same_as_next = np.ones(max(n - 1, 0), dtype=bool)
+    for k in keys:
+        sorted_k = np.asarray(k)[order]
+        same_as_next &= sorted_k[1:] == sorted_k[:-1]
+    is_last = np.append(~same_as_next, True) if n else same_as_next
+    return order[is_last]
+
+
+# names plus KEY_FIELDS of the final copy of every leader's cmd_byte event (followers like the
+# Ice Climbers' Nana are dropped), sorted by (frame_number, player_index). Decoded straight from
+# the raw payloads, no per-frame objects or lists.
+def leader_columns(index, cmd_byte, layout, names):
+    names = tuple(dict.fromkeys(KEY_FIELDS + tuple(names)))
+    cols = decode_columns(index, index.find(cmd_byte), layout, names)
+    keep = latest_per_key(cols["frame_number"], cols["player_index"], cols["is_follower"])
+    keep = keep[cols["is_follower"][keep] == 0]
+    return {name: c[keep] for name, c in cols.items()}
+
+
+# Whether a replay is raw .slp bytes (or their EventIndex) rather than a parsed SlpBin
+def is_raw_replay(replay):
+    return isinstance(replay, (bytes, bytearray, memoryview, EventIndex))
+
+
+# Rollbacks resend whole frames, so the last contiguous run of events carrying a frame number
+# is the final version of that frame. Returns a mask over every event of the index that's True
+# for frame events in their frame's last run (and for events without a frame number).
+def final_frame_mask(index):
+    frames = index.frame_numbers()
+    frame_events = np.flatnonzero(frames != NO_FRAME_NUMBER)
+    mask = np.ones(len(index), dtype=bool)
+    if not len(frame_events):
+        return mask
+
+    f = frames[frame_events].astype(np.int64)
+    run_id = np.cumsum(np.append(True, f[1:] != f[:-1]))
+    last_run = np.zeros(int(f.max() - f.min()) + 1, dtype=np.int64)
+    np.maximum.at(last_run, f - f.min(), run_id)
+    mask[frame_events] = run_id == last_run[f - f.min()]
+    return mask
@@ -0,0 +1,122 @@
+import numpy as np
+
+from slp_index import EventIndex, decode_columns, latest_per_key
+from slp_parse import SlpBin
+from slp_quantize import STICK_STEPS, TRIGGER_STEPS
+
+PRE_FRAME_CMD_BYTE = 0x37
+
+STICK_FIELDS = ("joystick_x", "joystick_y", "cstick_x", "cstick_y")
+TRIGGER_FIELDS = ("trigger", "physical_l_trigger", "physical_r_trigger")
+
+INPUT_DTYPE = np.dtype(
+    [
+        ("processed_buttons", "<u4"),
+        ("physical_buttons", "<u2"),
+        ("joystick_x", "i1"),
+        ("joystick_y", "i1"),
+        ("cstick_x", "i1"),
+        ("cstick_y", "i1"),
+        ("trigger", "u1"),
+        ("physical_l_trigger", "u1"),
+        ("physical_r_trigger", "u1"),
+    ]
+)
+
+
+def quantize_stick(v):
+    return np.clip(np.rint(np.asarray(v) * STICK_STEPS), -STICK_STEPS, STICK_STEPS).astype(np.int8)
+
+
+def quantize_trigger(v):
+    return np.clip(np.rint(np.asarray(v) * TRIGGER_STEPS), 0, TRIGGER_STEPS).astype(np.uint8)
+
+
+# Run-length encoded inputs of one player: values[i] is held from frame first_frame +
+# sum(change_deltas[: i + 1]) until the next change. Frames are contiguous from first_frame.
+class InputTimeline:
+    def __init__(self, first_frame, n_frames, change_deltas, values):
+        self.first_frame = first_frame
+        self.n_frames = n_frames
+        self.change_deltas = change_deltas
+        self.values = values
+
+    @classmethod
+    def encode(cls, frame_number, records):
+        first_frame = int(frame_number[0])
+        n_frames = int(frame_number[-1]) - first_frame + 1
+
+        # Frames a player has no event for hold the previous input
+        dense_pos = np.full(n_frames, -1, dtype=np.int64)
+        dense_pos[frame_number - first_frame] = np.arange(len(frame_number))
+        dense_pos = np.maximum.accumulate(dense_pos)
+        dense = records[dense_pos]
+
+        changes = np.concatenate([[0], np.flatnonzero(dense[1:] != dense[:-1]) + 1])
+        deltas = np.diff(changes, prepend=0)
+        delta_dtype = np.uint16 if n_frames < 1 << 16 else np.uint32
+        return cls(first_frame, n_frames, deltas.astype(delta_dtype), dense[changes])
+
+    def change_frames(self):
+        return self.first_frame + np.cumsum(self.change_deltas, dtype=np.int64)
+
+    # Back to one INPUT_DTYPE record per frame
+    def decode(self):
+        positions = np.cumsum(self.change_deltas, dtype=np.int64)
+        lengths = np.diff(positions, append=self.n_frames)
+        return np.repeat(self.values, lengths)
+
+    # Dense float arrays in the same units PreFrameUpdate uses
+    def decode_floats(self):
+        dense = self.decode()
+        out = {
+            "frame_number": np.arange(self.first_frame, self.first_frame + self.n_frames),
+            "processed_buttons": dense["processed_buttons"],
+            "physical_buttons": dense["physical_buttons"],
+        }
+        for name in STICK_FIELDS:
+            out[name] = dense[name].astype(np.float32) / STICK_STEPS
+        for name in TRIGGER_FIELDS:
+            out[name] = dense[name].astype(np.float32) / TRIGGER_STEPS
+        return out
+
+    @property
+    def nbytes(self):
+        return self.change_deltas.nbytes + self.values.nbytes
+
+    def __len__(self):
+        return self.n_frames
+
+
+# Per (port, is_follower) InputTimelines, decoded straight from the raw pre-frame payloads
+def extract_inputs(buf, config_dir="configs", slp_bin=None):
+    index = buf if isinstance(buf, EventIndex) else EventIndex(buf)
+    slp_bin = slp_bin or SlpBin(config_dir)
+    layout = slp_bin.pre_frame_update_template.layout(index.version)
+
+    events = index.find(PRE_FRAME_CMD_BYTE)
+    cols = decode_columns(
+        index,
+        events,
+        layout,
+        ("frame_number", "player_index", "is_follower") + INPUT_DTYPE.names,
+    )
+    keep = latest_per_key(cols["player_index"], cols["is_follower"], cols["frame_number"])
+    cols = {name: c[keep] for name, c in cols.items()}
+
+    records = np.zeros(len(keep), dtype=INPUT_DTYPE)
+    records["processed_buttons"] = cols["processed_buttons"]
+    records["physical_buttons"] = cols["physical_buttons"]
+    for name in STICK_FIELDS:
+        records[name] = quantize_stick(cols[name])
+    for name in TRIGGER_FIELDS:
+        records[name] = quantize_trigger(cols[name])
+
+    timelines = dict()
+    player_keys = np.stack([cols["player_index"], cols["is_follower"]], axis=1)
+    for port, follower in np.unique(player_keys, axis=0):
+        rows = (cols["player_index"] == port) & (cols["is_follower"] == follower)
+        timelines[(int(port), int(follower))] = InputTimeline.encode(
+            cols["frame_number"][rows].astype(np.int64), records[rows]
+        )
+    return timelines
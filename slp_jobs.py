@@ -0,0 +1,218 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+
+from slp_batch import (
+    SLP_SUFFIX,
+    apply_all,
+    is_archive,
+    iter_replay_sources,
+    read_replay_source,
+    walk_paths,
+)
+from slp_dataset import SHARD_NAME, atomic_save
+from slp_parse import SlpSchema
+from slp_validation import VALIDATION_CHEAP
+
+JOURNAL_NAME = "journal.jsonl"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def player_frames(slp_bin):
+    return slp_bin.to_player_numpy()
+
+
+def content_hash(buf):
+    return hashlib.blake2b(buf, digest_size=16).hexdigest()
+
+
+def process_replay(buf, config_dir, fn, validation=VALIDATION_CHEAP):
+    slp_bin = SlpSchema.shared(config_dir).session(validation=validation)
+    slp_bin.read(io.BytesIO(buf))
+    return content_hash(buf), fn(slp_bin)
+
+
+# Append-only record of every replay a job has finished or failed on. Each line is a JSON
+# object, the last line for a replay wins, so a torn last line from a crash is just ignored.
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.records = dict()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.records[record["replay"]] = record
+        self.f = open(path, "a")
+
+    def append(self, records, sync=True):
+        for record in records:
+            self.records[record["replay"]] = record
+            self.f.write(json.dumps(record) + "\n")
+        self.f.flush()
+        if sync:
+            os.fsync(self.f.fileno())
+
+    def done(self, name):
+        record = self.records.get(name)
+        return record is not None and record["status"] == STATUS_DONE
+
+    # Attempts so far on the replay as it is now, a file whose size or mtime changed since
+    # (repaired or copied again) starts over
+    def attempts(self, name, size=None, mtime=None):
+        record = self.records.get(name)
+        if record is None:
+            return 0
+        if size is not None and (record["size"], record["mtime"]) != (size, mtime):
+            return 0
+        return record["attempts"]
+
+    def next_shard(self):
+        shards = [
+            r["output"]["shard"] for r in self.records.values() if r["status"] == STATUS_DONE
+        ]
+        return max(shards) + 1 if shards else 0
+
+    def close(self):
+        self.f.close()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+# (name, (buf, size, mtime)) for every replay under paths that still has to be processed.
+# Plain replay files whose size and mtime match their journal record are skipped without being
+# read, anything else that's unchanged is caught by its content hash before it gets parsed.
+def _pending(paths, journal, max_attempts, counts):
+    for path in walk_paths(paths):
+        archive = is_archive(path)
+        if not archive and not path.lower().endswith((SLP_SUFFIX, SLP_SUFFIX + ".gz")):
+            continue
+        size, mtime = _stat(path)
+        record = journal.records.get(path)
+        if (
+            not archive
+            and journal.done(path)
+            and (record["size"], record["mtime"]) == (size, mtime)
+        ):
+            counts["skipped"] += 1
+            continue
+
+        for name, buf in iter_replay_sources([path]):
+            record = journal.records.get(name)
+            if journal.done(name) and record["hash"] == content_hash(buf):
+                counts["skipped"] += 1
+                continue
+            member_size = len(buf) if archive else size
+            if (
+                record is not None
+                and record["status"] == STATUS_FAILED
+                and journal.attempts(name, member_size, mtime) >= max_attempts
+            ):
+                counts["failed"] += 1
+                continue
+            yield name, (buf, member_size, mtime)
+
+
+def _split_meta(sources, meta):
+    for name, (buf, size, mtime) in sources:
+        meta[name] = (size, mtime)
+        yield name, buf
+
+
+# Runs fn (a picklable SlpBin -> array function) over every replay under paths and writes the
+# results into .npy shards under out_dir. A replay is journaled as done, with its size, mtime,
+# content hash and rows in a shard, only after that shard has been atomically written. A
+# restarted job skips whatever is journaled as done and retries failures until they've failed
+# max_attempts times in total. Returns counts of processed, skipped and failed replays.
+def run_job(
+    paths,
+    out_dir,
+    config_dir="configs",
+    fn=player_frames,
+    rows_per_shard=1 << 18,
+    max_attempts=3,
+    workers=None,
+    validation=VALIDATION_CHEAP,
+):
+    os.makedirs(out_dir, exist_ok=True)
+    journal = Journal(os.path.join(out_dir, JOURNAL_NAME))
+    counts = {"processed": 0, "skipped": 0, "failed": 0}
+    shard_i = journal.next_shard()
+    pending = list()
+    pending_records = list()
+    pending_rows = 0
+
+    def commit():
+        nonlocal shard_i, pending, pending_records, pending_rows
+        if not pending:
+            return
+        shard_name = SHARD_NAME.format(shard_i)
+        atomic_save(os.path.join(out_dir, shard_name), np.concatenate(pending))
+        journal.append(pending_records)
+        counts["processed"] += len(pending_records)
+        shard_i += 1
+        pending, pending_records, pending_rows = list(), list(), 0
+
+    try:
+        sources = _pending(paths, journal, max_attempts, counts)
+        # The first round is a generator (always truthy), retry rounds are lists
+        while sources:
+            meta = dict()
+            retry = list()
+            for result in apply_all(
+                _split_meta(sources, meta),
+                process_replay,
+                (config_dir, fn, validation),
+                workers=workers,
+            ):
+                size, mtime = meta.pop(result.name)
+                record = {
+                    "replay": result.name,
+                    "size": size,
+                    "mtime": mtime,
+                    "attempts": journal.attempts(result.name, size, mtime) + 1,
+                }
+                if result.error is not None:
+                    record.update(status=STATUS_FAILED, error=repr(result.error))
+                    journal.append([record])
+                    if record["attempts"] < max_attempts:
+                        retry.append((result.name, size, mtime))
+                    else:
+                        counts["failed"] += 1
+                    continue
+
+                digest, rows = result.result
+                if pending_rows and pending_rows + len(rows) > rows_per_shard:
+                    commit()
+                record.update(
+                    status=STATUS_DONE,
+                    hash=digest,
+                    output={
+                        "shard": shard_i,
+                        "file": SHARD_NAME.format(shard_i),
+                        "start": pending_rows,
+                        "stop": pending_rows + len(rows),
+                    },
+                )
+                pending.append(rows)
+                pending_records.append(record)
+                pending_rows += len(rows)
+            commit()
+
+            # Failures go around again until they run out of attempts
+            sources = [
+                (name, (read_replay_source(name), size, mtime)) for name, size, mtime in retry
+            ]
+    finally:
+        journal.close()
+    return counts
@@ -0,0 +1,262 @@
+import atexit
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from slp_index import (
+    FRAME_CMD_BYTES,
+    EventIndex,
+    decode_columns,
+    final_frame_mask,
+    gather_field,
+    numpy_dtype,
+    scan_events,
+)
+from slp_parse import SlpBin
+
+FRAME_START_CMD_BYTE = 0x3A
+FRAME_BOOKEND_CMD_BYTE = 0x3C
+# Events an anchor's chain is checked for at most
+ANCHOR_EVENTS = 32
+# Replays with less raw data per chunk than this are scanned in-process, below that the pool's
+# overhead outweighs the scan
+MIN_CHUNK_BYTES = 1 << 20
+
+
+# Splits positions [0, len(frames)) into about n_chunks (start, stop) ranges of similar size,
+# never separating two events of the same frame
+def frame_aligned_chunks(frames, n_chunks):
+    n = len(frames)
+    bounds = [0]
+    for target in np.linspace(0, n, n_chunks + 1)[1:-1].astype(np.int64):
+        b = max(int(target), bounds[-1])
+        while 0 < b < n and frames[b] == frames[b - 1]:
+            b += 1
+        if bounds[-1] < b < n:
+            bounds.append(b)
+    bounds.append(n)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# Whether buf[pos] is a FrameStart that really starts an event: the events that follow it have
+# to be defined and in bounds, and every frame event up to its FrameBookend has to carry its
+# frame number. Random bytes practically never pass that.
+def _is_anchor(buf, pos, end, size_lut):
+    if pos + 5 > end:
+        return False
+    frame = struct.unpack_from(">l", buf, pos + 1)[0]
+    for _ in range(ANCHOR_EVENTS):
+        if pos == end:
+            return True
+        cmd_byte = buf[pos]
+        size = size_lut[cmd_byte]
+        if not size or pos + size > end:
+            return False
+        if cmd_byte in FRAME_CMD_BYTES and struct.unpack_from(">l", buf, pos + 1)[0] != frame:
+            return False
+        if cmd_byte == FRAME_BOOKEND_CMD_BYTE:
+            return True
+        pos += size
+    return True
+
+
+# Event boundaries near n_chunks evenly spaced byte positions of the raw section, found by
+# looking for FrameStart events without walking the events before them. Every chunk between
+# two boundaries starts at a frame, so no frame is split. Empty for versions without
+# FrameStart/FrameBookend events.
+def find_chunk_bounds(index, n_chunks):
+    size_lut = index.size_lut().tolist()
+    if not size_lut[FRAME_START_CMD_BYTE] or not size_lut[FRAME_BOOKEND_CMD_BYTE]:
+        return []
+    arr = np.frombuffer(index.buf, dtype=np.uint8)
+    bounds = list()
+    window = 1 << 16
+    for target in np.linspace(index.raw_start, index.raw_end, n_chunks + 1)[1:-1]:
+        pos = max(int(target), bounds[-1] + 1 if bounds else index.raw_start + 1)
+        found = None
+        while found is None and pos < index.raw_end:
+            stop = min(pos + window, index.raw_end)
+            for candidate in np.flatnonzero(arr[pos:stop] == FRAME_START_CMD_BYTE) + pos:
+                if _is_anchor(index.buf, int(candidate), index.raw_end, size_lut):
+                    found = int(candidate)
+                    break
+            pos = stop
+        if found is not None:
+            bounds.append(found)
+    return bounds
+
+
+# Runs inside a pool worker: walks the events of buf[start:stop] in the shared replay bytes and
+# decodes the specs' fields of the cmd_byte events among them. The end is None if the walk hit
+# an undefined command byte.
+def _scan_chunk(buf_name, size_lut, start, stop, cmd_byte, specs):
+    shm = SharedMemory(name=buf_name)
+    try:
+        buf = shm.buf
+        try:
+            cmd_bytes, offsets, end = scan_events(buf, start, stop, np.asarray(size_lut))
+        except NotImplementedError:
+            del buf
+            return None, None, None, None
+        selected = offsets[cmd_bytes == cmd_byte] if specs else offsets[:0]
+        columns = [
+            gather_field(buf, selected, field_offset, format_char).astype(dtype)
+            for dtype, field_offset, format_char in specs
+        ]
+        del buf
+    finally:
+        shm.close()
+    return cmd_bytes, offsets, end, columns
+
+
+_executors = dict()
+
+
+# A process pool per worker count, kept for the life of the process so repeated calls don't
+# pay for starting workers
+def default_executor(workers):
+    if workers not in _executors:
+        _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _executors[workers]
+
+
+@atexit.register
+def _shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(cancel_futures=True)
+    _executors.clear()
+
+
+def _specs(layout, names):
+    by_name = {name: (offset, prim) for name, offset, prim in layout}
+    specs = list()
+    for name in names:
+        field_offset, prim = by_name[name]
+        dtype = numpy_dtype(prim.format_char).newbyteorder("=")
+        specs.append((dtype, field_offset, prim.format_char))
+    return specs
+
+
+# Builds the EventIndex of buf with the event walk (the part that costs something, a python
+# step per event) split into chunks between FrameStart anchors and run on a process pool.
+# Also decodes names of every cmd_byte event in the same pass. Returns (index, columns), the
+# columns cover every cmd_byte event including rolled back ones.
+def _parallel_index(
+    buf, cmd_byte, layout_fn, names, workers, chunks_per_worker, executor, min_chunk_bytes
+):
+    header = EventIndex(buf, events=((), ()))
+    if workers != 0:
+        workers = workers or os.cpu_count()
+    n_chunks = min(
+        workers * chunks_per_worker,
+        (header.raw_end - header.raw_start) // max(min_chunk_bytes, 1),
+    )
+    bounds = find_chunk_bounds(header, n_chunks) if n_chunks > 1 else []
+    if not bounds:
+        index = EventIndex(buf)
+        cols = decode_columns(index, index.find(cmd_byte), layout_fn(index), names) if names else {}
+        return index, {name: c.astype(c.dtype.newbyteorder("=")) for name, c in cols.items()}
+
+    # The layout needs the version, which is in GameStart at the very start of the first chunk
+    first_stop = bounds[0]
+    try:
+        first = scan_events(header.buf, header.raw_start, first_stop, header.size_lut())
+    except NotImplementedError:
+        first = None
+    # Same check as for the workers' chunks below, before any of them is started
+    if first is None or first[2] != first_stop:
+        return _parallel_index(buf, cmd_byte, layout_fn, names, 0, 1, None, min_chunk_bytes)
+    header = EventIndex(buf, events=first[:2])
+    specs = _specs(layout_fn(header), names) if names else []
+
+    size_lut = header.size_lut().tolist()
+    shm = SharedMemory(create=True, size=max(len(header.buf), 1))
+    shm.buf[: len(header.buf)] = header.buf
+    executor = executor or default_executor(workers)
+    try:
+        starts = [first_stop] + bounds[1:]
+        stops = bounds[1:] + [header.raw_end]
+        futures = [
+            executor.submit(_scan_chunk, shm.name, size_lut, start, stop, cmd_byte, specs)
+            for start, stop in zip(starts, stops)
+        ]
+        results = [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # A chunk that didn't end exactly on the next chunk's anchor means the anchor wasn't a
+    # real boundary after all - start over with a plain scan
+    ends = [end for _, _, end, _ in results]
+    if None in ends or ends[:-1] != stops[:-1]:
+        return _parallel_index(buf, cmd_byte, layout_fn, names, 0, 1, None, min_chunk_bytes)
+
+    first_cols = (
+        decode_columns(header, np.flatnonzero(first[0] == cmd_byte), layout_fn(header), names)
+        if names
+        else {}
+    )
+    index = EventIndex(
+        buf,
+        events=(
+            np.concatenate([first[0]] + [r[0] for r in results]),
+            np.concatenate([first[1]] + [r[1] for r in results]),
+        ),
+    )
+    columns = {
+        name: np.concatenate(
+            [first_cols[name].astype(dtype)] + [r[3][i] for r in results]
+        )
+        for i, (name, (dtype, _, _)) in enumerate(zip(names, specs))
+    }
+    return index, columns
+
+
+# EventIndex of buf built on a process pool, see _parallel_index. workers=0 scans in-process.
+def parallel_event_index(
+    buf, workers=None, chunks_per_worker=4, executor=None, min_chunk_bytes=MIN_CHUNK_BYTES
+):
+    index, _ = _parallel_index(
+        buf, None, None, (), workers, chunks_per_worker, executor, min_chunk_bytes
+    )
+    return index
+
+
+# Same columns as decode_columns over every event with cmd_byte, after rollback resolution.
+# Workers each walk and decode a frame-aligned chunk of the replay bytes, which they read from
+# shared memory, and the chunks are stitched and rollback resolved afterwards. workers=0, or a
+# replay too small to be worth it, runs in-process. Pools are reused across calls, an executor
+# can be passed in instead. Columns come out in native byte order.
+def parallel_decode_columns(
+    buf,
+    cmd_byte,
+    names,
+    config_dir="configs",
+    workers=None,
+    chunks_per_worker=4,
+    slp_bin=None,
+    executor=None,
+    min_chunk_bytes=MIN_CHUNK_BYTES,
+):
+    slp_bin = slp_bin or SlpBin(config_dir)
+    template = slp_bin.CMD_BYTE_TEMPLATE_MAP[cmd_byte]
+    if isinstance(buf, EventIndex):
+        index = buf
+        cols = decode_columns(index, index.find(cmd_byte), template.layout(index.version), names)
+        cols = {name: c.astype(c.dtype.newbyteorder("=")) for name, c in cols.items()}
+    else:
+        index, cols = _parallel_index(
+            buf,
+            cmd_byte,
+            lambda index: template.layout(index.version),
+            names,
+            workers,
+            chunks_per_worker,
+            executor,
+            min_chunk_bytes,
+        )
+    keep = final_frame_mask(index)[index.find(cmd_byte)]
+    return {name: c[keep] for name, c in cols.items()}
@@ -1,9 +1,11 @@
 import copy
 import hashlib
+import io
 import json
 import os
 import struct
-from dataclasses import dataclass, fields
+import threading
+from dataclasses import dataclass
 from itertools import zip_longest
 from typing import Optional, Union
 import numpy as np
@@ -25,46 +27,149 @@ from slp_dataclasses import (
     StartBookendFrameList,
 )
 from slp_dataclasses.eventpayloads import generate_payload_size_dict
+from slp_codegen import get_codec
+from slp_quantize import EXPORT_FLOAT32, quantize
 from slp_dataclasses.gecko import GeckoCode
+from slp_validation import (
+    SEVERITY_INFO,
+    SEVERITY_WARNING,
+    VALIDATION_CHEAP,
+    VALIDATION_NONE,
+    VALIDATION_STRICT,
+    SlpValidationError,
+    ValidationIssue,
+    check_validation_level,
+)
 
 
-class SlpBin:
-    def __init__(self, config_dir):
+def load_dataclass(config_dir, filename, class_type):
+    with open(os.path.join(config_dir, filename), "r") as f:
+        data = json.load(f)
+    return from_dict(data_class=class_type, data=data)
 
-        self.event_payloads: Optional[EventPayloads] = None
-        self.payload_size_dict: dict = dict()
-        self.version: str = ""
-        self.pre_frames: PrePostFrameList = PrePostFrameList()
-        self.item_updates: ItemList = ItemList()
-        self.post_frames: PrePostFrameList = PrePostFrameList()
-        self.frame_starts: StartBookendFrameList = StartBookendFrameList()
-        self.frame_bookends: StartBookendFrameList = StartBookendFrameList()
-        self.game_start: GameStart = self.init_dataclass(
-            config_dir, "game_start_defaults.json", GameStart
+
+# The templates of every payload type, loaded once from config_dir, plus the compiled codecs for
+# them. Nothing here is modified after construction - parsing always reads into copies - so one
+# schema can be shared by any number of SlpBin sessions, including across threads.
+class SlpSchema:
+    _shared = dict()
+    _shared_lock = threading.Lock()
+
+    def __init__(self, config_dir, codegen_cache_dir=None):
+        self.config_dir = config_dir
+        self.codegen_cache_dir = codegen_cache_dir
+        self._codecs = dict()
+        self._codecs_lock = threading.Lock()
+
+        self.game_start = load_dataclass(config_dir, "game_start_defaults.json", GameStart)
+        self.game_end = load_dataclass(config_dir, "game_end_defaults.json", GameEnd)
+        self.message_splitter_template = load_dataclass(
+            config_dir, "message_splitter_defaults.json", MessageSplitter
         )
-        self.gecko = self.init_gecko(config_dir)
-        self.gecko_code = None
-        self.gecko_cmd_byte = None
-        self.pre_frame_update_template: PreFrameUpdate = self.init_dataclass(
+        self.pre_frame_update_template = load_dataclass(
             config_dir, "pre_frame_defaults.json", PreFrameUpdate
         )
-        self.item_update_template: ItemUpdate = self.init_dataclass(
+        self.item_update_template = load_dataclass(
             config_dir, "item_update_defaults.json", ItemUpdate
         )
-        self.post_frame_update_template: PostFrameUpdate = self.init_dataclass(
+        self.post_frame_update_template = load_dataclass(
             config_dir, "post_frame_defaults.json", PostFrameUpdate
         )
-        self.frame_start_template: FrameStart = self.init_dataclass(
+        self.frame_start_template = load_dataclass(
             config_dir, "frame_start_defaults.json", FrameStart
         )
-
-        self.frame_bookend_template: FrameBookend = self.init_dataclass(
+        self.frame_bookend_template = load_dataclass(
             config_dir, "frame_bookend_defaults.json", FrameBookend
         )
 
-        self.game_end: GameEnd = self.init_dataclass(
-            config_dir, "game_end_defaults.json", GameEnd
-        )
+    # Compiled codecs and locks don't pickle, they're rebuilt on the other side
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_codecs"], state["_codecs_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._codecs = dict()
+        self._codecs_lock = threading.Lock()
+
+    # One schema per (config_dir, codegen_cache_dir) per process
+    @classmethod
+    def shared(cls, config_dir, codegen_cache_dir=None):
+        key = (os.path.abspath(config_dir), codegen_cache_dir)
+        schema = cls._shared.get(key)
+        if schema is None:
+            with cls._shared_lock:
+                schema = cls._shared.get(key)
+                if schema is None:
+                    schema = cls._shared[key] = cls(config_dir, codegen_cache_dir)
+        return schema
+
+    def codec(self, template, version, ignore_fields=()):
+        key = (type(template), version, ignore_fields)
+        codec = self._codecs.get(key)
+        if codec is None:
+            with self._codecs_lock:
+                codec = self._codecs.get(key)
+                if codec is None:
+                    codec = self._codecs[key] = get_codec(
+                        template, version, ignore_fields, self.codegen_cache_dir
+                    )
+        return codec
+
+    # A fresh SlpBin to parse one replay with, sharing this schema
+    def session(self, validation=VALIDATION_CHEAP, codegen=False):
+        return SlpBin(self.config_dir, validation=validation, codegen=codegen, schema=self)
+
+
+# Parses one replay and holds everything read from it. All parse state (game start/end, frame
+# lists, the global frame numbers) lives on the instance, so a SlpBin must only be used by one
+# thread at a time - parse several replays concurrently with one SlpBin each, created from a
+# shared SlpSchema so the templates aren't loaded again for every replay.
+class SlpBin:
+    # codegen reads and writes frame payloads with generated straight-line code (see
+    # slp_codegen) instead of walking the dataclasses, codegen_cache_dir is passed through
+    def __init__(
+        self,
+        config_dir,
+        validation=VALIDATION_CHEAP,
+        codegen=False,
+        codegen_cache_dir=None,
+        schema=None,
+    ):
+        self.validation = check_validation_level(validation)
+        self.codegen = codegen
+        self.codegen_cache_dir = codegen_cache_dir
+        self.issues: list[ValidationIssue] = list()
+
+        # Without a shared schema this instance owns a private one and may read into its
+        # templates directly, a shared schema's game start/end get copied first
+        if schema is None:
+            schema = SlpSchema(config_dir, codegen_cache_dir)
+            self.game_start: GameStart = schema.game_start
+            self.game_end: GameEnd = schema.game_end
+        else:
+            self.codegen_cache_dir = schema.codegen_cache_dir
+            self.game_start: GameStart = copy.deepcopy(schema.game_start)
+            self.game_end: GameEnd = copy.deepcopy(schema.game_end)
+        self.schema = schema
+
+        self.event_payloads: Optional[EventPayloads] = None
+        self.payload_size_dict: dict = dict()
+        self.version: str = ""
+        self.pre_frames: PrePostFrameList = PrePostFrameList()
+        self.item_updates: ItemList = ItemList()
+        self.post_frames: PrePostFrameList = PrePostFrameList()
+        self.frame_starts: StartBookendFrameList = StartBookendFrameList()
+        self.frame_bookends: StartBookendFrameList = StartBookendFrameList()
+        self.gecko = GeckoCode(schema.message_splitter_template)
+        self.gecko_code = None
+        self.gecko_cmd_byte = None
+        self.pre_frame_update_template: PreFrameUpdate = schema.pre_frame_update_template
+        self.item_update_template: ItemUpdate = schema.item_update_template
+        self.post_frame_update_template: PostFrameUpdate = schema.post_frame_update_template
+        self.frame_start_template: FrameStart = schema.frame_start_template
+        self.frame_bookend_template: FrameBookend = schema.frame_bookend_template
 
         self.CMD_BYTE_PARSER_MAP = {
             0x10: self.parse_gecko_split,
@@ -78,6 +183,16 @@ class SlpBin:
             0x3C: self.parse_frame_bookend,
         }
 
+        self.CMD_BYTE_TEMPLATE_MAP = {
+            0x10: self.gecko.ms_template,
+            0x37: self.pre_frame_update_template,
+            0x38: self.post_frame_update_template,
+            0x39: self.game_end,
+            0x3A: self.frame_start_template,
+            0x3B: self.item_update_template,
+            0x3C: self.frame_bookend_template,
+        }
+
         self.metadata: Optional[bytes] = None
         self.pre_global_frame_number = (
             self.post_global_frame_number
@@ -86,16 +201,6 @@ class SlpBin:
         ) = self.item_global_frame_number = self.bookend_global_frame_number = -123
 
         self.original_ordered_payloads = list()
-    def init_dataclass(self, config_dir, filename, class_type):
-        with open(os.path.join(config_dir, filename), "r") as f:
-            data = json.load(f)
-        return from_dict(data_class=class_type, data=data)
-
-    def init_gecko(self, config_dir):
-        ms_template = self.init_dataclass(
-            config_dir, "message_splitter_defaults.json", MessageSplitter
-        )
-        return GeckoCode(ms_template)
 
     def read_ubjson_header(self, stream):
         # 15 characters:
@@ -106,38 +211,171 @@ class SlpBin:
 
         return bin_len
 
-    def read(self, stream):
+    # With header_only, stops right after GameStart - enough for catalog queries
+    # (characters, stage, match_id) without paying for the frame events
+    def read(self, stream, header_only=False):
         self.total_bin_len = self.read_ubjson_header(stream)
         start_offset = stream.tell()
+        if self.validation != VALIDATION_NONE:
+            self.check_raw_bounds(stream, start_offset)
+
         self.event_payloads = EventPayloads.read(stream)
         self.payload_size_dict = generate_payload_size_dict(self.event_payloads)
 
+        checked = self.validation != VALIDATION_NONE
+        strict = self.validation == VALIDATION_STRICT
+        raw_end = start_offset + self.total_bin_len
         total_read = stream.tell()
         while total_read - start_offset < self.total_bin_len:
-            cmd_byte = struct.unpack(">B", stream.read(1))[0]
+            b = stream.read(1)
+            if checked and not b:
+                self.report(
+                    ValidationIssue(
+                        "raw_bounds",
+                        f"Stream ended at offset {total_read}, {raw_end - total_read} bytes short of the raw length in the UBJSON header",
+                        offset=total_read,
+                    )
+                )
+            cmd_byte = struct.unpack(">B", b)[0]
+            # Works on streams that can't seek too, unlike check_raw_bounds
+            if checked and total_read + 1 + self.payload_size_dict.get(cmd_byte, 0) > raw_end:
+                self.report(
+                    ValidationIssue(
+                        "event_bounds",
+                        f"Event at offset {total_read} is {self.payload_size_dict[cmd_byte] + 1} bytes, only {raw_end - total_read} are left in the raw section",
+                        offset=total_read,
+                        cmd_byte=cmd_byte,
+                    )
+                )
             if cmd_byte in self.CMD_BYTE_PARSER_MAP:
-                self.CMD_BYTE_PARSER_MAP[cmd_byte](cmd_byte, stream)
+                try:
+                    self.CMD_BYTE_PARSER_MAP[cmd_byte](cmd_byte, stream)
+                except struct.error:
+                    # A field came up short, the stream ended inside this event
+                    if not checked:
+                        raise
+                    self.report(
+                        ValidationIssue(
+                            "raw_bounds",
+                            f"Stream ended inside the event at offset {total_read}",
+                            offset=total_read,
+                            cmd_byte=cmd_byte,
+                        )
+                    )
             elif cmd_byte in self.payload_size_dict:
-                print(f"Warning: Unknown payload command byte found: {cmd_byte}")
+                if self.validation != VALIDATION_NONE:
+                    self.report(
+                        ValidationIssue(
+                            "unknown_command",
+                            f"Unknown payload command byte found: {cmd_byte}",
+                            SEVERITY_WARNING,
+                            offset=total_read,
+                            cmd_byte=cmd_byte,
+                        )
+                    )
                 _ = stream.read(self.payload_size_dict[cmd_byte])
             else:
-                raise NotImplementedError(
-                    f"Command byte {cmd_byte} not defined in CMD_BYTE_PARSER_MAP nor in EventPayloads"
+                message = f"Command byte {cmd_byte} not defined in CMD_BYTE_PARSER_MAP nor in EventPayloads"
+                if self.validation == VALIDATION_NONE:
+                    raise NotImplementedError(message)
+                # Without a size the rest of the raw section can't be walked, so this always
+                # raises
+                self.report(
+                    ValidationIssue(
+                        "undefined_command", message, offset=total_read, cmd_byte=cmd_byte
+                    )
                 )
 
             new_stream_loc = stream.tell()
-            assert (
-                new_stream_loc - total_read - 1 == self.payload_size_dict[cmd_byte]
-            ), f"Read payload size differs from payload size defined in EventPayloads. Read = {new_stream_loc - total_read - 1}, Payload = {self.payload_size_dict[cmd_byte]}"
+            if checked:
+                read_size = new_stream_loc - total_read - 1
+                if read_size != self.payload_size_dict[cmd_byte]:
+                    self.report(
+                        ValidationIssue(
+                            "payload_size",
+                            f"Read payload size differs from payload size defined in EventPayloads. Read = {read_size}, Payload = {self.payload_size_dict[cmd_byte]}",
+                            offset=total_read,
+                            cmd_byte=cmd_byte,
+                        )
+                    )
+            if strict and cmd_byte == 0x36:
+                self.check_schema()
             total_read = new_stream_loc
 
-        assert (
-            total_read - start_offset == self.total_bin_len
-        ), "Mismatch between actual read size and size listed in UBJSON header"
+            if header_only and cmd_byte == 0x36:
+                return
+
+        if self.validation != VALIDATION_NONE and total_read - start_offset != self.total_bin_len:
+            self.report(
+                ValidationIssue(
+                    "raw_size",
+                    f"Mismatch between actual read size {total_read - start_offset} and size listed in UBJSON header {self.total_bin_len}",
+                    offset=total_read,
+                )
+            )
 
         # Read till end to get metadata
         self.metadata = stream.read()
 
+    # Errors raise right away, warnings and info are only collected in self.issues
+    def report(self, issue):
+        self.issues.append(issue)
+        if issue.severity not in (SEVERITY_INFO, SEVERITY_WARNING):
+            raise SlpValidationError([issue])
+
+    def check_raw_bounds(self, stream, start_offset):
+        if not stream.seekable():
+            self.report(
+                ValidationIssue(
+                    "raw_bounds_skipped",
+                    "Stream can't seek, the raw length is only checked event by event",
+                    SEVERITY_INFO,
+                    offset=start_offset,
+                )
+            )
+            return
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(start_offset)
+        if end - start_offset < self.total_bin_len:
+            self.report(
+                ValidationIssue(
+                    "raw_bounds",
+                    f"UBJSON header lists {self.total_bin_len} raw bytes but only {end - start_offset} follow it",
+                    offset=start_offset,
+                )
+            )
+
+    # Every payload this parser decodes has to be exactly as long as EventPayloads says for
+    # the replay's version, otherwise fields would be read from the wrong offsets
+    def check_schema(self):
+        templates = dict(self.CMD_BYTE_TEMPLATE_MAP)
+        templates[0x36] = self.game_start
+        for cmd_byte, template in templates.items():
+            if cmd_byte not in self.payload_size_dict:
+                continue
+            layout = template.layout(self.version)
+            _, last_offset, last = layout[-1]
+            expected = last_offset + last.size() - 1
+            if expected != self.payload_size_dict[cmd_byte]:
+                self.report(
+                    ValidationIssue(
+                        "schema",
+                        f"{type(template).__name__} is {expected} bytes for version {self.version}, EventPayloads says {self.payload_size_dict[cmd_byte]}",
+                        cmd_byte=cmd_byte,
+                    )
+                )
+
+    def check_rollback(self, name, last_frame, frame_number):
+        if self.validation == VALIDATION_STRICT and frame_number < last_frame:
+            self.report(
+                ValidationIssue(
+                    "rollback",
+                    f"{name} rollback from {last_frame} to {frame_number}",
+                    SEVERITY_INFO,
+                    frame_number=frame_number,
+                )
+            )
+
     def parse_gecko_split(self, cmd_byte, stream):
         self.gecko.add_message(cmd_byte, stream, self.version)
         self.original_ordered_payloads.append(self.gecko.message_splitter_list[-1])
@@ -166,7 +404,7 @@ class SlpBin:
     def parse_game_end(self, cmd_byte, stream):
         self.game_end.command_byte.val = cmd_byte
 
-        self.game_end.read(stream, self.version, ignore_fields=["command_byte"])
+        self.read_payload(self.game_end, stream)
 
         self.original_ordered_payloads.append(self.game_end)
 
@@ -176,98 +414,136 @@ class SlpBin:
 
         self.original_ordered_payloads.append(self.gecko_code)
 
-    def write_gecko_code(self, stream):
-        if self.gecko_code and self.gecko_cmd_byte:
-            stream.write(struct.pack(">B", self.gecko_cmd_byte))
-            stream.write(self.gecko_code)
-        elif len(self.gecko):
-            self.gecko.write_message_splitter_list(stream, self.version)
-
     def parse_pre_frame_update(self, cmd_byte, stream):
-        pfu = copy.deepcopy(self.pre_frame_update_template)
+        pfu = self.new_payload(self.pre_frame_update_template)
         pfu.command_byte.val = cmd_byte
 
-        pfu.read(stream, self.version, ignore_fields=["command_byte"])
-        if pfu.frame_number.val < self.pre_global_frame_number:
-            print(
-                f"Pre rollback from {self.pre_global_frame_number} to {pfu.frame_number.val}"
-            )
+        self.read_payload(pfu, stream)
+        self.check_rollback(
+            "Pre", self.pre_global_frame_number, pfu.frame_number.val
+        )
         self.pre_global_frame_number = pfu.frame_number.val
         self.pre_frames.add_frame(pfu)
 
         self.original_ordered_payloads.append(pfu)
 
     def parse_post_frame_update(self, cmd_byte, stream):
-        pfu = copy.deepcopy(self.post_frame_update_template)
+        pfu = self.new_payload(self.post_frame_update_template)
         pfu.command_byte.val = cmd_byte
 
-        pfu.read(stream, self.version, ignore_fields=["command_byte"])
-        if pfu.frame_number.val < self.post_global_frame_number:
-            print(
-                f"Post rollback from {self.post_global_frame_number} to {pfu.frame_number.val}"
-            )
+        self.read_payload(pfu, stream)
+        self.check_rollback(
+            "Post", self.post_global_frame_number, pfu.frame_number.val
+        )
         self.post_global_frame_number = pfu.frame_number.val
         self.post_frames.add_frame(pfu)
 
         self.original_ordered_payloads.append(pfu)
 
     def parse_frame_start(self, cmd_byte, stream):
-        fs = copy.deepcopy(self.frame_start_template)
+        fs = self.new_payload(self.frame_start_template)
         fs.command_byte.val = cmd_byte
 
-        fs.read(stream, self.version, ignore_fields=["command_byte"])
-        if fs.frame_number.val < self.start_global_frame_number:
-            print(
-                f"Start rollback from {self.start_global_frame_number} to {fs.frame_number.val}"
-            )
+        self.read_payload(fs, stream)
+        self.check_rollback(
+            "Start", self.start_global_frame_number, fs.frame_number.val
+        )
         self.start_global_frame_number = fs.frame_number.val
         self.frame_starts.add_frame(fs)
 
         self.original_ordered_payloads.append(fs)
 
     def parse_item_update(self, cmd_byte, stream):
-        iu = copy.deepcopy(self.item_update_template)
+        iu = self.new_payload(self.item_update_template)
         iu.command_byte.val = cmd_byte
 
-        iu.read(stream, self.version, ignore_fields=["command_byte"])
-        if iu.frame_number.val < self.item_global_frame_number:
-            print(
-                f"Item rollback from {self.item_global_frame_number} to {iu.frame_number.val}"
-            )
+        self.read_payload(iu, stream)
+        self.check_rollback(
+            "Item", self.item_global_frame_number, iu.frame_number.val
+        )
         self.item_global_frame_number = iu.frame_number.val
         self.item_updates.add_item(iu)
 
         self.original_ordered_payloads.append(iu)
 
     def parse_frame_bookend(self, cmd_byte, stream):
-        fb = copy.deepcopy(self.frame_bookend_template)
+        fb = self.new_payload(self.frame_bookend_template)
         fb.command_byte.val = cmd_byte
 
-        fb.read(stream, self.version, ignore_fields=["command_byte"])
-        if fb.frame_number.val < self.bookend_global_frame_number:
-            print(
-                f"Bookend rollback from {self.bookend_global_frame_number} to {fb.frame_number.val}"
-            )
+        self.read_payload(fb, stream)
+        self.check_rollback(
+            "Bookend", self.bookend_global_frame_number, fb.frame_number.val
+        )
         self.bookend_global_frame_number = fb.frame_number.val
         self.frame_bookends.add_frame(fb)
 
         self.original_ordered_payloads.append(fb)
 
+    def codec(self, obj, ignore_fields=()):
+        return self.schema.codec(obj, self.version, ignore_fields)
+
+    # Fresh copy of a template to read a payload into
+    def new_payload(self, template):
+        if self.codegen:
+            return self.codec(template, ("command_byte",)).clone(template)
+        return copy.deepcopy(template)
+
+    # Reads obj's payload, the command byte has already been consumed
+    def read_payload(self, obj, stream):
+        if self.codegen:
+            self.codec(obj, ("command_byte",)).read(obj, stream)
+        else:
+            obj.read(stream, self.version, ignore_fields=["command_byte"])
+
+    def write_payload(self, obj, stream):
+        # GameStart writes untouched fields straight from its raw bytes already
+        if self.codegen and not isinstance(obj, GameStart):
+            self.codec(obj).write(obj, stream)
+        else:
+            obj.write(stream, self.version)
+
+    # Decodes a single raw payload (command byte excluded) into a fresh dataclass without
+    # touching any parse state. Frame payloads are decoded with self.version.
+    def decode_payload(self, cmd_byte, payload):
+        stream = io.BytesIO(payload)
+        if cmd_byte == 0x36:
+            gs = copy.deepcopy(self.game_start)
+            gs.command_byte.val = cmd_byte
+            major, minor, build, unused = self.parse_version(stream)
+            (
+                gs.version.major.val,
+                gs.version.minor.val,
+                gs.version.build.val,
+                gs.version.unused.val,
+            ) = (major, minor, build, unused)
+            gs.read(
+                stream,
+                f"{major}.{minor}.{build}",
+                ignore_fields=["command_byte", "version"],
+            )
+            return gs
+
+        if cmd_byte not in self.CMD_BYTE_TEMPLATE_MAP:
+            raise NotImplementedError(f"No template to decode command byte {cmd_byte}")
+        obj = copy.deepcopy(self.CMD_BYTE_TEMPLATE_MAP[cmd_byte])
+        obj.command_byte.val = cmd_byte
+        self.read_payload(obj, stream)
+        return obj
+
     def write_ubjson_header(self, stream, size):
         stream.write(
             b"{U" + struct.pack(">B", 3) + b"raw[$U#l" + struct.pack(">I", size)
         )
 
-    def write(self, stream):
-        # if for whatever odd reason this stream does not start at 0
-        location_0 = stream.tell()
-        self.write_ubjson_header(stream, 0)
-        start_offset = stream.tell()
+    # Everything after EventPayloads in write order. Raw gecko codes come out as bytes, including
+    # their command byte; everything else is a payload dataclass.
+    def iter_write_payloads(self):
+        yield self.game_start
 
-        # Main payload writes
-        self.event_payloads.write(stream, self.version)
-        self.game_start.write(stream, self.version)
-        self.write_gecko_code(stream)
+        if self.gecko_code and self.gecko_cmd_byte:
+            yield struct.pack(">B", self.gecko_cmd_byte) + self.gecko_code
+        elif len(self.gecko):
+            yield from self.gecko.message_splitter_list
 
         for start, pres, item_update, posts, bookend in zip_longest(
             self.frame_starts,
@@ -277,31 +553,62 @@ class SlpBin:
             self.frame_bookends,
         ):
             if start:
-                start.write(stream, self.version)
+                yield start
             if pres:
-                for pre in pres:
-                    if pre:
-                        pre.write(stream, self.version)
+                yield from pres
             if item_update:
-                for item in item_update:
-                    item.write(stream, self.version)
+                yield from item_update
             if posts:
-                for post in posts:
-                    if post:
-                        post.write(stream, self.version)
+                yield from posts
             if bookend:
-                bookend.write(stream, self.version)
+                yield bookend
 
-        self.game_end.write(stream, self.version)
+        yield self.game_end
 
-        total_written = stream.tell() - start_offset
+    # Size of the raw UBJSON element, computed from payload_size_dict and the events to be written
+    def raw_size(self):
+        total = 1 + self.payload_size_dict[self.event_payloads.command_byte.val]
+        for p in self.iter_write_payloads():
+            if isinstance(p, bytes):
+                total += len(p)
+            else:
+                total += 1 + self.payload_size_dict[p.command_byte.val]
+        return total
+
+    # Emits the whole .slp in one forward pass, so the stream never has to be seekable (pipes,
+    # sockets, gzip streams). Payloads are buffered and flushed in chunks of about chunk_size bytes.
+    def write(self, stream, chunk_size=1 << 16):
+        raw_size = self.raw_size()
+        self.write_ubjson_header(stream, raw_size)
+
+        buf = io.BytesIO()
+        total_written = 0
+
+        def flush():
+            nonlocal buf, total_written
+            chunk = buf.getvalue()
+            total_written += len(chunk)
+            stream.write(chunk)
+            buf = io.BytesIO()
+
+        self.event_payloads.write(buf, self.version)
+        for p in self.iter_write_payloads():
+            if isinstance(p, bytes):
+                buf.write(p)
+            else:
+                self.write_payload(p, buf)
+            if buf.tell() >= chunk_size:
+                flush()
+        flush()
+
+        if total_written != raw_size:
+            raise ValueError(
+                f"Wrote {total_written} raw bytes but the UBJSON header says {raw_size}, payload sizes in EventPayloads don't match version {self.version}"
+            )
 
         stream.write(self.metadata)
 
-        stream.seek(location_0)
-        self.write_ubjson_header(stream, total_written)
-
-    def to_numpy(self, file_path):
+    def to_numpy(self, file_path=None):
         d = list()
         for _, pres, _, posts, _ in zip_longest(
             self.frame_starts,
@@ -312,14 +619,13 @@ class SlpBin:
         ):
             pres_np = []
             posts_np = []
-            if pres:
-                for pre in pres:
-                    if pre:
-                        pres_np.append(pre.to_numpy())
-            if posts:
-                for post in posts:
-                    if post:
-                        posts_np.append(post.to_numpy())
+            # Leaders only, so every frame has the same width
+            for pre in pres or ():
+                if not pre.is_follower.val:
+                    pres_np.append(pre.to_numpy())
+            for post in posts or ():
+                if not post.is_follower.val:
+                    posts_np.append(post.to_numpy())
 
             frame_data = []
             for pre_zip, post_zip in zip(pres_np, posts_np):
@@ -327,8 +633,28 @@ class SlpBin:
             frame_data = np.concatenate(frame_data)
             d.append(frame_data)
 
-        return np.array(d)
-
+        d = np.array(d)
+        if file_path:
+            np.save(file_path, d)
+        return d
+
+    # Same per-player features as to_numpy, but shaped (frames, 4, features) so every port
+    # keeps its slot. Ports without a frame are left as zeros, followers are left out. Modes
+    # other than EXPORT_FLOAT32 give a (frames, 4) structured array instead, see slp_quantize.
+    def to_player_numpy(self, mode=EXPORT_FLOAT32):
+        n_pre = len(self.pre_frame_update_template.to_numpy())
+        n_post = len(self.post_frame_update_template.to_numpy())
+        n_frames = max(len(self.pre_frames), len(self.post_frames))
+
+        d = np.zeros((n_frames, 4, n_pre + n_post), dtype=np.float32)
+        for i, (pres, posts) in enumerate(zip_longest(self.pre_frames, self.post_frames)):
+            for pre in pres or ():
+                if not pre.is_follower.val:
+                    d[i, pre.player_index.val, :n_pre] = pre.to_numpy()
+            for post in posts or ():
+                if not post.is_follower.val:
+                    d[i, post.player_index.val, n_pre:] = post.to_numpy()
+        return quantize(d, mode)
 
     def dump_original_ordered_payload_names(self, file_path):
         with open(file_path, "w") as f:
@@ -337,23 +663,21 @@ class SlpBin:
                 if hasattr(p, "frame_number"):
                     # f.write(type(p).__name__ + ", " + str(p.frame_number.val) + "\n")
                     s = s + ", " + str(p.frame_number.val)
-                s = s + ", " + str(hash_obj(p))
+                s = s + ", " + hash_obj(p, self.version)
                 f.write(s + "\n")
 
 
-def hash_obj(obj):
-    s = "".join(
-        [
-            str(getattr(obj, field.name).val)
-            for field in fields(obj)
-            if hasattr(getattr(obj, field.name), "val")
-        ]
-    )
-    m = hashlib.sha256()
-    m.update(s.encode())
+# Short blake2b fingerprint of a payload's encoded bytes. Raw gecko codes are stored as bytes
+# and get hashed as they are.
+def hash_obj(obj, given_version=None):
+    if isinstance(obj, bytes):
+        b = obj
+    else:
+        stream = io.BytesIO()
+        obj.write(stream, given_version)
+        b = stream.getvalue()
 
-    return str(m.hexdigest())[:8]
-    # for f in obj.fields:
+    return hashlib.blake2b(b, digest_size=4).hexdigest()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+import io
+from collections import defaultdict
+
+import numpy as np
+
+from slp_index import (
+    EVENT_PAYLOADS_CMD_BYTE,
+    GAME_START_CMD_BYTE,
+    EventIndex,
+    decode_columns,
+    final_frame_mask,
+)
+from slp_parse import SlpSchema
+
+GECKO_CODE_CMD_BYTE = 0x3D
+
+EVENT_CMD_BYTES = {
+    "gecko_split": 0x10,
+    "game_start": GAME_START_CMD_BYTE,
+    "pre": 0x37,
+    "post": 0x38,
+    "game_end": 0x39,
+    "frame_start": 0x3A,
+    "item": 0x3B,
+    "bookend": 0x3C,
+    "gecko": GECKO_CODE_CMD_BYTE,
+}
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def _cmd_byte(event):
+    if event not in EVENT_CMD_BYTES:
+        raise ValueError(f"Unknown event {event}, expected one of {list(EVENT_CMD_BYTES)}")
+    return EVENT_CMD_BYTES[event]
+
+
+# One raw payload (command byte excluded) as the object callbacks get it. session needs its
+# version set for frame payloads.
+def decode_event(session, cmd_byte, payload):
+    if cmd_byte == GECKO_CODE_CMD_BYTE:
+        return bytes(payload)
+    if cmd_byte == GAME_START_CMD_BYTE:
+        return session.decode_payload(cmd_byte, payload)
+    obj = session.new_payload(session.CMD_BYTE_TEMPLATE_MAP[cmd_byte])
+    obj.command_byte.val = cmd_byte
+    session.read_payload(obj, io.BytesIO(payload))
+    return obj
+
+
+# Single pass fan-out of one replay to any number of consumers. Callbacks registered with on()
+# get every event of their type as a decoded dataclass (the gecko code block as raw bytes), in
+# stream order. Every event is decoded at most once, all callbacks of a type get the same
+# object, so they mustn't modify it. Handlers registered with on_columns() get the scalar
+# fields they asked for as chunks of at most chunk_size rows decoded straight from the raw
+# bytes, events only column handlers want are never turned into objects. Chunks are delivered
+# as soon as they fill up, so they interleave with the callbacks in stream order.
+# codegen_cache_dir is passed through to slp_codegen.get_codec when no schema is given.
+class Pipeline:
+    def __init__(self, config_dir="configs", schema=None, codegen=False, codegen_cache_dir=None):
+        self.schema = schema or SlpSchema.shared(config_dir, codegen_cache_dir)
+        self.codegen = codegen
+        self.callbacks = defaultdict(list)
+        self.column_handlers = defaultdict(list)
+        self.finishers = list()
+
+    def on(self, event, callback):
+        self.callbacks[_cmd_byte(event)].append(callback)
+        return callback
+
+    # handler gets a dict of names -> arrays plus "event", every row's position in the
+    # EventIndex of the replay
+    def on_columns(self, event, names, handler, chunk_size=DEFAULT_CHUNK_SIZE):
+        cmd_byte = _cmd_byte(event)
+        if cmd_byte in (GAME_START_CMD_BYTE, GECKO_CODE_CMD_BYTE):
+            raise ValueError(f"No column decoding for {event} events")
+        self.column_handlers[cmd_byte].append((tuple(names), handler, chunk_size))
+        return handler
+
+    # Registers every on_<event> method of consumer, plus its finish method to be called
+    # once the replay has been processed
+    def subscribe(self, consumer):
+        for event in EVENT_CMD_BYTES:
+            callback = getattr(consumer, f"on_{event}", None)
+            if callback is not None:
+                self.on(event, callback)
+        if hasattr(consumer, "finish"):
+            self.finishers.append(consumer.finish)
+        return consumer
+
+    def dispatch(self, cmd_byte, obj):
+        for callback in self.callbacks.get(cmd_byte, ()):
+            callback(obj)
+
+    def finish(self):
+        for finish in self.finishers:
+            finish()
+
+    # Column chunks of every handler of cmd_byte, as (position of the chunk's last event,
+    # event indices of the chunk, handlers sharing that chunk size)
+    def _chunks(self, events, cmd_byte):
+        by_size = defaultdict(list)
+        for names, handler, chunk_size in self.column_handlers[cmd_byte]:
+            by_size[chunk_size].append((names, handler))
+        chunks = list()
+        for chunk_size, handlers in by_size.items():
+            for start in range(0, len(events), chunk_size):
+                chunk = events[start : start + chunk_size]
+                chunks.append((int(chunk[-1]), chunk, handlers))
+        return chunks
+
+    # Runs every consumer over one replay. With resolve_rollbacks, rolled back copies of frames
+    # are skipped and consumers only see the final version of each frame. Returns the number of
+    # events of each type that were dispatched.
+    def run(self, buf, resolve_rollbacks=False):
+        index = buf if isinstance(buf, EventIndex) else EventIndex(buf)
+        keep = index.cmd_bytes != EVENT_PAYLOADS_CMD_BYTE
+        if resolve_rollbacks:
+            keep &= final_frame_mask(index)
+
+        wanted = set(self.callbacks) | set(self.column_handlers)
+        counts = dict()
+        object_mask = np.zeros(len(index), dtype=bool)
+        due = defaultdict(list)
+        for cmd_byte in wanted:
+            events = np.flatnonzero(keep & (index.cmd_bytes == cmd_byte))
+            counts[cmd_byte] = len(events)
+            if cmd_byte in self.callbacks:
+                object_mask[events] = True
+            for last, chunk, handlers in self._chunks(events, cmd_byte):
+                due[last].append((cmd_byte, chunk, handlers))
+
+        session = self.schema.session(codegen=self.codegen)
+        if any(counts[c] for c in wanted - {GECKO_CODE_CMD_BYTE}):
+            session.version = index.version
+        layouts = dict()
+        # Only events someone wants as an object or that close a column chunk are visited here
+        for i in sorted(set(np.flatnonzero(object_mask).tolist()) | set(due)):
+            cmd_byte = int(index.cmd_bytes[i])
+            if object_mask[i]:
+                self.dispatch(cmd_byte, decode_event(session, cmd_byte, index.payload(i)))
+            for chunk_cmd_byte, chunk, handlers in due.get(i, ()):
+                if chunk_cmd_byte not in layouts:
+                    template = session.CMD_BYTE_TEMPLATE_MAP[chunk_cmd_byte]
+                    layouts[chunk_cmd_byte] = template.layout(session.version)
+                # Fields wanted by several handlers are only decoded once
+                all_names = list(dict.fromkeys(n for names, _ in handlers for n in names))
+                columns = decode_columns(index, chunk, layouts[chunk_cmd_byte], all_names)
+                for names, handler in handlers:
+                    cols = {name: columns[name] for name in names}
+                    cols["event"] = chunk
+                    handler(cols)
+
+        self.finish()
+        names = {cmd_byte: event for event, cmd_byte in EVENT_CMD_BYTES.items()}
+        return {names[cmd_byte]: n for cmd_byte, n in counts.items()}
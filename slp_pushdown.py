@@ -0,0 +1,104 @@
+import io
+
+import numpy as np
+
+from slp_index import EventIndex, decode_columns, final_frame_mask
+from slp_parse import SlpSchema
+
+# Action state ranges (inclusive) of the common grounded states: wait through jumpsquat,
+# crouch, landings, the ground attacks and the aerial landing lag states
+GROUNDED_STATES = ((0x0E, 0x18), (0x27, 0x40), (0x46, 0x4A))
+
+OPS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "in": lambda col, vals: np.isin(col, list(vals)),
+    "not in": lambda col, vals: ~np.isin(col, list(vals)),
+    # Inclusive on both ends
+    "between": lambda col, bounds: (col >= bounds[0]) & (col <= bounds[1]),
+    # Bitfields come out as packed ints, true where every bit of the mask is set
+    "has_bits": lambda col, bits: (col & bits) == bits,
+    # Any of several inclusive (lo, hi) ranges, e.g. GROUNDED_STATES
+    "in_ranges": lambda col, ranges: np.logical_or.reduce(
+        [(col >= lo) & (col <= hi) for lo, hi in ranges] or [np.zeros(len(col), dtype=bool)]
+    ),
+}
+
+
+def _check_predicates(where, layout):
+    by_name = {name for name, _, _ in layout}
+    for name, op, _ in where:
+        if name not in by_name:
+            raise KeyError(f"No scalar field {name} to filter on")
+        if op not in OPS:
+            raise ValueError(f"Unsupported predicate operator {op}, expected one of {list(OPS)}")
+
+
+# Positions in index of the events with cmd_byte that pass every predicate in where. A predicate
+# is (field name, operator, value), e.g. ("percent", ">", 100) or ("player_index", "==", 0).
+# Predicates are applied in order, each one only reads its field from the events that passed
+# the ones before it, so the most selective predicate should go first. Rolled back copies of a
+# frame are dropped before any predicate runs unless resolve_rollbacks is False.
+def select_events(index, cmd_byte, layout, where=(), resolve_rollbacks=True):
+    _check_predicates(where, layout)
+    mask = index.cmd_bytes == cmd_byte
+    if resolve_rollbacks:
+        mask &= final_frame_mask(index)
+    events = np.flatnonzero(mask)
+    for name, op, value in where:
+        if not len(events):
+            break
+        col = decode_columns(index, events, layout, (name,))[name]
+        events = events[OPS[op](col, value)]
+    return events
+
+
+def _prepare(buf, cmd_byte, config_dir, slp_bin):
+    index = buf if isinstance(buf, EventIndex) else EventIndex(buf)
+    slp_bin = slp_bin or SlpSchema.shared(config_dir).session()
+    if cmd_byte not in slp_bin.CMD_BYTE_TEMPLATE_MAP:
+        raise NotImplementedError(f"No template to decode command byte {cmd_byte}")
+    return index, slp_bin, slp_bin.CMD_BYTE_TEMPLATE_MAP[cmd_byte]
+
+
+# Columns of names (a projection) for only the events with cmd_byte that pass where. The
+# predicate fields don't have to be projected. An "event" column holds every row's position
+# in the index.
+def scan_columns(
+    buf, cmd_byte, names, where=(), config_dir="configs", slp_bin=None, resolve_rollbacks=True
+):
+    index, slp_bin, template = _prepare(buf, cmd_byte, config_dir, slp_bin)
+    layout = template.layout(index.version)
+    events = select_events(index, cmd_byte, layout, where, resolve_rollbacks)
+    columns = decode_columns(index, events, layout, names)
+    columns["event"] = events
+    return columns
+
+
+# Fully decoded dataclasses of only the events with cmd_byte that pass where, in stream order.
+# Everything else is never decoded past the predicate fields.
+def scan_payloads(
+    buf, cmd_byte, where=(), config_dir="configs", slp_bin=None, resolve_rollbacks=True
+):
+    index, slp_bin, template = _prepare(buf, cmd_byte, config_dir, slp_bin)
+    version = index.version
+    events = select_events(index, cmd_byte, template.layout(version), where, resolve_rollbacks)
+
+    slp_bin.version = version
+    codec = slp_bin.codec(template, ("command_byte",)) if slp_bin.codegen else None
+
+    payloads = list()
+    for i in events:
+        if codec is not None:
+            obj = codec.clone(template)
+            codec.unpack_from(obj, index.buf, int(index.offsets[i]) + 1)
+        else:
+            obj = slp_bin.new_payload(template)
+            obj.read(io.BytesIO(index.payload(i)), version, ignore_fields=["command_byte"])
+        obj.command_byte.val = cmd_byte
+        payloads.append(obj)
+    return payloads
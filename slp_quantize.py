@@ -0,0 +1,114 @@
+import numpy as np
+
+from slp_ragged import POST_FEATURES, PRE_FEATURES
+
+FEATURES = PRE_FEATURES + POST_FEATURES
+
+# float32 for everything, what to_player_numpy gives
+EXPORT_FLOAT32 = "float32"
+# Every field in its on-the-wire dtype, lossless
+EXPORT_NATIVE = "native"
+# Sticks as the 8-bit steps the console works in and continuous values as float16 or fixed
+# point, some precision is lost
+EXPORT_QUANTIZED = "quantized"
+
+# GameCube sticks have 80 steps from the center to the rim and analog triggers go up to 140,
+# so quantizing the floats back to those steps is lossless
+STICK_STEPS = 80
+TRIGGER_STEPS = 140
+
+# field -> (dtype, scale, offset) per mode. A stored value v stands for v * scale + offset.
+ENCODINGS = {
+    EXPORT_NATIVE: {
+        "action_state_id": ("u2", 1.0, 0.0),
+        "x_position": ("f4", 1.0, 0.0),
+        "y_position": ("f4", 1.0, 0.0),
+        "facing_direction": ("f4", 1.0, 0.0),
+        "joystick_x": ("f4", 1.0, 0.0),
+        "joystick_y": ("f4", 1.0, 0.0),
+        "cstick_x": ("f4", 1.0, 0.0),
+        "cstick_y": ("f4", 1.0, 0.0),
+        "trigger": ("f4", 1.0, 0.0),
+        "percent": ("f4", 1.0, 0.0),
+        "action_state_frame_counter": ("f4", 1.0, 0.0),
+        "hitlag_frames_remaining": ("f4", 1.0, 0.0),
+    },
+    EXPORT_QUANTIZED: {
+        "action_state_id": ("u2", 1.0, 0.0),
+        "x_position": ("f2", 1.0, 0.0),
+        "y_position": ("f2", 1.0, 0.0),
+        "facing_direction": ("i1", 1.0, 0.0),
+        "joystick_x": ("i1", 1 / STICK_STEPS, 0.0),
+        "joystick_y": ("i1", 1 / STICK_STEPS, 0.0),
+        "cstick_x": ("i1", 1 / STICK_STEPS, 0.0),
+        "cstick_y": ("i1", 1 / STICK_STEPS, 0.0),
+        "trigger": ("u1", 1 / TRIGGER_STEPS, 0.0),
+        # 1/64 steps up to 999% still fit 16 bits
+        "percent": ("u2", 1 / 64, 0.0),
+        "action_state_frame_counter": ("f2", 1.0, 0.0),
+        "hitlag_frames_remaining": ("f2", 1.0, 0.0),
+    },
+}
+
+
+def check_mode(mode):
+    if mode != EXPORT_FLOAT32 and mode not in ENCODINGS:
+        raise ValueError(
+            f"Unknown export mode {mode}, expected one of {[EXPORT_FLOAT32, *ENCODINGS]}"
+        )
+    return mode
+
+
+def encoded_dtype(mode):
+    if check_mode(mode) == EXPORT_FLOAT32:
+        return np.dtype(np.float32)
+    return np.dtype([(name, ENCODINGS[mode][name][0]) for name in FEATURES])
+
+
+# JSON-able description of an encoding, enough to decode the values without this module
+def encoding_metadata(mode):
+    check_mode(mode)
+    meta = {"mode": mode, "features": list(FEATURES)}
+    if mode != EXPORT_FLOAT32:
+        meta["fields"] = {
+            name: {"dtype": dtype, "scale": scale, "offset": offset}
+            for name, (dtype, scale, offset) in ENCODINGS[mode].items()
+        }
+    return meta
+
+
+# (..., features) float32 features, as to_player_numpy gives them, to a structured array of
+# shape (...) with one field per feature in the mode's dtypes. Integer fields are rounded to
+# the nearest step and clipped to their dtype's range.
+def quantize(frames, mode):
+    if check_mode(mode) == EXPORT_FLOAT32:
+        return np.asarray(frames, dtype=np.float32)
+    out = np.empty(frames.shape[:-1], dtype=encoded_dtype(mode))
+    for f, name in enumerate(FEATURES):
+        dtype, scale, offset = ENCODINGS[mode][name]
+        dtype = np.dtype(dtype)
+        vals = frames[..., f]
+        if dtype.kind in "iu":
+            info = np.iinfo(dtype)
+            vals = np.clip(np.rint((vals - offset) / scale), info.min, info.max)
+        elif scale != 1.0 or offset != 0.0:
+            vals = (vals - offset) / scale
+        out[name] = vals
+    return out
+
+
+# Inverse of quantize using the scale/offset metadata stored with the data, back to
+# (..., features) float32
+def dequantize(arr, meta):
+    if meta["mode"] == EXPORT_FLOAT32:
+        return np.asarray(arr, dtype=np.float32)
+    out = np.empty(arr.shape + (len(meta["features"]),), dtype=np.float32)
+    for f, name in enumerate(meta["features"]):
+        field = meta["fields"][name]
+        vals = arr[name].astype(np.float32)
+        if field["scale"] != 1.0:
+            vals *= np.float32(field["scale"])
+        if field["offset"] != 0.0:
+            vals += np.float32(field["offset"])
+        out[..., f] = vals
+    return out
@@ -0,0 +1,148 @@
+import numpy as np
+
+from slp_dataclasses.frame_common import FRAME_OFFSET
+from slp_index import EventIndex, is_raw_replay, leader_columns
+
+# Same features in the same order as PreFrameUpdate.to_numpy + PostFrameUpdate.to_numpy, i.e.
+# the last axis of SlpBin.to_player_numpy
+PRE_FEATURES = (
+    "action_state_id",
+    "x_position",
+    "y_position",
+    "facing_direction",
+    "joystick_x",
+    "joystick_y",
+    "cstick_x",
+    "cstick_y",
+    "trigger",
+    "percent",
+)
+POST_FEATURES = ("action_state_frame_counter", "hitlag_frames_remaining")
+N_FEATURES = len(PRE_FEATURES) + len(POST_FEATURES)
+N_PORTS = 4
+PRE_FRAME_CMD_BYTE = 0x37
+POST_FRAME_CMD_BYTE = 0x38
+
+
+def n_frames(slp_bin):
+    return max(len(slp_bin.pre_frames), len(slp_bin.post_frames))
+
+
+# The final (rows, ports, values) of every leader's cmd_byte events, see leader_columns
+def _raw_player_columns(index, cmd_byte, template, names):
+    cols = leader_columns(index, cmd_byte, template.layout(index.version), names)
+    rows = cols["frame_number"].astype(np.int64) + FRAME_OFFSET
+    ports = cols["player_index"].astype(np.int64)
+    return rows, ports, {name: cols[name] for name in names}
+
+
+# (n_frames, [(first feature, rows, ports, {name: values})]) of one replay (a parsed SlpBin or
+# raw .slp bytes or their EventIndex), the rows and ports every value goes to
+def replay_columns(replay, config_dir="configs"):
+    if is_raw_replay(replay):
+        # slp_parse imports this module (through slp_quantize), so it can't be imported on top
+        from slp_parse import SlpSchema
+
+        schema = SlpSchema.shared(config_dir)
+        index = replay if isinstance(replay, EventIndex) else EventIndex(replay)
+        parts = list()
+        for cmd_byte, template, names, first in (
+            (PRE_FRAME_CMD_BYTE, schema.pre_frame_update_template, PRE_FEATURES, 0),
+            (
+                POST_FRAME_CMD_BYTE,
+                schema.post_frame_update_template,
+                POST_FEATURES,
+                len(PRE_FEATURES),
+            ),
+        ):
+            parts.append((first,) + _raw_player_columns(index, cmd_byte, template, names))
+        length = max((int(rows.max()) + 1 for _, rows, _, _ in parts if len(rows)), default=0)
+        return length, parts
+
+    parts = list()
+    for frames, names, first in (
+        (replay.pre_frames, PRE_FEATURES, 0),
+        (replay.post_frames, POST_FEATURES, len(PRE_FEATURES)),
+    ):
+        for port, cols in frames.to_columns(("frame_number",) + names).items():
+            rows = cols["frame_number"].astype(np.int64) + FRAME_OFFSET
+            ports = np.full(len(rows), port, dtype=np.int64)
+            parts.append((first, rows, ports, {name: cols[name] for name in names}))
+    return n_frames(replay), parts
+
+
+def _fill(parts, out):
+    present = np.zeros(N_PORTS, dtype=bool)
+    for first, rows, ports, values in parts:
+        keep = rows < len(out)
+        for k, (name, col) in enumerate(values.items()):
+            out[rows[keep], ports[keep], first + k] = col[keep]
+        present[ports] = True
+    return present
+
+
+# Writes one replay's players into out[:, port, :], a (frames, 4, features) view. Filled a
+# column at a time, nothing is allocated per frame - raw replays are decoded straight from
+# their payloads, parsed ones from their per-port columns. Rows past the end of out are
+# dropped. Returns the (4,) mask of ports that had any frames.
+def fill_replay(replay, out, config_dir="configs"):
+    return _fill(replay_columns(replay, config_dir)[1], out)
+
+
+# (lengths, max_frames) of a list of replays
+def batch_lengths(replays, config_dir="configs"):
+    return _lengths([replay_columns(r, config_dir)[0] for r in replays])
+
+
+def _lengths(lengths):
+    lengths = np.array(lengths, dtype=np.int64)
+    return lengths, int(lengths.max()) if len(lengths) else 0
+
+
+# Stacks replays (parsed SlpBins or raw .slp bytes) into a padded (replays, frames, 4,
+# features) tensor. out can be a preallocated float32 buffer of any frame capacity, longer
+# replays get truncated to it. Returns (out, lengths, player_mask) with lengths clipped to the
+# capacity and player_mask (replays, 4) True for ports that are in the game. Padding and
+# absent ports hold fill.
+def pad_batch(replays, out=None, fill=0.0, config_dir="configs"):
+    columns = [replay_columns(r, config_dir) for r in replays]
+    lengths, max_frames = _lengths([length for length, _ in columns])
+    if out is None:
+        out = np.empty((len(replays), max_frames, N_PORTS, N_FEATURES), dtype=np.float32)
+    elif out.shape[0] < len(replays) or out.shape[2:] != (N_PORTS, N_FEATURES):
+        raise ValueError(
+            f"out has shape {out.shape}, need at least ({len(replays)}, frames, {N_PORTS}, {N_FEATURES})"
+        )
+
+    out[: len(replays)] = fill
+    np.minimum(lengths, out.shape[1], out=lengths)
+    player_mask = np.zeros((len(replays), N_PORTS), dtype=bool)
+    for b, (_, parts) in enumerate(columns):
+        player_mask[b] = _fill(parts, out[b, : lengths[b]])
+    return out, lengths, player_mask
+
+
+# (replays, frames) bool mask of the real frames, from pad_batch's lengths
+def length_mask(lengths, max_frames, out=None):
+    return np.less(np.arange(max_frames), np.asarray(lengths)[:, None], out=out)
+
+
+# Concatenates replays into a flat (total frames, 4, features) buffer without padding.
+# Replay b is out[offsets[b] : offsets[b + 1]]. out can be preallocated with at least
+# sum(lengths) rows. Returns (out, offsets, player_mask).
+def flat_batch(replays, out=None, fill=0.0, config_dir="configs"):
+    columns = [replay_columns(r, config_dir) for r in replays]
+    lengths, _ = _lengths([length for length, _ in columns])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    if out is None:
+        out = np.empty((offsets[-1], N_PORTS, N_FEATURES), dtype=np.float32)
+    elif out.shape[0] < offsets[-1] or out.shape[1:] != (N_PORTS, N_FEATURES):
+        raise ValueError(
+            f"out has shape {out.shape}, need at least ({offsets[-1]}, {N_PORTS}, {N_FEATURES})"
+        )
+
+    out[: offsets[-1]] = fill
+    player_mask = np.zeros((len(replays), N_PORTS), dtype=bool)
+    for b, (_, parts) in enumerate(columns):
+        player_mask[b] = _fill(parts, out[offsets[b] : offsets[b + 1]])
+    return out, offsets, player_mask
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import struct
+
+from slp_async import DEFAULT_CHUNK_SIZE
+from slp_index import EVENT_PAYLOADS_CMD_BYTE, GAME_START_CMD_BYTE, UBJSON_HEADER_LEN
+from slp_pipeline import decode_event
+
+GAME_END_CMD_BYTE = 0x39
+
+
+# Finds complete events in a .slp byte stream as it grows, one pass over every byte no matter
+# how it's split up. Everything after the raw section (the metadata) counts as complete as
+# soon as it arrives. The raw section ends at the raw length from the header, or after the
+# GameEnd event in a live file whose header still says 0.
+class EventScanner:
+    def __init__(self):
+        self.pos = 0
+        self.raw_end = None
+        self.payload_size_dict = None
+        self.game_ended = False
+
+    # (cmd_byte, offset, size) of every event that became complete in buf since the last call,
+    # self.pos is the end of the last one
+    def scan(self, buf):
+        events = list()
+        if self.payload_size_dict is None:
+            if len(buf) < UBJSON_HEADER_LEN + 2:
+                return events
+            raw_len = struct.unpack_from(">L", buf, UBJSON_HEADER_LEN - 4)[0]
+            if buf[UBJSON_HEADER_LEN] != EVENT_PAYLOADS_CMD_BYTE:
+                raise ValueError(
+                    f"Expected EventPayloads command byte {EVENT_PAYLOADS_CMD_BYTE} at offset {UBJSON_HEADER_LEN}"
+                )
+            size = buf[UBJSON_HEADER_LEN + 1]
+            if len(buf) < UBJSON_HEADER_LEN + 1 + size:
+                return events
+            sizes = {EVENT_PAYLOADS_CMD_BYTE: size}
+            for i in range(UBJSON_HEADER_LEN + 2, UBJSON_HEADER_LEN + 1 + size, 3):
+                cmd_byte, payload_size = struct.unpack_from(">BH", buf, i)
+                sizes[cmd_byte] = payload_size
+            self.payload_size_dict = sizes
+            self.raw_end = UBJSON_HEADER_LEN + raw_len if raw_len else None
+            events.append((EVENT_PAYLOADS_CMD_BYTE, UBJSON_HEADER_LEN, size + 1))
+            self.pos = UBJSON_HEADER_LEN + size + 1
+
+        while not self.game_ended and (self.raw_end is None or self.pos < self.raw_end):
+            if self.pos >= len(buf):
+                break
+            cmd_byte = buf[self.pos]
+            if cmd_byte not in self.payload_size_dict:
+                raise NotImplementedError(
+                    f"Command byte {cmd_byte} at offset {self.pos} not defined in EventPayloads"
+                )
+            size = self.payload_size_dict[cmd_byte] + 1
+            if self.pos + size > len(buf):
+                break
+            events.append((cmd_byte, self.pos, size))
+            self.pos += size
+            if cmd_byte == GAME_END_CMD_BYTE and self.raw_end is None:
+                self.game_ended = True
+
+        if self.game_ended or (self.raw_end is not None and self.pos >= self.raw_end):
+            self.pos = len(buf)
+        return events
+
+
+# Relays one live game to any number of local subscribers. Bytes come in from feed() (or
+# tail_file / read_from), each subscriber connected through serve() gets the replay from its
+# first byte on - so late subscribers catch up - and is only sent complete events. Every
+# subscriber has its own cursor and is only ever as far behind as its socket lets it be: a slow
+# reader stalls nobody else. Events are decoded once for in-process consumers registered on a
+# slp_pipeline.Pipeline.
+#
+#   relay = LiveRelay(pipeline=pipeline)
+#   server = await relay.serve("127.0.0.1", 0)
+#   await relay.tail_file("Game_20240101T000000.slp")
+class LiveRelay:
+    def __init__(self, pipeline=None, codegen=False, max_lag=None):
+        self.buf = bytearray()
+        # Subscribers get everything before published, which always falls on an event boundary
+        self.published = 0
+        self.finished = False
+        self.scanner = EventScanner()
+        self.pipeline = pipeline
+        self.session = pipeline.schema.session(codegen=codegen) if pipeline else None
+        # A subscriber more than max_lag bytes behind gets disconnected, None never does
+        self.max_lag = max_lag
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _dispatch(self, events):
+        view = memoryview(self.buf)
+        try:
+            for cmd_byte, offset, size in events:
+                if cmd_byte not in self.pipeline.callbacks and cmd_byte != GAME_START_CMD_BYTE:
+                    continue
+                obj = decode_event(self.session, cmd_byte, view[offset + 1 : offset + size])
+                if cmd_byte == GAME_START_CMD_BYTE:
+                    v = obj.version
+                    self.session.version = f"{v.major.val}.{v.minor.val}.{v.build.val}"
+                self.pipeline.dispatch(cmd_byte, obj)
+        finally:
+            # bytearrays can't grow while a view of them exists
+            view.release()
+
+    async def feed(self, data):
+        if self.finished:
+            raise RuntimeError("Can't feed a finished LiveRelay")
+        self.buf += data
+        events = self.scanner.scan(self.buf)
+        if self.pipeline is not None:
+            self._dispatch(events)
+        if self.scanner.pos != self.published:
+            self.published = self.scanner.pos
+            await self._notify()
+
+    # No more bytes are coming. Whatever is left (e.g. a truncated last event) gets published
+    # as it is, subscribers are disconnected once they've had everything.
+    async def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.published = len(self.buf)
+        if self.pipeline is not None:
+            self.pipeline.finish()
+        await self._notify()
+
+    # Follows a .slp file that's still being written. Stops once the game has ended and the file
+    # hasn't grown for settle seconds (the metadata is written after GameEnd), right away once
+    # the header has its final raw length, or after idle_timeout seconds without new bytes.
+    async def tail_file(self, path, poll_interval=0.05, settle=0.5, idle_timeout=None):
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open, os.fspath(path), "rb")
+        try:
+            idle = 0.0
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, DEFAULT_CHUNK_SIZE)
+                if chunk:
+                    idle = 0.0
+                    await self.feed(chunk)
+                    continue
+                if self.scanner.raw_end is not None and len(self.buf) > self.scanner.raw_end:
+                    break
+                if self.scanner.game_ended:
+                    if idle >= settle:
+                        break
+                elif idle_timeout is not None and idle >= idle_timeout:
+                    break
+                await asyncio.sleep(poll_interval)
+                idle += poll_interval
+        finally:
+            f.close()
+        await self.finish()
+
+    # Relays everything from a stream (e.g. asyncio.open_connection to a local uploader)
+    async def read_from(self, reader, chunk_size=DEFAULT_CHUNK_SIZE):
+        while chunk := await reader.read(chunk_size):
+            await self.feed(chunk)
+        await self.finish()
+
+    async def _serve_subscriber(self, reader, writer, chunk_size):
+        self.subscribers += 1
+        cursor = 0
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(
+                        lambda: self.published > cursor or self.finished
+                    )
+                if cursor >= self.published and self.finished:
+                    break
+                if self.max_lag is not None and self.published - cursor > self.max_lag:
+                    break
+                stop = min(self.published, cursor + chunk_size)
+                writer.write(self.buf[cursor:stop])
+                cursor = stop
+                # Only this subscriber waits for its socket to drain
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host="127.0.0.1", port=0, chunk_size=DEFAULT_CHUNK_SIZE):
+        return await asyncio.start_server(
+            lambda reader, writer: self._serve_subscriber(reader, writer, chunk_size),
+            host,
+            port,
+        )
@@ -0,0 +1,198 @@
+import io
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from slp_batch import BatchResult, apply_all, batch_read, iter_replay_sources, read_replay_source
+from slp_parse import SlpSchema
+
+
+@dataclass
+class GameHeader:
+    name: str
+    match_id: str
+    game_number: int
+    tiebreaker_number: int
+    stage: int
+    # port -> external character id, only for ports that are in the game
+    characters: Dict[int, int] = field(default_factory=dict)
+
+
+@dataclass
+class ReplaySet:
+    # Empty for replays without a match_id (local/unranked games), those are sets of one
+    match_id: str
+    games: List[GameHeader] = field(default_factory=list)
+
+
+@dataclass
+class SetResult:
+    replay_set: ReplaySet
+    # Every game's to_player_numpy rows back to back, game i is frames[game_offsets[i] : game_offsets[i + 1]]
+    frames: np.ndarray
+    game_offsets: np.ndarray
+    summary: dict
+
+
+# Runs on the header_only SlpBin inside the batch workers
+def game_header(slp_bin):
+    gs = slp_bin.game_start
+    return {
+        "match_id": gs.match_id.val.rstrip("\0"),
+        "game_number": gs.game_number.val,
+        "tiebreaker_number": gs.tiebreaker_number.val,
+        "stage": gs.game_info_block.stage.val,
+        "characters": {
+            p_index: player.external_character_id.val
+            for p_index, player in enumerate(gs.game_info_block.player_data[:4])
+            if player.player_type.val != 3
+        },
+    }
+
+
+def _set_order(game):
+    return game.game_number, game.tiebreaker_number, game.name
+
+
+# Groups every replay under paths into sets by match_id with one header-only pass.
+# Games in a set are ordered by (game_number, tiebreaker_number), sets by their first game's
+# name. Returns (sets, errors) where errors are the BatchResults of unreadable replays.
+def group_sets(paths, config_dir="configs", workers=None):
+    by_match = defaultdict(list)
+    singles = list()
+    errors = list()
+    for result in batch_read(
+        paths, config_dir, header_only=True, fn=game_header, workers=workers
+    ):
+        if result.error is not None:
+            errors.append(result)
+            continue
+        game = GameHeader(result.name, **result.result)
+        if game.match_id:
+            by_match[game.match_id].append(game)
+        else:
+            singles.append(ReplaySet("", [game]))
+
+    sets = [ReplaySet(m, sorted(games, key=_set_order)) for m, games in by_match.items()]
+    sets.extend(singles)
+    sets.sort(key=lambda s: s.games[0].name)
+    return sets, errors
+
+
+def _game_summary(slp_bin, game):
+    cols = slp_bin.post_frames.to_columns(("stocks_remaining", "percent"))
+    final = {
+        port: (int(c["stocks_remaining"][-1]), float(c["percent"][-1]))
+        for port, c in cols.items()
+        if len(c["stocks_remaining"])
+    }
+    # Most stocks left, then lowest percent
+    winner = (
+        min(final, key=lambda port: (-final[port][0], final[port][1])) if final else None
+    )
+    return {
+        "name": game.name,
+        "game_number": game.game_number,
+        "tiebreaker_number": game.tiebreaker_number,
+        "stage": game.stage,
+        "characters": game.characters,
+        "final_stocks": {port: s for port, (s, _) in final.items()},
+        "winner": winner,
+    }
+
+
+# Decodes every game of a set in one worker and stacks them into set-level arrays. bufs are
+# the games' replay bytes if they've been read already, otherwise every game is read by name.
+def decode_set(replay_set, config_dir="configs", bufs=None):
+    if bufs is None:
+        bufs = [read_replay_source(game.name) for game in replay_set.games]
+    frames = list()
+    games = list()
+    for game, buf in zip(replay_set.games, bufs):
+        slp_bin = SlpSchema.shared(config_dir).session()
+        slp_bin.read(io.BytesIO(buf))
+        frames.append(slp_bin.to_player_numpy())
+        games.append(_game_summary(slp_bin, game))
+
+    wins = defaultdict(int)
+    for g in games:
+        if g["winner"] is not None:
+            wins[g["winner"]] += 1
+    summary = {
+        "match_id": replay_set.match_id,
+        "n_games": len(games),
+        "games": games,
+        "wins": dict(wins),
+    }
+    lengths = [len(f) for f in frames]
+    return SetResult(
+        replay_set,
+        np.concatenate(frames),
+        np.concatenate([[0], np.cumsum(lengths)]),
+        summary,
+    )
+
+
+def _decode_loaded_set(loaded, config_dir):
+    replay_set, bufs = loaded
+    return decode_set(replay_set, config_dir, bufs)
+
+
+def _set_name(replay_set):
+    return replay_set.match_id or replay_set.games[0].name
+
+
+# (name, (set, its games' bytes)) for every set as soon as the last of its games has been read,
+# from one more pass over paths. Every archive is read once front to back however many sets it
+# holds, only the games of sets that aren't complete yet are kept in memory. Sets that are
+# still missing games once paths are exhausted (e.g. deleted since group_sets) end up in
+# incomplete as (set, names of the missing games).
+def _load_sets(paths, sets, incomplete):
+    set_of = {game.name: i for i, s in enumerate(sets) for game in s.games}
+    pending = defaultdict(dict)
+    loaded = set()
+    for name, buf in iter_replay_sources(paths):
+        if name not in set_of:
+            continue
+        i = set_of[name]
+        pending[i][name] = buf
+        replay_set = sets[i]
+        if len(pending[i]) == len({game.name for game in replay_set.games}):
+            bufs = pending.pop(i)
+            loaded.add(i)
+            yield (
+                _set_name(replay_set),
+                (replay_set, [bufs[game.name] for game in replay_set.games]),
+            )
+    for i, replay_set in enumerate(sets):
+        if i not in loaded:
+            found = pending.get(i, ())
+            missing = [game.name for game in replay_set.games if game.name not in found]
+            incomplete.append((replay_set, missing))
+
+
+# group_sets followed by decode_set for every set on a process pool, yields a BatchResult
+# per set named after its match_id (or its only replay). Header errors are yielded first, sets
+# follow in the order their last game turns up in paths. Sets with games that couldn't be
+# read again come last, as errors naming those games.
+def build_sets(paths, config_dir="configs", workers=None, max_in_flight=None):
+    if not isinstance(paths, (str, os.PathLike)):
+        paths = list(paths)
+    sets, errors = group_sets(paths, config_dir, workers)
+    yield from errors
+    incomplete = list()
+    yield from apply_all(
+        _load_sets(paths, sets, incomplete),
+        _decode_loaded_set,
+        (config_dir,),
+        workers=workers,
+        max_in_flight=max_in_flight,
+    )
+    for replay_set, missing in incomplete:
+        yield BatchResult(
+            _set_name(replay_set),
+            error=FileNotFoundError(f"Games of the set not found: {', '.join(missing)}"),
+        )
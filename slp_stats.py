@@ -0,0 +1,225 @@
+import numpy as np
+
+from slp_index import EventIndex, is_raw_replay, leader_columns
+from slp_parse import SlpSchema
+
+PRE_FRAME_CMD_BYTE = 0x37
+POST_FRAME_CMD_BYTE = 0x38
+
+FRAMES_PER_MINUTE = 3600
+
+# Same thresholds slippi-js uses: a punish ends once the victim goes this long without being hit,
+# and stick positions only count as an input once they leave the deadzone
+PUNISH_RESET_FRAMES = 45
+STICK_DEADZONE = 0.2875
+
+L_CANCEL_SUCCESS = 1
+L_CANCEL_FAILURE = 2
+
+POST_STAT_COLUMNS = (
+    "frame_number",
+    "action_state_id",
+    "percent",
+    "stocks_remaining",
+    "l_cancel_status",
+    "last_hit_by",
+    "current_combo_count",
+)
+PRE_STAT_COLUMNS = (
+    "frame_number",
+    "physical_buttons",
+    "joystick_x",
+    "joystick_y",
+    "cstick_x",
+    "cstick_y",
+)
+
+
+# Run-length encoding: (starts, ends, values) with values[i] == a[starts[i]:ends[i]]
+def runs(a):
+    a = np.asarray(a)
+    if not len(a):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, a[:0]
+    change = np.flatnonzero(a[1:] != a[:-1]) + 1
+    starts = np.concatenate([[0], change])
+    ends = np.concatenate([change, [len(a)]])
+    return starts, ends, a[starts]
+
+
+def popcount(a):
+    a = np.ascontiguousarray(a, dtype=np.uint32)
+    return np.unpackbits(a.view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1, dtype=np.int64)
+
+
+def l_cancel_stats(l_cancel_status):
+    successes = int(np.count_nonzero(l_cancel_status == L_CANCEL_SUCCESS))
+    attempts = successes + int(np.count_nonzero(l_cancel_status == L_CANCEL_FAILURE))
+    return {
+        "successes": successes,
+        "attempts": attempts,
+        "rate": successes / attempts if attempts else float("nan"),
+    }
+
+
+# Indices of the frames where a stock was lost
+def stock_loss_indices(stocks_remaining):
+    return np.flatnonzero(np.diff(stocks_remaining.astype(np.int16)) < 0) + 1
+
+
+def stick_regions(x, y, deadzone=STICK_DEADZONE):
+    # 0 is neutral, 1-8 are the eight directions around it
+    sx = np.sign(x) * (np.abs(x) >= deadzone)
+    sy = np.sign(y) * (np.abs(y) >= deadzone)
+    return ((sx + 1) * 3 + (sy + 1)).astype(np.int8)
+
+
+# Newly pressed buttons plus every move of either stick into a different region
+def input_counts(buttons, joystick_x, joystick_y, cstick_x, cstick_y):
+    buttons = buttons.astype(np.uint32)
+    counts = np.zeros(len(buttons), dtype=np.int64)
+    if len(buttons) < 2:
+        return counts
+    counts[1:] += popcount(buttons[1:] & ~buttons[:-1])
+    for region in (stick_regions(joystick_x, joystick_y), stick_regions(cstick_x, cstick_y)):
+        moved = region[1:] != region[:-1]
+        counts[1:] += moved & (region[1:] != 4)
+    return counts
+
+
+def inputs_per_minute(counts):
+    return counts.sum() / (len(counts) / FRAMES_PER_MINUTE) if len(counts) else 0.0
+
+
+# Groups the hits a victim takes into punishes. A hit is any frame where percent goes up;
+# a punish ends after reset_frames without a hit or when the victim loses a stock.
+def punishes(
+    frame_number, percent, stocks_remaining, last_hit_by, reset_frames=PUNISH_RESET_FRAMES
+):
+    hits = np.flatnonzero(np.diff(percent) > 0) + 1
+    if not len(hits):
+        return {
+            "start_frame": frame_number[:0],
+            "end_frame": frame_number[:0],
+            "start_percent": percent[:0],
+            "end_percent": percent[:0],
+            "n_hits": np.zeros(0, dtype=np.int64),
+            "attacker": last_hit_by[:0],
+            "did_kill": np.zeros(0, dtype=bool),
+        }
+    deaths = stock_loss_indices(stocks_remaining)
+
+    hit_frames = frame_number[hits]
+    deaths_before = np.searchsorted(deaths, hits)
+    new_punish = np.ones(len(hits), dtype=bool)
+    new_punish[1:] = (np.diff(hit_frames) > reset_frames) | (np.diff(deaths_before) > 0)
+    first = np.flatnonzero(new_punish)
+    last = np.concatenate([first[1:], [len(hits)]]).astype(np.int64) - 1
+
+    # Killed if the next stock loss comes within reset_frames of the last hit
+    next_death = np.searchsorted(deaths, hits[last], side="right")
+    has_death = next_death < len(deaths)
+    did_kill = np.zeros(len(first), dtype=bool)
+    did_kill[has_death] = (
+        frame_number[deaths[next_death[has_death]]] - hit_frames[last[has_death]]
+        <= reset_frames
+    )
+
+    return {
+        "start_frame": hit_frames[first],
+        "end_frame": hit_frames[last],
+        "start_percent": percent[hits[first] - 1],
+        "end_percent": percent[hits[last]],
+        "n_hits": last - first + 1,
+        "attacker": last_hit_by[hits[first]],
+        "did_kill": did_kill,
+    }
+
+
+# Runs where the game's own combo counter is at least min_hits
+def combos(frame_number, current_combo_count, min_hits=2):
+    starts, ends, values = runs(current_combo_count > 0)
+    starts, ends = starts[values], ends[values]
+    if not len(starts):
+        return {"start_frame": starts, "end_frame": ends, "n_hits": starts}
+    n_hits = np.maximum.reduceat(current_combo_count, starts)
+    keep = n_hits >= min_hits
+    return {
+        "start_frame": frame_number[starts[keep]],
+        "end_frame": frame_number[ends[keep] - 1],
+        "n_hits": n_hits[keep],
+    }
+
+
+# port -> {name: column} of every leader's fields in frame order
+def _raw_port_columns(index, cmd_byte, template, names):
+    cols = leader_columns(index, cmd_byte, template.layout(index.version), names)
+    return {
+        int(port): {name: cols[name][cols["player_index"] == port] for name in names}
+        for port in np.unique(cols["player_index"])
+    }
+
+
+# The stat columns of every player. Raw .slp bytes (or their EventIndex) are decoded straight
+# from the pre/post-frame payloads without a full parse, a parsed SlpBin from its frame lists.
+def player_columns(replay, config_dir="configs"):
+    if is_raw_replay(replay):
+        schema = SlpSchema.shared(config_dir)
+        index = replay if isinstance(replay, EventIndex) else EventIndex(replay)
+        post = _raw_port_columns(
+            index, POST_FRAME_CMD_BYTE, schema.post_frame_update_template, POST_STAT_COLUMNS
+        )
+        pre = _raw_port_columns(
+            index, PRE_FRAME_CMD_BYTE, schema.pre_frame_update_template, PRE_STAT_COLUMNS
+        )
+    else:
+        post = replay.post_frames.to_columns(POST_STAT_COLUMNS)
+        pre = replay.pre_frames.to_columns(PRE_STAT_COLUMNS)
+    return {port: {**pre.get(port, {}), **cols} for port, cols in post.items()}
+
+
+def compute_stats(replay, config_dir="configs"):
+    cols = player_columns(replay, config_dir)
+
+    punishes_on = {
+        port: punishes(
+            c["frame_number"], c["percent"], c["stocks_remaining"], c["last_hit_by"]
+        )
+        for port, c in cols.items()
+    }
+
+    stats = dict()
+    for port, c in cols.items():
+        # Punishes this player landed on everybody else
+        landed = [
+            {k: v[p["attacker"] == port] for k, v in p.items()}
+            for victim, p in punishes_on.items()
+            if victim != port
+        ]
+        landed = {
+            k: np.concatenate([p[k] for p in landed]) if landed else np.zeros(0)
+            for k in punishes_on[port]
+        }
+        openings = len(landed["start_frame"])
+        kills = int(landed["did_kill"].sum())
+
+        counts = input_counts(
+            c["physical_buttons"],
+            c["joystick_x"],
+            c["joystick_y"],
+            c["cstick_x"],
+            c["cstick_y"],
+        )
+        losses = stock_loss_indices(c["stocks_remaining"])
+
+        stats[port] = {
+            "l_cancel": l_cancel_stats(c["l_cancel_status"]),
+            "inputs_per_minute": inputs_per_minute(counts),
+            "stock_loss_frames": c["frame_number"][losses],
+            "punishes": landed,
+            "combos": combos(c["frame_number"], c["current_combo_count"]),
+            "openings": openings,
+            "kills": kills,
+            "openings_per_kill": openings / kills if kills else float("nan"),
+        }
+    return stats
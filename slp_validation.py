@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+from typing import Optional
+
+# none: trusted input, no checks at all
+# cheap: bounds and size checks for the whole raw section and every event in it
+# strict: rollbacks, plus schema/version consistency of EventPayloads
+VALIDATION_NONE = "none"
+VALIDATION_CHEAP = "cheap"
+VALIDATION_STRICT = "strict"
+VALIDATION_LEVELS = (VALIDATION_NONE, VALIDATION_CHEAP, VALIDATION_STRICT)
+
+SEVERITY_INFO = "info"
+SEVERITY_WARNING = "warning"
+SEVERITY_ERROR = "error"
+
+
+@dataclass
+class ValidationIssue:
+    kind: str
+    message: str
+    severity: str = SEVERITY_ERROR
+    offset: Optional[int] = None
+    cmd_byte: Optional[int] = None
+    frame_number: Optional[int] = None
+
+
+class SlpValidationError(ValueError):
+    def __init__(self, issues):
+        self.issues = issues
+        super().__init__("; ".join(i.message for i in issues))
+
+    # Rebuilt from the issues when pickled back from a pool worker, not from the message
+    def __reduce__(self):
+        return type(self), (self.issues,)
+
+
+def check_validation_level(level):
+    if level not in VALIDATION_LEVELS:
+        raise ValueError(f"Validation level must be one of {VALIDATION_LEVELS}, got {level!r}")
+    return level
@@ -0,0 +1,160 @@
+import copy
+import io
+import os
+import struct
+import sys
+
+sys.path.append("..")
+
+from slp_parse import SlpBin
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "configs")
+VERSION = "3.14.0"
+
+CMD_BYTES = {
+    "game_start": 0x36,
+    "pre": 0x37,
+    "post": 0x38,
+    "game_end": 0x39,
+    "frame_start": 0x3A,
+    "item": 0x3B,
+    "bookend": 0x3C,
+}
+
+METADATA = b"U\x08metadata{U\x07startAtSU\x142024-01-01T00:00:00Z}}"
+
+
+def _encoded_size(obj):
+    stream = io.BytesIO()
+    obj.write(stream, VERSION)
+    return len(stream.getvalue())
+
+
+def _write_event(stream, obj, cmd_byte):
+    obj.command_byte.val = cmd_byte
+    obj.write(stream, VERSION)
+
+
+# Builds a small, deterministic 3.14.0 replay in memory so tests don't need sample .slp files
+def build_replay(
+    n_frames=30,
+    ports=(0, 1),
+    characters=(2, 20),
+    items=True,
+    rollback_frames=(),
+    followers=(),
+    match_id="",
+    game_number=1,
+    tiebreaker_number=0,
+    connect_codes=None,
+    seed=0,
+):
+    slp_bin = SlpBin(CONFIG_DIR)
+    gs = slp_bin.game_start
+
+    sizes = {
+        CMD_BYTES["game_start"]: _encoded_size(gs) - 1,
+        CMD_BYTES["pre"]: _encoded_size(slp_bin.pre_frame_update_template) - 1,
+        CMD_BYTES["post"]: _encoded_size(slp_bin.post_frame_update_template) - 1,
+        CMD_BYTES["game_end"]: _encoded_size(slp_bin.game_end) - 1,
+        CMD_BYTES["frame_start"]: _encoded_size(slp_bin.frame_start_template) - 1,
+        CMD_BYTES["item"]: _encoded_size(slp_bin.item_update_template) - 1,
+        CMD_BYTES["bookend"]: _encoded_size(slp_bin.frame_bookend_template) - 1,
+    }
+
+    raw = io.BytesIO()
+    raw.write(struct.pack(">BB", 0x35, 1 + 3 * len(sizes)))
+    for cmd_byte, size in sizes.items():
+        raw.write(struct.pack(">BH", cmd_byte, size))
+
+    for p, player in enumerate(gs.game_info_block.player_data):
+        player.player_type.val = 0 if p in ports else 3
+        if p in ports:
+            player.external_character_id.val = characters[ports.index(p)]
+    gs.match_id.val = match_id
+    gs.game_number.val = game_number
+    gs.tiebreaker_number.val = tiebreaker_number
+    gs.random_seed.val = seed
+    if connect_codes:
+        for cc, code in zip(gs.connect_code, connect_codes):
+            cc.connect_code_str.val, cc.connect_code_num.val = code.split("#")
+    _write_event(raw, gs, CMD_BYTES["game_start"])
+
+    def write_frame(frame):
+        fs = copy.deepcopy(slp_bin.frame_start_template)
+        fs.frame_number.val = frame
+        fs.random_seed.val = (seed * 7919 + frame) & 0xFFFFFFFF
+        _write_event(raw, fs, CMD_BYTES["frame_start"])
+
+        # Each follower right after its leader, like the game sends them
+        keys = sorted([(p, 0) for p in ports] + [(p, 1) for p in followers])
+        for port, follower in keys:
+            pre = copy.deepcopy(slp_bin.pre_frame_update_template)
+            pre.frame_number.val = frame
+            pre.player_index.val = port
+            pre.is_follower.val = follower
+            pre.action_state_id.val = 14 + (frame // 10) % 3
+            pre.x_position.val = float(frame + port + seed)
+            pre.y_position.val = float(port * 10 + follower)
+            pre.joystick_x.val = 0.5 if (frame // 5) % 2 else 0.0
+            pre.trigger.val = 0.0
+            pre.percent.val = float(max(frame, 0) % 50)
+            pre.processed_buttons.val[-1] = (frame // 4) % 2 == 1
+            pre.physical_buttons.val[-1] = (frame // 4) % 2 == 1
+            _write_event(raw, pre, CMD_BYTES["pre"])
+
+        if items and frame >= 0:
+            for spawn_id in range(frame // 10 + 1):
+                if frame - spawn_id * 10 >= 15:
+                    continue
+                iu = copy.deepcopy(slp_bin.item_update_template)
+                iu.frame_number.val = frame
+                iu.type_id.val = 99
+                iu.spawn_id.val = spawn_id
+                iu.owner.val = ports[spawn_id % len(ports)]
+                iu.x_position.val = float(frame - spawn_id * 10)
+                iu.y_position.val = float(spawn_id)
+                _write_event(raw, iu, CMD_BYTES["item"])
+
+        for port, follower in keys:
+            post = copy.deepcopy(slp_bin.post_frame_update_template)
+            post.frame_number.val = frame
+            post.player_index.val = port
+            post.is_follower.val = follower
+            post.internal_character_id.val = characters[ports.index(port)]
+            post.action_state_id.val = 14 + (frame // 10) % 3
+            post.x_position.val = float(frame + port + seed)
+            post.y_position.val = float(port * 10 + follower)
+            post.percent.val = float(max(frame, 0) % 50)
+            post.stocks_remaining.val = 4 - max(frame, 0) // 50
+            post.last_hit_by.val = 1 - port if len(ports) > 1 else 6
+            post.l_cancel_status.val = 1 if frame % 20 == 0 else (2 if frame % 20 == 10 else 0)
+            _write_event(raw, post, CMD_BYTES["post"])
+
+        fb = copy.deepcopy(slp_bin.frame_bookend_template)
+        fb.frame_number.val = frame
+        fb.last_finalized_frame.val = frame
+        _write_event(raw, fb, CMD_BYTES["bookend"])
+
+    for frame in range(-123, -123 + n_frames):
+        write_frame(frame)
+        if frame in rollback_frames:
+            write_frame(frame - 1)
+            write_frame(frame)
+
+    ge = slp_bin.game_end
+    ge.game_end_method.val = 2
+    for i, placement in enumerate(ge.player_placements):
+        placement.val = ports.index(i) if i in ports else -1
+    _write_event(raw, ge, CMD_BYTES["game_end"])
+
+    body = raw.getvalue()
+    header = b"{U" + struct.pack(">B", 3) + b"raw[$U#l" + struct.pack(">I", len(body))
+    return header + body + METADATA
+
+
+# Parses a replay buffer with the generic parser, kwargs go to SlpBin
+def read_bin(buf, **kwargs):
+    slp_bin = SlpBin(CONFIG_DIR, **kwargs)
+    slp_bin.read(io.BytesIO(buf))
+    return slp_bin
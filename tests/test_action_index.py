@@ -0,0 +1,95 @@
+import sys
+
+import numpy as np
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_action_index import (
+    ActionIndex,
+    action_runs,
+    build_action_index,
+    decode_postings,
+    encode_postings,
+)
+
+
+def state_at(frame):
+    # What replay_builder puts in action_state_id
+    return 14 + (frame // 10) % 3
+
+
+def test_postings_round_trip():
+    rng = np.random.default_rng(0)
+    replay = rng.integers(0, 50, 500)
+    port = rng.integers(0, 4, 500)
+    start = rng.integers(-123, 10000, 500)
+    stop = start + rng.integers(1, 100, 500)
+    encoded = encode_postings(replay, port, start, stop)
+    decoded = decode_postings(encoded)
+
+    order = np.lexsort((start, port, replay))
+    for name, a in (("replay", replay), ("port", port), ("start", start), ("stop", stop)):
+        assert np.array_equal(decoded[name], a[order])
+    assert sum(a.nbytes for a in encoded) < 4 * 500 * 4
+
+
+def test_runs_resolve_rollbacks():
+    runs = action_runs(build_replay(n_frames=45, rollback_frames=(-100,)), CONFIG_DIR)
+    port0 = runs["port"] == 0
+    assert runs["start"][port0][0] == -123
+    assert list(runs["start"][port0][1:]) == [-120, -110, -100, -90, -80]
+    assert runs["stop"][port0][-1] == -123 + 45
+    assert set(runs["char"][port0]) == {2}
+
+
+def test_queries(tmp_path):
+    for i, n in enumerate((40, 75, 130)):
+        (tmp_path / f"game_{i}.slp").write_bytes(
+            build_replay(n_frames=n, characters=(2, 20 if i < 2 else 9))
+        )
+    index, errors = build_action_index(tmp_path, CONFIG_DIR, workers=0)
+    assert not errors and len(index.replays) == 3
+
+    # Brute force: 10-frame blocks where port 0 goes 14 -> 15
+    expected = list()
+    for replay, n in enumerate((40, 75, 130)):
+        frames = np.arange(-123, -123 + n)
+        states = state_at(frames)
+        for f in range(len(frames) - 1):
+            if states[f] == 14 and states[f + 1] == 15:
+                run_start = f
+                while run_start > 0 and states[run_start - 1] == 14:
+                    run_start -= 1
+                expected.append((replay, int(frames[run_start])))
+
+    match = index.find_sequence(2, [14, 15])
+    assert sorted(zip(match["replay"].tolist(), match["start"].tolist())) == expected
+    assert np.all(match["stop"] - match["start"] <= 20)
+
+    # Falco (20) only shows up in the first two replays
+    assert list(index.replays_with_all(20, [14, 15, 16])) == [0, 1]
+    assert len(index.find_any(9, [14, 16])["start"]) > 0
+    assert len(index.find_sequence(2, [14, 16])["start"]) == 0
+    assert len(index.find_sequence(2, [14, (15, 16)])["start"]) == len(expected)
+
+    index.save(tmp_path / "actions.npz")
+    loaded = ActionIndex.load(tmp_path / "actions.npz")
+    assert loaded.replays == index.replays
+    again = loaded.find_sequence(2, [14, 15])
+    assert all(np.array_equal(again[k], match[k]) for k in match)
+
+
+def test_empty_corpus(tmp_path):
+    (tmp_path / "empty").mkdir()
+    index, errors = build_action_index(tmp_path / "empty", CONFIG_DIR, workers=0)
+    assert index.postings == {} and errors == []
+    assert len(index.find_sequence(2, [14, 15])["replay"]) == 0
+
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / "bad.slp").write_bytes(b"not a replay")
+    index, errors = build_action_index(tmp_path / "broken", CONFIG_DIR, workers=0)
+    assert index.postings == {} and len(errors) == 1
+    index.save(tmp_path / "index.npz")
+    assert ActionIndex.load(tmp_path / "index.npz").postings == {}
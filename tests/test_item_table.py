@@ -0,0 +1,35 @@
+import sys
+
+sys.path.append("..")
+
+import numpy as np
+from replay_builder import build_replay, read_bin
+
+
+def test_item_table_matches_item_list():
+    slp_bin = read_bin(build_replay(n_frames=160, rollback_frames=(10, 25)))
+    table = slp_bin.item_updates.table()
+
+    expected = sorted(
+        (i.spawn_id.val, i.frame_number.val) for items in slp_bin.item_updates for i in items
+    )
+    assert list(zip(table["spawn_id"], table["frame_number"])) == expected
+
+    # Spawned every 10 frames from frame 0, each one lives for 15 frames
+    lifetimes = table.lifetimes()
+    assert list(lifetimes["spawn_id"]) == [0, 1, 2, 3]
+    assert list(lifetimes["first_frame"]) == [0, 10, 20, 30]
+    assert list(lifetimes["last_frame"]) == [14, 24, 34, 36]
+    assert list(lifetimes["owner"]) == [0, 1, 0, 1]
+    assert list(table.spawn_ids_of_owner(1)) == [1, 3]
+
+    frames, x, y = table.trajectory(2)
+    assert list(frames) == list(range(20, 35))
+    assert np.allclose(x, np.arange(15))
+    assert np.allclose(table.path_lengths(), [14, 14, 14, 6])
+
+
+def test_item_table_empty():
+    table = read_bin(build_replay(n_frames=10)).item_updates.table()
+    assert len(table) == 0
+    assert len(table.path_lengths()) == 0
@@ -0,0 +1,89 @@
+import io
+import pickle
+import sys
+
+sys.path.append("..")
+
+from replay_builder import build_replay, read_bin
+
+
+def test_fields_decoded_on_first_access():
+    gs = read_bin(build_replay(match_id="mode.ranked-2024", game_number=3)).game_start
+    assert not gs.is_decoded("match_id")
+    assert not gs.is_decoded("game_info_block")
+
+    assert gs.match_id.val.rstrip("\0") == "mode.ranked-2024"
+    assert gs.game_number.val == 3
+    assert gs.is_decoded("match_id")
+    assert not gs.is_decoded("game_info_block")
+
+    # Cached, not decoded again
+    assert gs.match_id is gs.match_id
+
+
+def test_untouched_fields_written_from_raw():
+    buf = build_replay(match_id="mode.ranked-2024")
+    slp_bin = read_bin(buf)
+    gs = slp_bin.game_start
+    gs.game_number.val = 7
+
+    out = io.BytesIO()
+    slp_bin.write(out)
+    assert not gs.is_decoded("game_info_block")
+    assert read_bin(out.getvalue()).game_start.game_number.val == 7
+    assert read_bin(out.getvalue()).game_start.match_id.val.rstrip("\0") == "mode.ranked-2024"
+
+
+def test_pad_fields_kept_as_bytes():
+    gs = read_bin(build_replay()).game_start
+    pad = gs.game_info_block.player_data[0].gib_pad_x64
+    assert isinstance(pad.val, bytes)
+    assert len(pad.val) == pad.size()
+
+
+def test_pickle_keeps_pending_fields():
+    slp_bin = read_bin(build_replay(game_number=5))
+    gs = pickle.loads(pickle.dumps(slp_bin.game_start))
+    assert not gs.is_decoded("game_number")
+    assert gs.game_number.val == 5
+
+
+def test_nested_fields_decoded_on_first_access():
+    gs = read_bin(build_replay(characters=(2, 20))).game_start
+    gib = gs.game_info_block
+    assert not gib.is_decoded("stage") and not gib.is_decoded("player_data")
+
+    # The builder leaves the stage unset
+    assert gib.stage.val == 0
+    assert gib.is_decoded("stage")
+    assert not gib.is_decoded("game_timer") and not gib.is_decoded("player_data")
+
+    players = gib.player_data
+    assert players[1].external_character_id.val == 20
+    assert players[1].is_decoded("external_character_id")
+    assert not players[1].is_decoded("player_type")
+    assert not any(p.is_decoded("external_character_id") for p in players[2:])
+    assert players[0].external_character_id.val == 2
+
+
+def test_nested_fields_written_from_raw():
+    buf = build_replay(characters=(2, 20))
+    slp_bin = read_bin(buf)
+    players = slp_bin.game_start.game_info_block.player_data
+    players[0].costume_index.val = 3
+
+    out = io.BytesIO()
+    slp_bin.write(out)
+    assert not players[1].is_decoded("costume_index")
+    back = read_bin(out.getvalue()).game_start.game_info_block.player_data
+    assert back[0].costume_index.val == 3
+    assert back[1].external_character_id.val == 20
+
+
+def test_spans_keyed_on_layout():
+    slp_bin = read_bin(build_replay())
+    gs = slp_bin.game_start
+    spans = gs._spans(slp_bin.version, ["command_byte"])
+    # One nametag less is a different layout, its spans can't be reused
+    gs.nametags.pop()
+    assert gs._spans(slp_bin.version, ["command_byte"]) != spans
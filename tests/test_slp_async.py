@@ -0,0 +1,66 @@
+import asyncio
+import sys
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_async import AsyncIngest, read_file, read_tcp, serve_slp_bytes
+
+
+def game_number(slp_bin):
+    return slp_bin.game_start.game_number.val
+
+
+def test_read_tcp_stand_in():
+    buf = build_replay(n_frames=5)
+
+    async def run():
+        server = await serve_slp_bytes(buf, chunk_size=1000)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await asyncio.gather(*[read_tcp("127.0.0.1", port) for _ in range(3)])
+
+    assert asyncio.run(run()) == [buf] * 3
+
+
+def test_async_ingest(tmp_path):
+    path = tmp_path / "game.slp"
+    path.write_bytes(build_replay(n_frames=10, game_number=7))
+    bufs = [build_replay(n_frames=200, game_number=i) for i in range(4)]
+
+    async def ticker(ticks):
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.001)
+
+    async def run():
+        ticks = list()
+        tick_task = asyncio.create_task(ticker(ticks))
+        async with AsyncIngest(CONFIG_DIR, workers=2, max_pending=2, fn=game_number) as ingest:
+
+            async def produce():
+                await ingest.submit_file(path)
+                for i, buf in enumerate(bufs):
+                    await ingest.submit(f"upload_{i}", buf)
+                ingest.close()
+
+            producer = asyncio.create_task(produce())
+            results = [r async for r in ingest]
+            await producer
+            single = await ingest.parse("single", bufs[0])
+        tick_task.cancel()
+        return results, single, ticks
+
+    results, single, ticks = asyncio.run(run())
+    assert all(r.error is None for r in results)
+    assert sorted(r.result for r in results) == [0, 1, 2, 3, 7]
+    assert single.result == 0
+    # The event loop kept running while replays were being decoded
+    assert len(ticks) > 5
+
+
+def test_read_file(tmp_path):
+    path = tmp_path / "game.slp"
+    path.write_bytes(build_replay(n_frames=5))
+    assert asyncio.run(read_file(path, chunk_size=100)) == path.read_bytes()
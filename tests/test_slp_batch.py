@@ -0,0 +1,56 @@
+import gzip
+import io
+import sys
+import tarfile
+import zipfile
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_batch import batch_read, iter_replay_sources, list_replay_sources
+
+
+def game_number(slp_bin):
+    return slp_bin.game_start.game_number.val
+
+
+def make_sources(tmp_path):
+    replays = {f"game_{i}.slp": build_replay(n_frames=5, game_number=i + 1) for i in range(4)}
+
+    with zipfile.ZipFile(tmp_path / "bundle.zip", "w") as zf:
+        zf.writestr("game_0.slp", replays["game_0.slp"])
+        zf.writestr("notes.txt", b"not a replay")
+    with tarfile.open(tmp_path / "bundle.tar.gz", "w:gz") as tf:
+        for name in ("game_1.slp", "game_2.slp"):
+            info = tarfile.TarInfo(name)
+            info.size = len(replays[name])
+            tf.addfile(info, io.BytesIO(replays[name]))
+    (tmp_path / "game_3.slp.gz").write_bytes(gzip.compress(replays["game_3.slp"]))
+
+    return replays
+
+
+def test_iter_replay_sources(tmp_path):
+    replays = make_sources(tmp_path)
+    found = {name.split("/")[-1].replace(".gz", ""): buf for name, buf in iter_replay_sources(tmp_path)}
+    assert found == replays
+    # The same names in the same order, without reading any replay
+    assert list(list_replay_sources(tmp_path)) == [n for n, _ in iter_replay_sources(tmp_path)]
+
+
+def test_batch_read_header_only(tmp_path):
+    make_sources(tmp_path)
+    results = list(
+        batch_read(tmp_path, CONFIG_DIR, header_only=True, fn=game_number, workers=2)
+    )
+    assert all(r.error is None for r in results)
+    assert sorted(r.result for r in results) == [1, 2, 3, 4]
+
+
+def test_batch_read_full_in_process(tmp_path):
+    make_sources(tmp_path)
+    (tmp_path / "broken.slp").write_bytes(b"{U\x03raw[$U#l\x00\x00\x00\x05\x00")
+    results = {r.name.split("/")[-1]: r for r in batch_read(tmp_path, CONFIG_DIR, workers=0)}
+    assert results["broken.slp"].error is not None
+    assert len(results["game_1.slp"].result.post_frames) == 5
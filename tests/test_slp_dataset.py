@@ -0,0 +1,38 @@
+import io
+import itertools
+import sys
+
+sys.path.append("..")
+
+import numpy as np
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_dataset import WindowLoader, export_dataset
+from slp_parse import SlpBin
+
+
+def test_export_and_load(tmp_path):
+    src = tmp_path / "replays"
+    src.mkdir()
+    lengths = {"a.slp": 40, "b.slp": 50, "c.slp": 30}
+    expected = dict()
+    for name, n in lengths.items():
+        buf = build_replay(n_frames=n, seed=len(expected))
+        (src / name).write_bytes(buf)
+        slp_bin = SlpBin(CONFIG_DIR)
+        slp_bin.read(io.BytesIO(buf))
+        expected[name] = slp_bin.to_player_numpy()
+
+    out = tmp_path / "dataset"
+    manifest = export_dataset(src, str(out), CONFIG_DIR, rows_per_shard=100, workers=0)
+    assert [s["rows"] for s in manifest["shards"]] == [90, 30]
+    assert manifest["replays"][0]["players"] == [0, 1]
+
+    loader = WindowLoader(str(out), window=16, batch_size=8, seed=0)
+    assert len(loader) == (40 - 15) + (50 - 15) + (30 - 15)
+    for batch, replay_i, starts in itertools.islice(loader, 3):
+        assert batch.shape == (8, 16, 4, 12)
+        for b, r, start in zip(batch, replay_i, starts):
+            name = loader.replays[r]["replay"].split("/")[-1]
+            assert np.array_equal(b, expected[name][start : start + 16])
+    loader.close()
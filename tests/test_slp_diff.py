@@ -0,0 +1,41 @@
+import sys
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_diff import diff_replays, diff_round_trip
+from slp_edit import SlpEditor
+
+
+def test_identical():
+    buf = build_replay()
+    assert not diff_replays(buf, buf, CONFIG_DIR)
+    assert not diff_round_trip(buf, CONFIG_DIR)
+
+
+def test_changed_fields():
+    buf = build_replay()
+    editor = SlpEditor(buf, CONFIG_DIR)
+    targets = [int(i) for i in editor.index.find(0x38)[[3, 10, 11]]]
+    for t in targets:
+        pfu = editor.decode(t)
+        pfu.percent.val = 99.0
+        editor.replace(t, pfu)
+
+    diff = diff_replays(buf, editor.to_bytes(), CONFIG_DIR)
+    assert [e.index for e in diff.events] == targets
+    assert [f.name for f in diff.events[0].fields] == ["percent"]
+    assert diff.events[0].fields[0].b == 99.0
+    assert diff.events[0].frame_number == editor.decode(targets[0]).frame_number.val
+
+    capped = diff_replays(buf, editor.to_bytes(), CONFIG_DIR, stop_early=True)
+    assert len(capped.events) == 1 and capped.truncated
+
+
+def test_rollback_round_trip_differs():
+    # SlpBin.write keeps only the final copy of rolled-back frames, so the event streams diverge
+    diff = diff_round_trip(build_replay(rollback_frames=(-110,)), CONFIG_DIR, max_diffs=5)
+    assert diff.n_events_a > diff.n_events_b
+    assert len(diff.events) == 5
+    assert diff.events[0].frame_number == -111
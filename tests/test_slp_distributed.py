@@ -0,0 +1,121 @@
+import multiprocessing
+import sys
+
+import numpy as np
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_distributed import (
+    claim,
+    complete,
+    connect,
+    init_work,
+    merge,
+    progress,
+    renew,
+    run_node,
+)
+
+
+def make_corpus(tmp_path, n=9):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(n):
+        (src / f"game_{i}.slp").write_bytes(build_replay(n_frames=3 + i % 3, game_number=i))
+    (src / "broken.slp").write_bytes(b"nope")
+    return src
+
+
+def test_nodes_share_work(tmp_path):
+    src = make_corpus(tmp_path)
+    db = str(tmp_path / "work.db")
+    out = str(tmp_path / "out")
+    assert init_work(db, src, unit_size=2) == 5
+    # Running it again doesn't add units
+    assert init_work(db, src, unit_size=2) == 5
+
+    ctx = multiprocessing.get_context("fork")
+    nodes = [
+        ctx.Process(target=run_node, args=(db, out, f"node{i}", CONFIG_DIR)) for i in range(3)
+    ]
+    for p in nodes:
+        p.start()
+    for p in nodes:
+        p.join(60)
+        assert p.exitcode == 0
+
+    conn = connect(db)
+    assert progress(conn) == {"done": 5}
+    conn.close()
+
+    manifest = merge(db, out)
+    names = sorted(r["replay"].rsplit("/", 1)[-1] for r in manifest["replays"])
+    assert names == sorted(f"game_{i}.slp" for i in range(9))
+    assert [e["replay"].rsplit("/", 1)[-1] for e in manifest["errors"]] == ["broken.slp"]
+
+    merged = np.load(f"{out}/merged.npy")
+    assert len(merged) == sum(3 + i % 3 for i in range(9))
+    for r in manifest["replays"]:
+        i = int(r["replay"].rsplit("_", 1)[-1][:-4])
+        assert r["stop"] - r["start"] == 3 + i % 3
+
+
+def test_expired_lease_is_stolen(tmp_path):
+    src = make_corpus(tmp_path, n=2)
+    db = str(tmp_path / "work.db")
+    init_work(db, src, unit_size=10)
+
+    conn = connect(db)
+    unit_id, names = claim(conn, "slow", lease_seconds=-1)
+    # Nothing pending, but the lease has run out, so another node takes it over
+    assert claim(conn, "fast", lease_seconds=300) == (unit_id, names)
+    assert claim(conn, "other") is None
+    assert complete(conn, unit_id, "fast", {"replays": [], "errors": []})
+    assert not complete(conn, unit_id, "slow", {"replays": [], "errors": []})
+    conn.close()
+
+
+def test_unit_fails_after_max_attempts(tmp_path):
+    src = make_corpus(tmp_path, n=2)
+    db = str(tmp_path / "work.db")
+    out = str(tmp_path / "out")
+    init_work(db, src, unit_size=10)
+
+    conn = connect(db)
+    # Every node that claims it dies before finishing
+    for i in range(2):
+        unit_id, names = claim(conn, f"crashed{i}", lease_seconds=-1, max_attempts=2)
+    # A node that lost its lease can't renew it
+    assert not renew(conn, unit_id, "crashed0")
+    assert claim(conn, "next", max_attempts=2) is None
+    assert progress(conn) == {"failed": 1}
+    conn.close()
+
+    assert run_node(db, out, "late", CONFIG_DIR) == 0
+    manifest = merge(db, out)
+    assert manifest["replays"] == []
+    assert sorted(e["replay"] for e in manifest["errors"]) == sorted(names)
+
+
+def test_node_stops_on_stolen_unit(tmp_path):
+    src = make_corpus(tmp_path, n=3)
+    db = str(tmp_path / "work.db")
+    init_work(db, src, unit_size=10)
+    stolen = list()
+
+    def stall(slp_bin):
+        # The node stalls long enough for its lease to run out and the unit to be stolen
+        if not stolen:
+            conn = connect(db)
+            conn.execute("UPDATE units SET lease_expires = 0")
+            stolen.append(claim(conn, "thief"))
+            conn.close()
+        return slp_bin.to_player_numpy()
+
+    assert run_node(db, str(tmp_path / "out"), "slow", CONFIG_DIR, fn=stall) == 0
+    assert not (tmp_path / "out").joinpath("node_slow_unit_000001.npy").exists()
+    conn = connect(db)
+    assert conn.execute("SELECT state, owner FROM units").fetchall() == [("leased", "thief")]
+    conn.close()
@@ -0,0 +1,119 @@
+import sys
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, METADATA, build_replay, read_bin
+
+from slp_edit import SlpEditor
+from slp_index import EventIndex
+
+
+def test_event_index():
+    buf = build_replay(n_frames=10, rollback_frames=(-120,))
+    idx = EventIndex(buf)
+
+    slp_bin = read_bin(buf)
+    # EventPayloads is event 0 and isn't part of original_ordered_payloads
+    assert len(idx) == len(slp_bin.original_ordered_payloads) + 1
+    assert idx.offsets[-1] + idx.sizes[-1] == idx.raw_end
+    assert bytes(idx.metadata) == slp_bin.metadata
+
+    frames = idx.frame_numbers()
+    post = idx.find(0x38)
+    expected = [
+        p.frame_number.val
+        for p in slp_bin.original_ordered_payloads
+        if type(p).__name__ == "PostFrameUpdate"
+    ]
+    assert list(frames[post]) == expected
+
+
+def test_unedited_copy_is_identical():
+    buf = build_replay(rollback_frames=(-110,))
+    editor = SlpEditor(buf, CONFIG_DIR)
+    assert editor.to_bytes() == buf
+    assert len(list(editor.iter_chunks())) == 1
+
+
+def _ubjson_str(s):
+    return b"SU" + bytes([len(s)]) + s.encode()
+
+
+def _key(s):
+    return b"U" + bytes([len(s)]) + s.encode()
+
+
+# Slippi-style metadata: startAt, lastFrame, a names object per port and playedOn
+PLAYER_METADATA = (
+    _key("metadata")
+    + b"{"
+    + _key("startAt")
+    + _ubjson_str("2024-01-01T00:00:00Z")
+    + _key("lastFrame")
+    + b"l\x00\x00\x1c\x20"
+    + _key("players")
+    + b"{"
+    + b"".join(
+        _key(port)
+        + b"{"
+        + _key("characters")
+        + b"{U\x0220l\x00\x00\x1d\xeb}"
+        + _key("names")
+        + b"{"
+        + _key("netplay")
+        + _ubjson_str(name)
+        + _key("code")
+        + _ubjson_str(code)
+        + b"}}"
+        for port, name, code in (("0", "Alice", "ABCD#123"), ("1", "Bob", "XYZ#9"))
+    )
+    + b"}"
+    + _key("playedOn")
+    + _ubjson_str("dolphin")
+    + b"}}"
+)
+
+
+def test_anonymize():
+    buf = build_replay(connect_codes=["ABCD#123", "XYZ#9"])
+    buf = buf[: -len(METADATA)] + PLAYER_METADATA
+    assert read_bin(buf).game_start.connect_code[0].connect_code_str.val.startswith("ABCD")
+
+    editor = SlpEditor(buf, CONFIG_DIR)
+    editor.anonymize()
+    out = editor.to_bytes()
+
+    # Only the GameStart span was re-encoded
+    chunks = list(editor.iter_chunks())
+    assert len(chunks) == 3
+
+    slp_bin = read_bin(out)
+    for cc in slp_bin.game_start.connect_code:
+        assert cc.connect_code_str.val.strip("\x00") == ""
+
+    # Names and codes are blanked, everything else in the metadata is kept byte for byte
+    expected = PLAYER_METADATA
+    for s in ("Alice", "ABCD#123", "Bob", "XYZ#9"):
+        expected = expected.replace(_ubjson_str(s), _ubjson_str(""))
+    assert slp_bin.metadata == expected
+    assert b"2024-01-01T00:00:00Z" in slp_bin.metadata and b"dolphin" in slp_bin.metadata
+
+
+def test_anonymize_drop_metadata():
+    buf = build_replay(n_frames=10)
+    editor = SlpEditor(buf, CONFIG_DIR)
+    editor.anonymize(drop_metadata=True)
+    out = editor.to_bytes()
+    assert read_bin(out).metadata == b"}"
+    assert len(out) == len(buf) - len(METADATA) + 1
+
+
+def test_trim_frames():
+    buf = build_replay(n_frames=40)
+    editor = SlpEditor(buf, CONFIG_DIR)
+    editor.trim_frames(end=-100)
+
+    slp_bin = read_bin(editor.to_bytes())
+    assert len(slp_bin.post_frames) == 23
+    assert len(slp_bin.frame_bookends) == 23
+    assert slp_bin.game_end.game_end_method.val == 2
@@ -0,0 +1,55 @@
+import sys
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_edit import SlpEditor
+from slp_fingerprint import (
+    event_fingerprints,
+    find_duplicates,
+    first_desync,
+    frame_fingerprints,
+    game_fingerprint,
+)
+from slp_index import EventIndex
+
+
+def test_same_game_from_both_players():
+    a = EventIndex(build_replay(connect_codes=["AAA#1", "BBB#2"]))
+    b = EventIndex(build_replay(connect_codes=["BBB#2", "AAA#1"], rollback_frames=(-110,)))
+    other = EventIndex(build_replay(seed=3))
+
+    frames_a, digests_a = frame_fingerprints(a, CONFIG_DIR)
+    frames_b, digests_b = frame_fingerprints(b, CONFIG_DIR)
+    assert list(frames_a) == list(range(-123, -93))
+    assert game_fingerprint(digests_a) == game_fingerprint(digests_b)
+    assert game_fingerprint(digests_a) != game_fingerprint(frame_fingerprints(other, CONFIG_DIR)[1])
+
+    # Different GameStart bytes, so the GameStart event fingerprints differ
+    assert event_fingerprints(a)[1] != event_fingerprints(b)[1]
+
+
+def test_first_desync():
+    buf = build_replay()
+    editor = SlpEditor(buf, CONFIG_DIR)
+    post_events = editor.index.find(0x38)
+    target = int(post_events[20])
+    pfu = editor.decode(target)
+    pfu.x_position.val += 1.0
+    editor.replace(target, pfu)
+
+    fa, da = frame_fingerprints(EventIndex(buf), CONFIG_DIR)
+    fb, db = frame_fingerprints(EventIndex(editor.to_bytes()), CONFIG_DIR)
+    assert first_desync(fa, da, fb, db) == pfu.frame_number.val
+    assert first_desync(fa, da, fa, da) is None
+
+
+def test_find_duplicates(tmp_path):
+    (tmp_path / "p1.slp").write_bytes(build_replay(connect_codes=["AAA#1", "BBB#2"]))
+    (tmp_path / "p2.slp").write_bytes(build_replay(connect_codes=["BBB#2", "AAA#1"]))
+    (tmp_path / "other.slp").write_bytes(build_replay(seed=5))
+
+    dupes = find_duplicates(tmp_path, CONFIG_DIR, workers=0)
+    assert len(dupes) == 1
+    assert sorted(n.split("/")[-1] for n in list(dupes.values())[0]) == ["p1.slp", "p2.slp"]
@@ -0,0 +1,34 @@
+import io
+import sys
+
+sys.path.append("..")
+
+import numpy as np
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_inputs import extract_inputs
+from slp_parse import SlpBin
+
+
+def test_input_timeline_round_trip():
+    buf = build_replay(n_frames=200, rollback_frames=(-50, 10), followers=(1,))
+    slp_bin = SlpBin(CONFIG_DIR)
+    slp_bin.read(io.BytesIO(buf))
+
+    timelines = extract_inputs(buf, CONFIG_DIR)
+    assert set(timelines) == {(0, 0), (1, 0), (1, 1)}
+
+    expected = slp_bin.pre_frames.to_columns(
+        ("frame_number", "processed_buttons", "physical_buttons", "joystick_x", "trigger")
+    )
+    for port in (0, 1):
+        timeline = timelines[(port, 0)]
+        dense = timeline.decode_floats()
+        for name, values in expected[port].items():
+            assert np.array_equal(dense[name], values), name
+
+        # Sticks flip every 5 frames and buttons every 4, so there are fewer runs than frames
+        assert len(timeline.values) < len(timeline) / 2
+        # Dense float32 for the 9 input channels would be 36 bytes per frame
+        assert timeline.nbytes < len(timeline) * 36 / 4
+        assert timeline.change_frames()[0] == -123
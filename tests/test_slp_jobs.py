@@ -0,0 +1,109 @@
+import json
+import sys
+import zipfile
+
+import numpy as np
+import pytest
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_jobs import JOURNAL_NAME, player_frames, run_job
+
+
+class Killed(BaseException):
+    pass
+
+
+calls = list()
+
+
+# Stands in for a worker dying partway through the corpus
+def dies_after_five(slp_bin):
+    calls.append(slp_bin.game_start.game_number.val)
+    if len(calls) == 6:
+        raise Killed()
+    return player_frames(slp_bin)
+
+
+def counting(slp_bin):
+    calls.append(slp_bin.game_start.game_number.val)
+    return player_frames(slp_bin)
+
+
+def make_corpus(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(6):
+        (src / f"game_{i}.slp").write_bytes(build_replay(n_frames=4, game_number=i))
+    with zipfile.ZipFile(src / "more.zip", "w") as zf:
+        zf.writestr("game_6.slp", build_replay(n_frames=4, game_number=6))
+    (src / "broken.slp").write_bytes(b"nope")
+    return src
+
+
+def load_rows(out_dir, record):
+    shard = np.load(out_dir / record["output"]["file"])
+    return shard[record["output"]["start"] : record["output"]["stop"]]
+
+
+def test_restart_skips_finished_work(tmp_path):
+    src = make_corpus(tmp_path)
+    out = tmp_path / "out"
+    calls.clear()
+    with pytest.raises(Killed):
+        run_job(src, out, CONFIG_DIR, fn=dies_after_five, rows_per_shard=8, workers=0)
+
+    # Two replays per shard, the 5th replay committed the 2nd shard before the 6th one died
+    journal = [json.loads(line) for line in open(out / JOURNAL_NAME)]
+    done = [r for r in journal if r["status"] == "done"]
+    assert len(done) == 4
+
+    calls.clear()
+    counts = run_job(src, out, CONFIG_DIR, fn=counting, rows_per_shard=8, workers=0)
+    assert counts == {"processed": 3, "skipped": 4, "failed": 1}
+    assert len(calls) == 3
+
+    journal = [json.loads(line) for line in open(out / JOURNAL_NAME)]
+    failed = [r for r in journal if r["status"] == "failed"]
+    # broken.slp failed once in the killed run and was retried up to max_attempts in this one
+    assert [r["attempts"] for r in failed] == [1, 2, 3]
+
+    records = {r["replay"]: r for r in journal if r["status"] == "done"}
+    assert len(records) == 7
+    for name, record in records.items():
+        assert load_rows(out, record).shape == (4, 4, 12)
+
+    # Nothing left to do, and failures that ran out of attempts stay failed
+    calls.clear()
+    counts = run_job(src, out, CONFIG_DIR, fn=counting, rows_per_shard=8, workers=0)
+    assert counts == {"processed": 0, "skipped": 7, "failed": 1}
+    assert calls == []
+
+
+def test_changed_file_is_redone(tmp_path):
+    src = make_corpus(tmp_path)
+    out = tmp_path / "out"
+    run_job(src, out, CONFIG_DIR, workers=2)
+
+    (src / "game_2.slp").write_bytes(build_replay(n_frames=6, game_number=2))
+    calls.clear()
+    counts = run_job(src, out, CONFIG_DIR, fn=counting, workers=0)
+    assert counts["processed"] == 1
+    assert calls == [2]
+
+
+def test_repaired_file_is_retried(tmp_path):
+    src = make_corpus(tmp_path)
+    out = tmp_path / "out"
+    counts = run_job(src, out, CONFIG_DIR, max_attempts=2, workers=0)
+    assert counts["failed"] == 1
+    # Out of attempts, stays failed until the file changes
+    assert run_job(src, out, CONFIG_DIR, max_attempts=2, workers=0)["failed"] == 1
+
+    (src / "broken.slp").write_bytes(build_replay(n_frames=4, game_number=7))
+    calls.clear()
+    counts = run_job(src, out, CONFIG_DIR, fn=counting, max_attempts=2, workers=0)
+    assert counts == {"processed": 1, "skipped": 7, "failed": 0}
+    assert calls == [7]
@@ -0,0 +1,114 @@
+import sys
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_index import EventIndex, decode_columns, final_frame_mask, latest_per_key
+import slp_parallel
+from slp_parallel import (
+    find_chunk_bounds,
+    frame_aligned_chunks,
+    parallel_decode_columns,
+    parallel_event_index,
+)
+from slp_parse import SlpBin
+
+POST_NAMES = ("frame_number", "player_index", "is_follower", "x_position", "percent")
+
+
+def test_frame_aligned_chunks():
+    frames = np.repeat(np.arange(10), 3)
+    chunks = frame_aligned_chunks(frames, 4)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(frames)
+    for (_, stop), (start, _) in zip(chunks[:-1], chunks[1:]):
+        assert stop == start
+        assert frames[start] != frames[start - 1]
+
+
+def test_final_frame_mask_drops_rolled_back_frames():
+    index = EventIndex(build_replay(n_frames=20, rollback_frames=(-115, -110)))
+    frames = index.frame_numbers()[final_frame_mask(index)]
+    frame_events = frames[frames >= -123]
+    # Each frame shows up once, in order
+    assert list(np.unique(frame_events)) == list(range(-123, -103))
+    assert np.all(np.diff(frame_events) >= 0)
+
+
+def test_parallel_matches_serial():
+    buf = build_replay(n_frames=120, rollback_frames=(-100, -50, 10), items=True)
+    index = EventIndex(buf)
+    slp_bin = SlpBin(CONFIG_DIR)
+    layout = slp_bin.post_frame_update_template.layout(index.version)
+
+    serial = decode_columns(index, index.find(0x38), layout, POST_NAMES)
+    keep = latest_per_key(serial["frame_number"], serial["player_index"], serial["is_follower"])
+
+    # Small enough chunks that even this replay gets split up
+    parallel = parallel_decode_columns(
+        buf, 0x38, POST_NAMES, CONFIG_DIR, workers=2, min_chunk_bytes=4096
+    )
+    in_process = parallel_decode_columns(buf, 0x38, POST_NAMES, CONFIG_DIR, workers=0)
+    prebuilt = parallel_decode_columns(index, 0x38, POST_NAMES, CONFIG_DIR)
+    for name in POST_NAMES:
+        for cols in (parallel, in_process, prebuilt):
+            assert np.array_equal(cols[name], serial[name][keep])
+            assert cols[name].dtype.isnative
+
+
+def test_chunk_bounds_are_frame_starts():
+    buf = build_replay(n_frames=120, rollback_frames=(-100, 10), items=True)
+    index = EventIndex(buf)
+    bounds = find_chunk_bounds(index, 8)
+    assert len(bounds) == 7 and bounds == sorted(bounds)
+    starts = set(index.offsets[index.cmd_bytes == 0x3A].tolist())
+    assert set(bounds) <= starts
+
+
+def test_chunked_event_index():
+    buf = build_replay(n_frames=120, rollback_frames=(-100, 10), items=True)
+    index = EventIndex(buf)
+    chunked = parallel_event_index(buf, workers=2, min_chunk_bytes=4096)
+    assert np.array_equal(chunked.cmd_bytes, index.cmd_bytes)
+    assert np.array_equal(chunked.offsets, index.offsets)
+    assert np.array_equal(chunked.sizes, index.sizes)
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.submitted = list()
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@pytest.mark.parametrize("bad_bound", [0, 1])
+def test_false_anchor_falls_back(monkeypatch, bad_bound):
+    buf = build_replay(n_frames=60)
+    index = EventIndex(buf)
+    real = find_chunk_bounds(index, 3)
+    # One byte past a real event start, as if a payload had looked like a FrameStart. As the
+    # first bound it ends the parent's own chunk, as the second a worker's.
+    bounds = list(real)
+    bounds[bad_bound] = int(index.offsets[np.searchsorted(index.offsets, real[bad_bound]) + 3]) + 1
+    monkeypatch.setattr(slp_parallel, "find_chunk_bounds", lambda index, n_chunks: bounds)
+    executor = RecordingExecutor()
+    chunked = parallel_event_index(buf, workers=1, executor=executor, min_chunk_bytes=1)
+    assert np.array_equal(chunked.offsets, index.offsets)
+    assert np.array_equal(chunked.cmd_bytes, index.cmd_bytes)
+    # A bad first bound is caught before any worker gets a chunk
+    assert len(executor.submitted) == (0 if bad_bound == 0 else len(bounds))
+
+
+def test_parallel_items_after_rollback():
+    buf = build_replay(n_frames=60, rollback_frames=(12,), items=True)
+    cols = parallel_decode_columns(buf, 0x3B, ("frame_number", "spawn_id"), CONFIG_DIR, workers=2)
+    pairs = set(zip(cols["frame_number"].tolist(), cols["spawn_id"].tolist()))
+    assert len(pairs) == len(cols["frame_number"])
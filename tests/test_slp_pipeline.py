@@ -0,0 +1,115 @@
+import io
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_dataclasses import PostFrameUpdate
+from slp_index import EventIndex, decode_columns
+from slp_parse import SlpBin
+from slp_pipeline import Pipeline
+
+
+@pytest.fixture(scope="module")
+def replay():
+    return build_replay(n_frames=60, rollback_frames=(-100,), items=True)
+
+
+class FrameCounter:
+    def __init__(self):
+        self.frames = list()
+        self.finished = False
+
+    def on_pre(self, pfu):
+        self.frames.append((pfu.frame_number.val, pfu.player_index.val))
+
+    def finish(self):
+        self.finished = True
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_callbacks_match_full_parse(replay, codegen):
+    slp_bin = SlpBin(CONFIG_DIR)
+    slp_bin.read(io.BytesIO(replay))
+
+    # Generated codecs stay in memory instead of going to ~/.cache
+    pipeline = Pipeline(CONFIG_DIR, codegen=codegen, codegen_cache_dir=False)
+    counter = pipeline.subscribe(FrameCounter())
+    posts = list()
+    pipeline.on("post", posts.append)
+    starts = list()
+    pipeline.on("game_start", starts.append)
+    ends = list()
+    pipeline.on("game_end", ends.append)
+    counts = pipeline.run(replay)
+
+    parsed_posts = [
+        p for p in slp_bin.original_ordered_payloads if isinstance(p, PostFrameUpdate)
+    ]
+    assert counts["post"] == len(posts) == len(parsed_posts)
+    for got, want in zip(posts, parsed_posts):
+        assert (got.frame_number.val, got.player_index.val, got.percent.val) == (
+            want.frame_number.val,
+            want.player_index.val,
+            want.percent.val,
+        )
+    assert len(counter.frames) == counts["pre"] and counter.finished
+    assert starts[0].game_number.val == slp_bin.game_start.game_number.val
+    assert ends[0].game_end_method.val == slp_bin.game_end.game_end_method.val
+
+
+def test_consumers_share_decoded_objects(replay):
+    pipeline = Pipeline(CONFIG_DIR)
+    a, b = list(), list()
+    pipeline.on("post", a.append)
+    pipeline.on("post", b.append)
+    pipeline.run(replay)
+    assert len(a) > 0 and all(x is y for x, y in zip(a, b))
+
+
+def test_column_handlers_get_chunks(replay):
+    index = EventIndex(replay)
+    layout = SlpBin(CONFIG_DIR).post_frame_update_template.layout(index.version)
+    full = decode_columns(index, index.find(0x38), layout, ("frame_number", "percent"))
+
+    pipeline = Pipeline(CONFIG_DIR)
+    chunks = list()
+    pipeline.on_columns("post", ("frame_number", "percent"), chunks.append, chunk_size=25)
+    small = list()
+    pipeline.on_columns("post", ("percent",), small.append, chunk_size=25)
+    order = list()
+    pipeline.on("frame_start", lambda fs: order.append(("start", fs.frame_number.val)))
+    pipeline.on_columns(
+        "post", ("frame_number",), lambda c: order.append(("chunk", c["frame_number"][-1])), 40
+    )
+    pipeline.run(index)
+
+    assert all(len(c["percent"]) <= 25 for c in chunks)
+    assert set(small[0]) == {"percent", "event"}
+    for name in ("frame_number", "percent"):
+        assert np.array_equal(np.concatenate([c[name] for c in chunks]), full[name])
+    assert np.array_equal(np.concatenate([c["event"] for c in chunks]), index.find(0x38))
+
+    # A chunk comes right after its last event, before the next frame starts
+    for (kind, frame), nxt in zip(order[:-1], order[1:]):
+        if kind == "chunk" and nxt[0] == "start":
+            assert nxt[1] >= frame
+
+
+def test_resolve_rollbacks(replay):
+    pipeline = Pipeline(CONFIG_DIR)
+    frames = list()
+    pipeline.on("frame_start", lambda fs: frames.append(fs.frame_number.val))
+    pipeline.run(replay, resolve_rollbacks=True)
+    assert frames == sorted(set(frames)) == list(range(-123, -63))
+
+
+def test_unknown_event():
+    with pytest.raises(ValueError):
+        Pipeline(CONFIG_DIR).on("nope", print)
+    with pytest.raises(ValueError):
+        Pipeline(CONFIG_DIR).on_columns("game_start", ("stage",), print)
@@ -0,0 +1,86 @@
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_index import EventIndex
+from slp_parallel import parallel_decode_columns
+from slp_pushdown import GROUNDED_STATES, scan_columns, scan_payloads, select_events
+from slp_parse import SlpBin
+
+POST_NAMES = ("frame_number", "player_index", "action_state_id", "percent", "x_position")
+
+
+@pytest.fixture(scope="module")
+def replay():
+    return build_replay(n_frames=150, rollback_frames=(-100, 0), items=True)
+
+
+def _full(buf):
+    return parallel_decode_columns(buf, 0x38, POST_NAMES, CONFIG_DIR, workers=0)
+
+
+def test_scan_columns_matches_filtered_full_decode(replay):
+    full = _full(replay)
+    where = [
+        ("player_index", "==", 1),
+        ("frame_number", "between", (-50, 10)),
+        ("percent", ">", 2.0),
+    ]
+    cols = scan_columns(replay, 0x38, ("x_position", "frame_number"), where, CONFIG_DIR)
+
+    keep = (
+        (full["player_index"] == 1)
+        & (full["frame_number"] >= -50)
+        & (full["frame_number"] <= 10)
+        & (full["percent"] > 2.0)
+    )
+    assert keep.any() and not keep.all()
+    assert set(cols) == {"x_position", "frame_number", "event"}
+    assert np.array_equal(cols["x_position"], full["x_position"][keep])
+    assert np.array_equal(cols["frame_number"], full["frame_number"][keep])
+
+
+def test_select_events_grounded_states(replay):
+    index = EventIndex(replay)
+    layout = SlpBin(CONFIG_DIR).post_frame_update_template.layout(index.version)
+    grounded = select_events(index, 0x38, layout, [("action_state_id", "in_ranges", GROUNDED_STATES)])
+    not_wait = select_events(index, 0x38, layout, [("action_state_id", "!=", 14)])
+    all_post = select_events(index, 0x38, layout)
+    # The builder only uses wait and walk states
+    assert np.array_equal(grounded, all_post)
+    assert 0 < len(not_wait) < len(all_post)
+
+
+def test_rollbacks_resolved_before_predicates(replay):
+    index = EventIndex(replay)
+    layout = SlpBin(CONFIG_DIR).post_frame_update_template.layout(index.version)
+    where = [("frame_number", "==", 0)]
+    assert len(select_events(index, 0x38, layout, where)) == 2
+    assert len(select_events(index, 0x38, layout, where, resolve_rollbacks=False)) == 4
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_scan_payloads_decodes_only_matches(replay, codegen):
+    slp_bin = SlpBin(CONFIG_DIR, codegen=codegen, codegen_cache_dir=False)
+    where = [("player_index", "==", 0), ("frame_number", ">=", 0)]
+    payloads = scan_payloads(replay, 0x38, where, slp_bin=slp_bin)
+    cols = scan_columns(replay, 0x38, ("frame_number", "percent"), where, slp_bin=slp_bin)
+
+    assert len(payloads) == len(cols["frame_number"]) > 0
+    for obj, frame, percent in zip(payloads, cols["frame_number"], cols["percent"]):
+        assert obj.command_byte.val == 0x38
+        assert obj.player_index.val == 0
+        assert obj.frame_number.val == frame
+        assert obj.percent.val == pytest.approx(percent)
+
+
+def test_bad_predicates(replay):
+    with pytest.raises(KeyError):
+        scan_columns(replay, 0x38, (), [("no_such_field", "==", 0)], CONFIG_DIR)
+    with pytest.raises(ValueError):
+        scan_columns(replay, 0x38, (), [("percent", "~", 0)], CONFIG_DIR)
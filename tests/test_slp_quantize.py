@@ -0,0 +1,89 @@
+import io
+import json
+import sys
+
+sys.path.append("..")
+
+import numpy as np
+import pytest
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_dataset import WindowLoader, export_dataset
+from slp_parse import SlpBin
+from slp_quantize import (
+    EXPORT_FLOAT32,
+    EXPORT_NATIVE,
+    EXPORT_QUANTIZED,
+    FEATURES,
+    STICK_STEPS,
+    TRIGGER_STEPS,
+    dequantize,
+    encoding_metadata,
+    quantize,
+)
+
+
+@pytest.fixture(scope="module")
+def frames():
+    slp_bin = SlpBin(CONFIG_DIR)
+    slp_bin.read(io.BytesIO(build_replay(n_frames=120, seed=3)))
+    return slp_bin.to_player_numpy()
+
+
+def test_native_is_lossless(frames):
+    arr = quantize(frames, EXPORT_NATIVE)
+    assert arr.shape == frames.shape[:2]
+    assert arr.dtype["action_state_id"] == np.dtype("u2")
+    assert np.array_equal(dequantize(arr, encoding_metadata(EXPORT_NATIVE)), frames)
+
+
+def test_quantized_error_bounds(frames):
+    arr = quantize(frames, EXPORT_QUANTIZED)
+    assert frames.nbytes / arr.nbytes > 2
+    # The metadata survives a trip through JSON, like in a manifest
+    meta = json.loads(json.dumps(encoding_metadata(EXPORT_QUANTIZED)))
+    back = dequantize(arr, meta)
+    assert back.shape == frames.shape and back.dtype == np.float32
+
+    col = {name: f for f, name in enumerate(FEATURES)}
+    assert np.array_equal(back[..., col["action_state_id"]], frames[..., col["action_state_id"]])
+    for name in ("joystick_x", "joystick_y", "cstick_x", "cstick_y"):
+        err = np.abs(back[..., col[name]] - frames[..., col[name]])
+        assert err.max() <= 0.5 / STICK_STEPS + 1e-6
+    # Triggers are stored in the console's own steps, which loses nothing
+    trigger = frames[..., col["trigger"]]
+    assert np.allclose(np.rint(trigger * TRIGGER_STEPS), trigger * TRIGGER_STEPS, atol=1e-3)
+    assert np.allclose(back[..., col["trigger"]], trigger, atol=1e-6)
+    for name in ("x_position", "y_position"):
+        assert np.allclose(back[..., col[name]], frames[..., col[name]], rtol=1e-3, atol=1e-3)
+    assert np.abs(back[..., col["percent"]] - frames[..., col["percent"]]).max() <= 1 / 128
+
+
+def test_float32_mode_is_unchanged(frames):
+    assert quantize(frames, EXPORT_FLOAT32) is frames
+    with pytest.raises(ValueError):
+        quantize(frames, "int4")
+
+
+def test_export_quantized_dataset(tmp_path, frames):
+    src = tmp_path / "replays"
+    src.mkdir()
+    (src / "a.slp").write_bytes(build_replay(n_frames=120, seed=3))
+
+    plain = export_dataset(src, str(tmp_path / "plain"), CONFIG_DIR, workers=0)
+    small = export_dataset(
+        src, str(tmp_path / "small"), CONFIG_DIR, workers=0, mode=EXPORT_QUANTIZED
+    )
+    assert small["feature_shape"] == plain["feature_shape"] == [4, 12]
+    assert small["encoding"]["mode"] == EXPORT_QUANTIZED
+    plain_size = (tmp_path / "plain" / plain["shards"][0]["file"]).stat().st_size
+    small_size = (tmp_path / "small" / small["shards"][0]["file"]).stat().st_size
+    assert plain_size > 2 * small_size
+
+    loader = WindowLoader(str(tmp_path / "small"), window=16, batch_size=4, seed=0)
+    batch, _, starts = loader.sample_batch()
+    loader.close()
+    assert batch.dtype == np.float32 and batch.shape == (4, 16, 4, 12)
+    expected = dequantize(quantize(frames, EXPORT_QUANTIZED), small["encoding"])
+    for b, start in zip(batch, starts):
+        assert np.array_equal(b, expected[start : start + 16])
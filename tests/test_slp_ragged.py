@@ -0,0 +1,77 @@
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay, read_bin
+
+from slp_ragged import N_FEATURES, flat_batch, length_mask, pad_batch
+
+
+def make_replays():
+    return [
+        build_replay(n_frames=12),
+        build_replay(n_frames=5, ports=(2,), characters=(9,), items=False),
+        build_replay(n_frames=9, rollback_frames=(-118,)),
+    ]
+
+
+def make_bins():
+    return [read_bin(buf) for buf in make_replays()]
+
+
+def test_pad_batch_matches_to_player_numpy():
+    bins = make_bins()
+    out, lengths, player_mask = pad_batch(bins, fill=-1.0)
+    assert out.shape == (3, 12, 4, N_FEATURES)
+    assert list(lengths) == [12, 5, 9]
+    assert player_mask.tolist()[1] == [False, False, True, False]
+
+    for b, slp_bin in enumerate(bins):
+        dense = slp_bin.to_player_numpy()
+        ports = player_mask[b]
+        assert np.array_equal(out[b, : lengths[b]][:, ports], dense[:, ports])
+        assert np.all(out[b, lengths[b] :] == -1.0)
+        assert np.all(out[b, :, ~ports] == -1.0)
+
+    mask = length_mask(lengths, out.shape[1])
+    assert mask.sum() == lengths.sum()
+
+
+def test_pad_batch_into_caller_buffer():
+    bins = make_bins()
+    buf = np.full((4, 8, 4, N_FEATURES), 7.0, dtype=np.float32)
+    out, lengths, _ = pad_batch(bins, out=buf)
+    assert out is buf
+    # Truncated to the buffer's capacity, rows of the unused 4th replay untouched
+    assert list(lengths) == [8, 5, 8]
+    assert np.array_equal(out[0], bins[0].to_player_numpy()[:8])
+    assert np.all(out[3] == 7.0)
+
+    with pytest.raises(ValueError):
+        pad_batch(bins, out=np.zeros((2, 8, 4, N_FEATURES), dtype=np.float32))
+
+
+def test_flat_batch():
+    bins = make_bins()
+    out, offsets, _ = flat_batch(bins)
+    assert list(offsets) == [0, 12, 17, 26]
+    for b, slp_bin in enumerate(bins):
+        assert np.array_equal(out[offsets[b] : offsets[b + 1]], slp_bin.to_player_numpy())
+
+
+def test_raw_replays_match_parsed():
+    bins = make_bins()
+    raw = make_replays()
+    out, lengths, player_mask = pad_batch(bins, fill=-1.0)
+    raw_out, raw_lengths, raw_mask = pad_batch(raw, fill=-1.0, config_dir=CONFIG_DIR)
+    assert np.array_equal(raw_out, out)
+    assert np.array_equal(raw_lengths, lengths)
+    assert np.array_equal(raw_mask, player_mask)
+
+    flat, offsets, _ = flat_batch(bins)
+    raw_flat, raw_offsets, _ = flat_batch(raw, config_dir=CONFIG_DIR)
+    assert np.array_equal(raw_flat, flat)
+    assert np.array_equal(raw_offsets, offsets)
@@ -0,0 +1,118 @@
+import asyncio
+import sys
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_async import read_tcp, serve_slp_bytes
+from slp_index import EventIndex
+from slp_pipeline import Pipeline
+from slp_relay import EventScanner, LiveRelay
+
+
+def live_replay(n_frames=60):
+    # What Dolphin has written mid-game: the raw length in the header is still 0
+    buf = bytearray(build_replay(n_frames=n_frames, rollback_frames=(-100,)))
+    buf[11:15] = bytes(4)
+    return bytes(buf)
+
+
+def test_event_scanner_boundaries():
+    buf = build_replay(n_frames=20)
+    index = EventIndex(buf)
+    boundaries = set((index.offsets + index.sizes).tolist()) | {0}
+
+    scanner = EventScanner()
+    events = list()
+    for end in range(7, len(buf) + 7, 7):
+        events += scanner.scan(buf[:end])
+        assert scanner.pos in boundaries or scanner.pos == min(end, len(buf))
+    assert events == list(zip(index.cmd_bytes.tolist(), index.offsets.tolist(), index.sizes.tolist()))
+    assert scanner.pos == len(buf)
+
+
+def test_tail_growing_file(tmp_path):
+    buf = live_replay()
+    path = tmp_path / "Game_live.slp"
+    path.write_bytes(b"")
+
+    pipeline = Pipeline(CONFIG_DIR)
+    posts = list()
+    pipeline.on("post", posts.append)
+    finished = list()
+    pipeline.finishers.append(lambda: finished.append(True))
+    relay = LiveRelay(pipeline=pipeline)
+
+    async def write_slowly():
+        with open(path, "ab") as f:
+            for i in range(0, len(buf), 500):
+                f.write(buf[i : i + 500])
+                f.flush()
+                await asyncio.sleep(0.005)
+
+    async def run():
+        server = await relay.serve()
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            early = [asyncio.ensure_future(read_tcp("127.0.0.1", port)) for _ in range(2)]
+            tail = asyncio.ensure_future(relay.tail_file(path, poll_interval=0.01, settle=0.1))
+            writer = asyncio.ensure_future(write_slowly())
+            await asyncio.sleep(0.05)
+            late = await read_tcp("127.0.0.1", port)
+            await asyncio.gather(tail, writer)
+            return await asyncio.gather(*early) + [late]
+
+    assert asyncio.run(run()) == [buf] * 3
+    assert len(posts) == len(EventIndex(build_replay(n_frames=60, rollback_frames=(-100,))).find(0x38))
+    assert finished == [True]
+    assert relay.subscribers == 0
+
+
+def test_tcp_source():
+    buf = build_replay(n_frames=30)
+    relay = LiveRelay()
+
+    async def run():
+        source = await serve_slp_bytes(buf, chunk_size=333, delay=0.001)
+        source_port = source.sockets[0].getsockname()[1]
+        server = await relay.serve(chunk_size=1000)
+        port = server.sockets[0].getsockname()[1]
+        async with source, server:
+            subs = [asyncio.ensure_future(read_tcp("127.0.0.1", port)) for _ in range(4)]
+            reader, writer = await asyncio.open_connection("127.0.0.1", source_port)
+            await relay.read_from(reader)
+            writer.close()
+            return await asyncio.gather(*subs)
+
+    assert asyncio.run(run()) == [buf] * 4
+
+
+def test_partial_events_are_held_back():
+    buf = build_replay(n_frames=10)
+    index = EventIndex(buf)
+    relay = LiveRelay()
+
+    async def run():
+        # Up to the middle of the fifth event
+        await relay.feed(buf[: int(index.offsets[4]) + 3])
+        assert relay.published == index.offsets[4]
+        await relay.feed(buf[int(index.offsets[4]) + 3 :])
+        assert relay.published == len(buf)
+
+    asyncio.run(run())
+
+
+def test_lagging_subscriber_is_dropped():
+    buf = build_replay(n_frames=30)
+    relay = LiveRelay(max_lag=1000)
+
+    async def run():
+        server = await relay.serve()
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            await relay.feed(buf)
+            await relay.finish()
+            return await read_tcp("127.0.0.1", port)
+
+    assert asyncio.run(run()) == b""
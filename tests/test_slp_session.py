@@ -0,0 +1,91 @@
+import io
+import pickle
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+from slp_batch import POOL_THREAD, batch_read
+from slp_parse import SlpBin, SlpSchema, hash_obj
+
+
+def test_sessions_dont_touch_schema():
+    schema = SlpSchema(CONFIG_DIR)
+    before = hash_obj(schema.game_start), hash_obj(schema.game_end)
+
+    a = schema.session()
+    a.read(io.BytesIO(build_replay(n_frames=10, game_number=3)))
+    b = schema.session()
+    b.read(io.BytesIO(build_replay(n_frames=20, game_number=5)))
+
+    assert a.game_start.game_number.val == 3
+    assert b.game_start.game_number.val == 5
+    assert a.game_start is not b.game_start and a.game_end is not b.game_end
+    assert (hash_obj(schema.game_start), hash_obj(schema.game_end)) == before
+    # Frame templates are shared, only the payloads read from them are per session
+    assert a.post_frame_update_template is b.post_frame_update_template
+    assert len(a.post_frames) == 10 and len(b.post_frames) == 20
+
+
+def test_shared_schema_is_memoized():
+    assert SlpSchema.shared(CONFIG_DIR) is SlpSchema.shared(CONFIG_DIR)
+
+
+@pytest.mark.parametrize("codegen", [False, True])
+def test_concurrent_sessions_match_serial(codegen):
+    replays = [
+        build_replay(n_frames=20 + 5 * i, rollback_frames=(-110,), seed=i) for i in range(4)
+    ]
+    expected = [None] * len(replays)
+    for i, buf in enumerate(replays):
+        slp_bin = SlpBin(CONFIG_DIR)
+        slp_bin.read(io.BytesIO(buf))
+        expected[i] = slp_bin.to_player_numpy()
+
+    schema = SlpSchema(CONFIG_DIR, codegen_cache_dir=False)
+
+    def parse(buf):
+        slp_bin = schema.session(codegen=codegen)
+        slp_bin.read(io.BytesIO(buf))
+        return slp_bin.to_player_numpy()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        got = list(executor.map(parse, replays * 2))
+    for i, arr in enumerate(got):
+        assert np.array_equal(arr, expected[i % len(replays)])
+
+
+def test_thread_pool_batch_read(tmp_path):
+    for i in range(6):
+        (tmp_path / f"game_{i}.slp").write_bytes(build_replay(n_frames=5, game_number=i + 1))
+
+    # Closures can't be pickled, a thread pool doesn't need to
+    seen = list()
+    results = list(
+        batch_read(
+            tmp_path,
+            CONFIG_DIR,
+            fn=lambda slp_bin: seen.append(slp_bin) or slp_bin.game_start.game_number.val,
+            workers=3,
+            pool=POOL_THREAD,
+        )
+    )
+    assert [r.result for r in results] == [1, 2, 3, 4, 5, 6]
+    assert all(r.error is None for r in results)
+    assert len({id(s.game_start) for s in seen}) == 6
+
+
+def test_session_pickles():
+    slp_bin = SlpSchema(CONFIG_DIR, codegen_cache_dir=False).session(codegen=True)
+    slp_bin.read(io.BytesIO(build_replay(n_frames=10)))
+    copy = pickle.loads(pickle.dumps(slp_bin))
+    assert np.array_equal(copy.to_player_numpy(), slp_bin.to_player_numpy())
+    out_a, out_b = io.BytesIO(), io.BytesIO()
+    slp_bin.write(out_a)
+    copy.write(out_b)
+    assert out_a.getvalue() == out_b.getvalue()
@@ -0,0 +1,89 @@
+import io
+import sys
+import tarfile
+import zipfile
+
+sys.path.append("..")
+
+from replay_builder import CONFIG_DIR, build_replay
+
+import slp_batch
+import slp_sets
+from slp_batch import read_replay_source
+from slp_sets import build_sets, group_sets
+
+
+def make_dir(tmp_path):
+    # Written out of order, one game of the first set inside a zip
+    (tmp_path / "a_g2.slp").write_bytes(build_replay(n_frames=8, match_id="set-a", game_number=2))
+    (tmp_path / "a_g1.slp").write_bytes(build_replay(n_frames=5, match_id="set-a", game_number=1))
+    with zipfile.ZipFile(tmp_path / "a_more.zip", "w") as zf:
+        zf.writestr(
+            "a_g3.slp",
+            build_replay(n_frames=6, match_id="set-a", game_number=3, tiebreaker_number=1),
+        )
+    (tmp_path / "b_g1.slp").write_bytes(build_replay(n_frames=4, match_id="set-b", game_number=1))
+    (tmp_path / "local.slp").write_bytes(build_replay(n_frames=3))
+    (tmp_path / "broken.slp").write_bytes(b"nope")
+
+
+def test_group_sets(tmp_path):
+    make_dir(tmp_path)
+    sets, errors = group_sets(tmp_path, CONFIG_DIR, workers=0)
+    assert [e.name.rsplit("/", 1)[-1] for e in errors] == ["broken.slp"]
+    assert [s.match_id for s in sets] == ["set-a", "set-b", ""]
+    assert [g.game_number for g in sets[0].games] == [1, 2, 3]
+    assert sets[0].games[0].characters == {0: 2, 1: 20}
+    assert read_replay_source(sets[0].games[2].name)[:1] == b"{"
+
+
+def test_build_sets(tmp_path):
+    make_dir(tmp_path)
+    results = {r.name: r for r in build_sets(tmp_path, CONFIG_DIR, workers=2)}
+    set_a = results["set-a"].result
+    assert list(set_a.game_offsets) == [0, 5, 13, 19]
+    assert set_a.frames.shape[:2] == (19, 4)
+    assert set_a.summary["n_games"] == 3
+    assert sum(set_a.summary["wins"].values()) == 3
+    assert results["set-b"].result.summary["games"][0]["final_stocks"] == {0: 4, 1: 4}
+
+
+def test_build_sets_reads_archive_once(tmp_path, monkeypatch):
+    with tarfile.open(tmp_path / "sets.tar.gz", "w:gz") as tf:
+        for set_index in range(3):
+            for game_number in (1, 2):
+                buf = build_replay(
+                    n_frames=4, match_id=f"set-{set_index}", game_number=game_number
+                )
+                info = tarfile.TarInfo(f"s{set_index}_g{game_number}.slp")
+                info.size = len(buf)
+                tf.addfile(info, io.BytesIO(buf))
+
+    opened = list()
+    tar_open = tarfile.open
+    monkeypatch.setattr(
+        slp_batch.tarfile, "open", lambda *a, **kw: opened.append(a) or tar_open(*a, **kw)
+    )
+    results = list(build_sets(tmp_path, CONFIG_DIR, workers=0))
+    assert sorted(r.name for r in results) == ["set-0", "set-1", "set-2"]
+    assert all(r.result.summary["n_games"] == 2 for r in results)
+    # Once for the headers, once for the sets
+    assert len(opened) == 2
+
+
+def test_missing_game_is_reported(tmp_path, monkeypatch):
+    make_dir(tmp_path)
+    group = slp_sets.group_sets
+
+    # A game is deleted after the sets were grouped
+    def group_then_delete(*args):
+        result = group(*args)
+        (tmp_path / "a_g2.slp").unlink()
+        return result
+
+    monkeypatch.setattr(slp_sets, "group_sets", group_then_delete)
+    results = {r.name: r for r in build_sets(tmp_path, CONFIG_DIR, workers=0)}
+    assert isinstance(results["set-a"].error, FileNotFoundError)
+    assert "a_g2.slp" in str(results["set-a"].error)
+    assert "a_g1.slp" not in str(results["set-a"].error)
+    assert results["set-b"].error is None
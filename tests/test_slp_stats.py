@@ -0,0 +1,78 @@
+import io
+import sys
+
+sys.path.append("..")
+
+import numpy as np
+from replay_builder import CONFIG_DIR, build_replay
+
+import slp_stats
+from slp_index import EventIndex
+from slp_parse import SlpBin
+
+
+def test_runs():
+    starts, ends, values = slp_stats.runs(np.array([1, 1, 2, 2, 2, 1]))
+    assert list(starts) == [0, 2, 5]
+    assert list(ends) == [2, 5, 6]
+    assert list(values) == [1, 2, 1]
+
+
+def test_punishes():
+    frames = np.arange(200)
+    percent = np.zeros(200, dtype=np.float32)
+    stocks = np.full(200, 4)
+    # Two hits close together, a long gap, then a hit that's followed by a death
+    percent[10:] = 10
+    percent[20:] = 25
+    percent[120:] = 40
+    percent[130:] = 0
+    stocks[130:] = 3
+    last_hit_by = np.ones(200, dtype=np.uint8)
+
+    p = slp_stats.punishes(frames, percent, stocks, last_hit_by)
+    assert list(p["start_frame"]) == [10, 120]
+    assert list(p["n_hits"]) == [2, 1]
+    assert list(p["end_percent"]) == [25, 40]
+    assert list(p["did_kill"]) == [False, True]
+
+
+def test_input_counts():
+    buttons = np.array([0, 1, 1, 3, 0, 2])
+    zeros = np.zeros(6)
+    assert list(slp_stats.input_counts(buttons, zeros, zeros, zeros, zeros)) == [0, 1, 0, 1, 0, 1]
+
+
+def test_compute_stats():
+    stats = slp_stats.compute_stats(build_replay(n_frames=300), CONFIG_DIR)
+
+    assert set(stats) == {0, 1}
+    for port, s in stats.items():
+        assert s["l_cancel"]["rate"] == 0.5
+        assert list(s["stock_loss_frames"]) == [50, 100, 150]
+        assert s["kills"] == 3
+        assert s["openings"] == 4
+        assert np.all(s["punishes"]["attacker"] == port)
+        assert s["inputs_per_minute"] > 0
+
+
+def test_never_hit():
+    p = slp_stats.punishes(np.arange(10), np.zeros(10), np.full(10, 4), np.zeros(10))
+    assert all(len(a) == 0 for a in p.values())
+
+    buf = build_replay(n_frames=40, ports=(2,), characters=(9,))
+    stats = slp_stats.compute_stats(buf, CONFIG_DIR)
+    assert len(stats[2]["punishes"]["start_frame"]) == 0
+
+
+def test_raw_columns_match_parsed():
+    buf = build_replay(n_frames=120, rollback_frames=(-100, 10))
+    slp_bin = SlpBin(CONFIG_DIR)
+    slp_bin.read(io.BytesIO(buf))
+    parsed = slp_stats.player_columns(slp_bin)
+    raw = slp_stats.player_columns(EventIndex(buf), CONFIG_DIR)
+    assert set(raw) == set(parsed) == {0, 1}
+    for port, cols in parsed.items():
+        assert set(raw[port]) == set(cols)
+        for name, col in cols.items():
+            assert np.array_equal(raw[port][name], col), name
@@ -0,0 +1,102 @@
+import io
+import struct
+import sys
+
+sys.path.append("..")
+
+import pytest
+from replay_builder import CONFIG_DIR, build_replay, read_bin
+
+from slp_index import EventIndex
+from slp_parse import SlpBin
+from slp_validation import SlpValidationError
+
+
+def test_levels_on_valid_replay():
+    buf = build_replay(rollback_frames=(-110,))
+
+    strict = read_bin(buf, validation="strict")
+    kinds = {i.kind for i in strict.issues}
+    assert kinds == {"rollback"}
+    assert all(i.severity == "info" for i in strict.issues)
+
+    for level in ("none", "cheap"):
+        slp_bin = read_bin(buf, validation=level)
+        assert slp_bin.issues == []
+        assert len(slp_bin.post_frames) == len(strict.post_frames)
+
+
+def test_raw_bounds():
+    buf = bytearray(build_replay())
+    struct.pack_into(">L", buf, 11, len(buf))
+
+    with pytest.raises(SlpValidationError) as e:
+        read_bin(bytes(buf), validation="cheap")
+    assert e.value.issues[0].kind == "raw_bounds"
+
+
+def test_schema_mismatch():
+    buf = bytearray(build_replay())
+    # Claim post-frame payloads are one byte longer than the 3.14.0 layout
+    for pos in range(17, 15 + 1 + buf[16], 3):
+        cmd_byte, size = struct.unpack_from(">BH", buf, pos)
+        if cmd_byte == 0x38:
+            struct.pack_into(">H", buf, pos + 1, size + 1)
+
+    with pytest.raises(SlpValidationError) as e:
+        read_bin(bytes(buf), validation="strict")
+    assert e.value.issues[0].kind == "schema"
+    assert e.value.issues[0].cmd_byte == 0x38
+
+
+def test_undefined_command_byte():
+    buf = bytearray(build_replay())
+    offset = int(EventIndex(bytes(buf)).offsets[5])
+    buf[offset] = 0xFF
+
+    for level in ("cheap", "strict"):
+        with pytest.raises(SlpValidationError) as e:
+            read_bin(bytes(buf), validation=level)
+        assert e.value.issues[0].kind == "undefined_command"
+        assert (e.value.issues[0].offset, e.value.issues[0].cmd_byte) == (offset, 0xFF)
+    with pytest.raises(NotImplementedError):
+        read_bin(bytes(buf), validation="none")
+
+
+# A stream that reports it can't seek, like a pipe with a position counter
+class UnseekableStream(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+def test_payload_size_mismatch_at_cheap():
+    buf = bytearray(build_replay())
+    for pos in range(17, 15 + 1 + buf[16], 3):
+        cmd_byte, size = struct.unpack_from(">BH", buf, pos)
+        if cmd_byte == 0x38:
+            struct.pack_into(">H", buf, pos + 1, size + 1)
+
+    with pytest.raises(SlpValidationError) as e:
+        read_bin(bytes(buf), validation="cheap")
+    assert e.value.issues[0].kind == "payload_size"
+    assert e.value.issues[0].cmd_byte == 0x38
+
+
+def test_unseekable_stream():
+    buf = build_replay()
+    slp_bin = SlpBin(CONFIG_DIR)
+    slp_bin.read(UnseekableStream(buf))
+    assert [i.kind for i in slp_bin.issues] == ["raw_bounds_skipped"]
+
+    # Cut off in the middle of the raw section, the events still get checked one by one
+    index = EventIndex(buf)
+    truncated = buf[: int(index.offsets[20]) + 3]
+    with pytest.raises(SlpValidationError) as e:
+        SlpBin(CONFIG_DIR).read(UnseekableStream(truncated))
+    assert e.value.issues[0].kind == "raw_bounds"
+    assert e.value.issues[0].offset == index.offsets[20]
+
+
+def test_unknown_level():
+    with pytest.raises(ValueError):
+        SlpBin(CONFIG_DIR, validation="paranoid")
@@ -0,0 +1,69 @@
+import gzip
+import io
+import sys
+
+sys.path.append("..")
+
+from replay_builder import build_replay, read_bin
+
+
+# Write-only stream with no tell/seek, like a pipe or socket
+class ForwardOnlyStream:
+    def __init__(self):
+        self.chunks = list()
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def seekable(self):
+        return False
+
+
+def test_write_round_trip():
+    buf = build_replay()
+    out = io.BytesIO()
+    read_bin(buf).write(out)
+    assert out.getvalue() == buf
+
+
+def test_write_forward_only():
+    buf = build_replay(n_frames=60)
+    slp_bin = read_bin(buf)
+    assert slp_bin.raw_size() == len(buf) - 15 - len(slp_bin.metadata)
+
+    stream = ForwardOnlyStream()
+    slp_bin.write(stream, chunk_size=1024)
+    assert b"".join(stream.chunks) == buf
+    # Header + bounded raw chunks + metadata
+    assert max(len(c) for c in stream.chunks) < 1024 + 100
+
+
+def test_write_gzip():
+    buf = build_replay()
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode="wb") as gz:
+        read_bin(buf).write(gz)
+    assert gzip.decompress(compressed.getvalue()) == buf
+
+
+def test_ice_climbers_followers_kept():
+    buf = build_replay(n_frames=20, followers=(0,))
+    slp_bin = read_bin(buf)
+    assert slp_bin.post_frames.keys == [(0, 0), (0, 1), (1, 0)]
+    assert all(len(posts) == 3 for posts in slp_bin.post_frames)
+
+    columns = slp_bin.post_frames.to_columns(("y_position",), include_followers=True)
+    assert columns[(0, 1)]["y_position"][0] == 1.0
+    assert columns[(0, 0)]["y_position"][0] == 0.0
+
+    out = io.BytesIO()
+    slp_bin.write(out)
+    assert out.getvalue() == buf
+
+
+def test_only_present_ports_allocated():
+    slp_bin = read_bin(build_replay(n_frames=5, ports=(2,), characters=(9,), items=False))
+    assert slp_bin.pre_frames.keys == [(2, 0)]
+    assert slp_bin.pre_frames.ports() == [2]
+    assert all(len(pres) == 1 for pres in slp_bin.pre_frames)